@@ -11,6 +11,10 @@ import OfficialTournaments from './components/OfficialTournaments.tsx';
 // Removed mock imports to rely only on backend data
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000/api';
+// Intervalo do polling usado quando o stream de atualizações não está disponível
+const STREAM_FALLBACK_POLL_MS = 30000;
+// Intervalo para tentar o stream de novo depois de uma recusa (503)
+const STREAM_RETRY_MS = 60000;
 
 const App: React.FC = () => {
   const [view, setView] = useState<ViewState>('home');
@@ -131,6 +135,56 @@ const App: React.FC = () => {
     fetchTournaments();
   }, [view, activeMode]);
 
+  // Atualizações em tempo real via SSE (o backend só avisa quando os dados mudam)
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') return;
+    const topics = ['tournaments', `ranking-${activeMode}`].join(',');
+    const refreshRankings = () => {
+      if (view === 'rankings') fetchRankings(activeMode);
+    };
+    let source: EventSource | undefined;
+    let pollTimer: ReturnType<typeof setInterval> | undefined;
+    let retryTimer: ReturnType<typeof setTimeout> | undefined;
+
+    const connect = () => {
+      const stream = new EventSource(`${API_URL}/stream?topics=${topics}`);
+      source = stream;
+      // O primeiro evento de cada tópico é o snapshot atual, que já foi buscado acima
+      const primed = new Set<string>();
+      const onChange = (topic: string, refresh: () => void) => {
+        stream.addEventListener(topic, () => {
+          if (primed.has(topic)) refresh();
+          primed.add(topic);
+        });
+      };
+      onChange('tournaments', fetchTournaments);
+      onChange(`ranking-${activeMode}`, refreshRankings);
+      stream.onopen = () => {
+        if (pollTimer) clearInterval(pollTimer);
+        pollTimer = undefined;
+      };
+      // Stream lotado (503) ou indisponível: o navegador desiste; fazemos
+      // polling enquanto isso e tentamos o stream de novo mais tarde
+      stream.onerror = () => {
+        if (stream.readyState !== EventSource.CLOSED) return;
+        if (!pollTimer) {
+          pollTimer = setInterval(() => {
+            fetchTournaments();
+            refreshRankings();
+          }, STREAM_FALLBACK_POLL_MS);
+        }
+        retryTimer = setTimeout(connect, STREAM_RETRY_MS);
+      };
+    };
+
+    connect();
+    return () => {
+      source?.close();
+      if (pollTimer) clearInterval(pollTimer);
+      if (retryTimer) clearTimeout(retryTimer);
+    };
+  }, [view, activeMode]);
+
   // Observer para animação de entrada no scroll
   useEffect(() => {
     const observer = new IntersectionObserver(
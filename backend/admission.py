@@ -0,0 +1,128 @@
+"""
+Controle de admissão da API
+Rate limit por cliente e classe de rota (token bucket) e limite de handlers
+executando ao mesmo tempo, para recusar rápido (429/503 com Retry-After) em
+vez de enfileirar threads esperando o SQLite
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """Balde com `capacity` fichas que se recarrega a `rate` fichas por segundo"""
+
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity, rate, now):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def take(self, now):
+        """Consome uma ficha; retorna 0 ou os segundos até a próxima ficha"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token buckets por (classe de rota, cliente).
+
+    `budgets` é {classe: (requisições, período em segundos)}; a classe
+    'default' vale para as rotas sem orçamento próprio. Cada cliente pode
+    gastar o orçamento inteiro de uma vez (rajada) e depois segue a taxa
+    média. Os buckets ficam em um LRU limitado a `max_clients` entradas.
+    """
+
+    def __init__(self, budgets, max_clients=10000):
+        self.budgets = dict(budgets)
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+        self.allowed = 0
+        self.limited = {}
+
+    def check(self, client, route_class='default'):
+        """Retorna 0 se a requisição pode seguir, senão o Retry-After em segundos"""
+        if route_class not in self.budgets:
+            route_class = 'default'
+        requests, period = self.budgets[route_class]
+        key = (route_class, client)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(requests, requests / period, now)
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            wait = bucket.take(now)
+            if wait:
+                self.limited[route_class] = self.limited.get(route_class, 0) + 1
+                return max(1, math.ceil(wait))
+            self.allowed += 1
+            return 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'budgets': {name: {'requests': r, 'period': p} for name, (r, p) in self.budgets.items()},
+                'clients': len(self._buckets),
+                'allowed': self.allowed,
+                'limited': dict(self.limited),
+            }
+
+
+class ConcurrencyLimiter:
+    """
+    Limite de requisições executando ao mesmo tempo em uma classe de rotas.
+
+    Quem não consegue vaga em `queue_timeout` segundos é recusado na hora,
+    em vez de ocupar uma thread do servidor esperando o pool ou o banco.
+    """
+
+    def __init__(self, name, limit, queue_timeout=0.25):
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def try_acquire(self):
+        if not self._semaphore.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.active += 1
+            self.admitted += 1
+            self.peak = max(self.peak, self.active)
+        return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'active': self.active,
+                'peak': self.peak,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+            }
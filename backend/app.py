@@ -2,16 +2,17 @@
 Backend Flask para integrar o Portal de Xadrez com a database do bot Discord.py
 """
 import sqlite3
-import json
+import hmac
+import logging
 import os
 import sys
-from datetime import datetime
-from flask import Flask, jsonify, request, send_file, redirect
+from datetime import datetime, timezone
+from flask import Flask, Response, jsonify, request, send_file, redirect, g, has_app_context
 from flask_cors import CORS
 from pathlib import Path
-import requests
-from io import BytesIO
+from functools import wraps
 import threading
+import time
 
 # Configurar o caminho para importar o database.py do bot
 # Tenta usar o caminho local (Windows), se não existir, usa o diretório atual (Discloud/Linux)
@@ -23,84 +24,389 @@ else:
 
 sys.path.insert(0, BOT_PATH)
 
+# Módulos do próprio backend (config, pool, ...) têm prioridade sobre os do bot
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+import config
+from db_pool import ConnectionPool, DataVersion, connect_readonly, enable_wal, is_db_busy
+from cache import ResponseCache, StampedCache
+from migrations import run_migrations, table_exists, ranking_filter, player_games_fallback_cte, LATEST_VERSION
+from time_controls import classify_time_control, MODE_LABELS
+from avatar_cache import AvatarCache
+from avatar_prewarm import AvatarPrewarmer
+from http_cache import TableValidators
+from snapshots import Snapshot
+from stream import EventBroadcaster, TooManySubscribers
+from rating_history import RatingHistoryCache, lttb
+from head_to_head import HeadToHeadCache
+from breakdown import compute_breakdown, player_stamp
+import export
+from log_config import setup_logging, get_logger
+from metrics import Metrics, RequestTimer, TimedCursor, TimedJSONProvider, current_timer, add_serialize_time
+from slow_queries import SlowQueryLog
+from admission import RateLimiter, ConcurrencyLimiter
+from replica import ReadReplica
+
+setup_logging(config.LOG_LEVEL, config.LOG_FILE, config.LOG_FORMAT, base_dir=BACKEND_DIR)
+logger = get_logger('api')
+
 app = Flask(__name__)
 CORS(app)  # Permite requisições do frontend
+app.json = TimedJSONProvider(app)
+
+# Caminho do banco de dados SQLite do bot (LEGION_DB_PATH aponta para outro
+# arquivo, ex: um banco gerado pelo synthetic_db.py para benchmarks)
+DB_PATH = os.environ.get('LEGION_DB_PATH') or os.path.join(BOT_PATH, 'legion_chess.db')
+
+# Isolamento de leitura (config.READ_ISOLATION): no modo réplica todas as
+# leituras usam READ_DB_PATH, uma cópia do banco do bot
+READ_ISOLATION = config.READ_ISOLATION
+if READ_ISOLATION == 'replica' and os.name == 'nt':
+    # No Windows o arquivo aberto pelos leitores não pode ser substituído
+    logger.warning('READ_ISOLATION=replica nao e suportado no Windows; usando snapshot')
+    READ_ISOLATION = 'snapshot'
+
+read_replica = None
+READ_DB_PATH = DB_PATH
+if READ_ISOLATION == 'replica':
+    READ_DB_PATH = config.REPLICA_PATH or os.path.splitext(DB_PATH)[0] + '.replica.db'
+    read_replica = ReadReplica(
+        DB_PATH, READ_DB_PATH,
+        interval=config.REPLICA_REFRESH_INTERVAL,
+        busy_timeout=config.DB_BUSY_TIMEOUT,
+    )
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
 
-# Caminho do banco de dados SQLite do bot
-DB_PATH = os.path.join(BOT_PATH, 'legion_chess.db')
+slow_query_log = None
+if config.SLOW_QUERY_LOG_ENABLED:
+    slow_query_log = SlowQueryLog(
+        READ_DB_PATH,
+        threshold_ms=config.SLOW_QUERY_THRESHOLD_MS,
+        size=config.SLOW_QUERY_BUFFER_SIZE,
+        busy_timeout=config.DB_READ_BUSY_TIMEOUT,
+    )
+
+def pool_cursor_factory():
+    """Cursor das conexões do pool: com log de consultas lentas e/ou métricas"""
+    if slow_query_log is not None:
+        return slow_query_log.cursor_factory()
+    return TimedCursor if config.METRICS_ENABLED else None
+
+def get_db_pool():
+    """Retorna o pool de conexões somente-leitura (criado na primeira chamada)"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                try:
+                    enable_wal(DB_PATH)
+                except sqlite3.Error as e:
+                    logger.warning('Nao foi possivel ativar WAL: %s', e)
+                if read_replica is not None:
+                    read_replica.ensure()
+                _db_pool = ConnectionPool(
+                    READ_DB_PATH,
+                    size=config.DB_POOL_SIZE,
+                    timeout=config.DB_POOL_TIMEOUT,
+                    busy_timeout=config.DB_READ_BUSY_TIMEOUT,
+                    mmap_size=config.DB_MMAP_SIZE,
+                    cache_size_kb=config.DB_CACHE_SIZE_KB,
+                    healthcheck_interval=config.DB_HEALTHCHECK_INTERVAL,
+                    cursor_factory=pool_cursor_factory(),
+                    snapshot=READ_ISOLATION == 'snapshot',
+                    watch_file=read_replica is not None,
+                )
+    return _db_pool
 
 def get_db_connection():
-    """Cria conexão com SQLite"""
-    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
+    """
+    Retira uma conexão somente-leitura do pool.
+    conn.close() devolve a conexão ao pool; o que não for devolvido pelo
+    handler é devolvido automaticamente no fim da requisição.
+    """
+    conn = get_db_pool().acquire()
+    if has_app_context():
+        g.setdefault('db_connections', []).append((conn, conn._checkout))
     return conn
 
-def init_database():
-    """Inicializa o banco de dados criando as tabelas necessárias"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Criar tabela players
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS players (
-            discord_id TEXT PRIMARY KEY,
-            discord_username TEXT NOT NULL,
-            lichess_username TEXT,
-            rating INTEGER DEFAULT 1200,
-            rating_bullet INTEGER DEFAULT 1200,
-            rating_blitz INTEGER DEFAULT 1200,
-            rating_rapid INTEGER DEFAULT 1200,
-            rating_classic INTEGER DEFAULT 1200,
-            wins_bullet INTEGER DEFAULT 0,
-            losses_bullet INTEGER DEFAULT 0,
-            draws_bullet INTEGER DEFAULT 0,
-            wins_blitz INTEGER DEFAULT 0,
-            losses_blitz INTEGER DEFAULT 0,
-            draws_blitz INTEGER DEFAULT 0,
-            wins_rapid INTEGER DEFAULT 0,
-            losses_rapid INTEGER DEFAULT 0,
-            draws_rapid INTEGER DEFAULT 0,
-            wins_classic INTEGER DEFAULT 0,
-            losses_classic INTEGER DEFAULT 0,
-            draws_classic INTEGER DEFAULT 0,
-            wins INTEGER DEFAULT 0,
-            losses INTEGER DEFAULT 0,
-            draws INTEGER DEFAULT 0,
-            avatar_hash TEXT
-        )
-    ''')
-    
-    # Criar tabela swiss_tournaments
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS swiss_tournaments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            status TEXT DEFAULT 'waiting',
-            max_players INTEGER DEFAULT 16,
-            current_round INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            started_at TIMESTAMP,
-            finished_at TIMESTAMP
+def begin_read(conn):
+    """
+    Abre uma transação de leitura para várias consultas verem o mesmo estado
+    do banco (no modo snapshot a conexão do pool já vem com ela aberta)
+    """
+    if not conn.in_transaction:
+        conn.execute('BEGIN')
+
+@app.teardown_appcontext
+def release_db_connections(error):
+    """
+    Devolve ao pool as conexões que ficaram abertas na requisição. As que o
+    handler já fechou podem estar emprestadas a outra requisição: o número
+    do empréstimo impede devolvê-las de novo.
+    """
+    for conn, checkout in g.pop('db_connections', []):
+        get_db_pool().release(conn, checkout)
+
+http_metrics = Metrics()
+
+@app.before_request
+def start_request_timer():
+    """Inicia o cronômetro da requisição (banco e serialização são somados nele)"""
+    if not config.METRICS_ENABLED:
+        return
+    timer = RequestTimer()
+    g.request_timer = timer
+    g.request_timer_token = current_timer.set(timer)
+    http_metrics.request_started()
+
+@app.after_request
+def record_request_metrics(response):
+    """Registra latência/status da rota e expõe os tempos em Server-Timing"""
+    timer = g.pop('request_timer', None)
+    if timer is None:
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    elapsed = http_metrics.request_finished(route, request.method, response.status_code, timer)
+    response.headers['Server-Timing'] = (
+        f'db;dur={timer.db * 1000:.1f}, serialize;dur={timer.serialize * 1000:.1f}, '
+        f'total;dur={elapsed * 1000:.1f}'
+    )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            '%s %s %s %.1fms', request.method, request.full_path.rstrip('?'), response.status_code, elapsed * 1000,
+            extra={'route': route, 'status': response.status_code, 'duration_ms': round(elapsed * 1000, 2),
+                   'db_ms': round(timer.db * 1000, 2), 'queries': timer.queries}
         )
-    ''')
+    return response
+
+@app.teardown_request
+def finish_request_timer(error):
+    """Fecha o cronômetro mesmo quando a resposta não passou pelo after_request"""
+    timer = g.pop('request_timer', None)
+    if timer is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_metrics.request_finished(route, request.method, 500, timer)
+    token = g.pop('request_timer_token', None)
+    if token is not None:
+        current_timer.reset(token)
+
+# Controle de admissão: rotas fora desta lista não passam pelos limites
+# (health/metrics precisam responder justamente quando há sobrecarga; o
+# stream tem o próprio limite de assinantes)
+ADMISSION_EXEMPT = {'health', 'metrics', 'event_stream', 'index', 'debug_page', 'static_files'}
+ROUTE_CLASSES = {
+    'get_avatar': 'avatar',
+    'get_historico': 'historico',
+    'export_games': 'export',
+    'export_players': 'export',
+}
+
+rate_limiter = RateLimiter(
+    {
+        'default': (config.RATE_LIMIT_REQUESTS, config.RATE_LIMIT_PERIOD),
+        **config.RATE_LIMIT_ROUTE_CLASSES,
+    },
+    max_clients=config.RATE_LIMIT_MAX_CLIENTS,
+)
+concurrency_limiters = {
+    'db': ConcurrencyLimiter('db', config.DB_MAX_CONCURRENT, config.ADMISSION_QUEUE_TIMEOUT),
+    'avatar': ConcurrencyLimiter('avatar', config.AVATAR_MAX_CONCURRENT, config.ADMISSION_QUEUE_TIMEOUT),
+    'export': ConcurrencyLimiter('export', config.EXPORT_MAX_CONCURRENT, config.ADMISSION_QUEUE_TIMEOUT),
+}
+
+def client_address():
+    """IP do cliente; atrás de proxies confiáveis usa o X-Forwarded-For"""
+    if config.TRUSTED_PROXIES:
+        forwarded = [ip.strip() for ip in request.headers.get('X-Forwarded-For', '').split(',') if ip.strip()]
+        if len(forwarded) >= config.TRUSTED_PROXIES:
+            return forwarded[-config.TRUSTED_PROXIES]
+    return request.remote_addr or 'desconhecido'
+
+def overloaded_response(status, message, retry_after):
+    response = jsonify({'error': message, 'retry_after': retry_after})
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def error_response(error, message):
+    """
+    Resposta de erro dos handlers: pool esgotado ou banco travado viram 503
+    com Retry-After (o cliente tenta de novo); o resto é 500
+    """
+    if is_db_busy(error):
+        logger.warning('%s: banco ocupado (%s)', message, error)
+        return overloaded_response(503, 'Banco de dados ocupado, tente novamente', config.OVERLOAD_RETRY_AFTER)
+    logger.exception(message)
+    return jsonify({'error': str(error)}), 500
+
+@app.before_request
+def admit_request():
+    """Aplica o rate limit e o limite de concorrência antes do handler"""
+    if request.endpoint is None or request.endpoint in ADMISSION_EXEMPT:
+        return None
+    route_class = ROUTE_CLASSES.get(request.endpoint, 'default')
+
+    if config.RATE_LIMIT_ENABLED:
+        retry_after = rate_limiter.check(client_address(), route_class)
+        if retry_after:
+            return overloaded_response(429, 'Muitas requisições, tente novamente mais tarde', retry_after)
+
+    if route_class == 'export':
+        # O envio continua depois do handler: a própria rota segura a vaga
+        return None
+
+    limiter = concurrency_limiters['avatar' if route_class == 'avatar' else 'db']
+    if not limiter.try_acquire():
+        logger.warning('Requisição recusada: limite de concorrência (%s) atingido', limiter.name)
+        return overloaded_response(503, 'Servidor sobrecarregado, tente novamente', config.OVERLOAD_RETRY_AFTER)
+    g.admission_limiter = limiter
+    return None
+
+@app.teardown_request
+def release_admission(error):
+    limiter = g.pop('admission_limiter', None)
+    if limiter is not None:
+        limiter.release()
+
+def read_isolation_stats():
+    """Modo de leitura e atraso em relação ao banco do bot"""
+    if read_replica is not None:
+        return read_replica.stats()
+    # Lendo o próprio banco do bot: sem atraso
+    return {'mode': READ_ISOLATION, 'path': READ_DB_PATH, 'lag_seconds': 0.0}
+
+def admission_stats():
+    return {
+        'rate_limit': {'enabled': config.RATE_LIMIT_ENABLED, **rate_limiter.stats()},
+        'concurrency': {name: limiter.stats() for name, limiter in concurrency_limiters.items()},
+    }
+
+_data_version = DataVersion(READ_DB_PATH, busy_timeout=config.DB_READ_BUSY_TIMEOUT)
+response_cache = ResponseCache(max_entries=config.CACHE_MAX_ENTRIES, ttl=config.CACHE_TIMEOUT)
+
+def get_data_version():
+    """Token que muda sempre que o bot grava algo no banco"""
+    return _data_version.current()
+
+def cached_payload(key, builder):
+    """
+    Retorna o payload de `key` do cache, calculando com builder() quando o
+    banco mudou desde o último cálculo (ou o cache está desligado).
+    """
+    if not config.CACHE_ENABLED:
+        return builder()
+    return response_cache.get_or_compute(key, get_data_version(), builder)
+
+def load_table_versions():
+    """{tabela: (versão, changed_at)} lido uma vez por versão do banco"""
+    def load():
+        conn = get_db_connection()
+        try:
+            if not table_exists(conn, 'table_versions'):
+                return None
+            return {
+                row['table_name']: (row['version'], row['changed_at'])
+                for row in conn.execute('SELECT table_name, version, changed_at FROM table_versions')
+            }
+        finally:
+            conn.close()
+    return cached_payload(('table-versions',), load)
+
+def fallback_data_state():
+    """Estado global do banco quando table_versions ainda não existe"""
+    mtime = max(
+        os.path.getmtime(path)
+        for path in (READ_DB_PATH, READ_DB_PATH + '-wal')
+        if os.path.exists(path)
+    )
+    return get_data_version(), datetime.fromtimestamp(mtime, timezone.utc)
+
+validators = TableValidators(load_table_versions, fallback_data_state)
+
+rating_history = RatingHistoryCache(max_series=config.RATING_HISTORY_MAX_SERIES)
+head_to_head = HeadToHeadCache(
+    max_pairs=config.H2H_CACHE_MAX_PAIRS, max_recent=config.H2H_MAX_RECENT_GAMES
+)
+breakdown_cache = StampedCache(max_entries=config.BREAKDOWN_CACHE_MAX_PLAYERS)
+
+avatar_cache = AvatarCache(
+    config.AVATAR_CACHE_DIR,
+    max_bytes=config.AVATAR_CACHE_MAX_MB * 1024 * 1024,
+    fresh_for=config.AVATAR_FRESH_SECONDS,
+    cdn_base=config.AVATAR_CDN_BASE,
+    timeout=config.AVATAR_FETCH_TIMEOUT,
+)
+
+avatar_prewarmer = AvatarPrewarmer(
+    avatar_cache,
+    connect=lambda: get_db_pool().acquire(),
+    data_version=get_data_version,
+    top_n=config.AVATAR_PREWARM_TOP_N,
+    workers=config.AVATAR_PREWARM_WORKERS,
+    interval=config.AVATAR_PREWARM_INTERVAL,
+    max_retries=config.AVATAR_PREWARM_MAX_RETRIES,
+)
+
+def start_background_workers():
+    """Inicia as tarefas em segundo plano da API"""
+    if config.AVATAR_PREWARM_ENABLED:
+        avatar_prewarmer.start()
+    if read_replica is not None:
+        read_replica.start()
+
+def stop_background_workers():
+    """Para as tarefas em segundo plano (desligamento do servidor/worker)"""
+    avatar_prewarmer.stop()
+    event_broadcaster.stop()
+    if read_replica is not None:
+        read_replica.stop()
+
+def cached_snapshot(key, builder):
+    """
+    Como cached_payload, mas guarda o JSON já serializado (e comprimido)
+    e devolve a Response pronta para o Accept-Encoding do cliente
+    """
+    def build():
+        payload = builder()
+        start = time.perf_counter()
+        snapshot = Snapshot(payload)
+        add_serialize_time(time.perf_counter() - start)
+        return snapshot
     
-    # Criar tabela swiss_participants
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS swiss_participants (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            tournament_id INTEGER,
-            discord_id TEXT,
-            rating INTEGER DEFAULT 1200,
-            score REAL DEFAULT 0.0,
-            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (tournament_id) REFERENCES swiss_tournaments (id),
-            FOREIGN KEY (discord_id) REFERENCES players (discord_id)
-        )
-    ''')
+    snapshot = cached_payload(('snapshot',) + key, build)
+    return snapshot.response(request)
+
+def get_write_connection():
+    """Cria conexão de escrita com SQLite (fora do pool)"""
+    conn = sqlite3.connect(DB_PATH, timeout=config.DB_BUSY_TIMEOUT, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+_schema_ready = False
+
+def init_database():
+    """
+    Inicializa o banco de dados aplicando as migrações pendentes
+    (tabelas necessárias e índices). Se o schema já estiver na última
+    versão nenhum DDL é executado.
+    """
+    global _schema_ready
+    conn = get_write_connection()
+    try:
+        applied = run_migrations(conn)
+    finally:
+        conn.close()
+    if read_replica is not None:
+        # A réplica precisa do schema novo antes de abrir o pool
+        read_replica.refresh()
+    _schema_ready = True
     
-    conn.commit()
-    conn.close()
-    print('[OK] Banco de dados inicializado com tabelas necessárias')
+    if applied:
+        print(f'[OK] Migracoes aplicadas: {", ".join(map(str, applied))}')
+    print(f'[OK] Banco de dados inicializado (schema v{LATEST_VERSION})')
 
 def dict_from_row(row):
     """Converte sqlite3.Row para dict"""
@@ -116,77 +422,349 @@ def get_avatar_url(discord_id, avatar_hash=None):
         default_avatar_id = int(discord_id) % 5
         return f"https://cdn.discordapp.com/embed/avatars/{default_avatar_id}.png"
 
+VALID_MODES = ['bullet', 'blitz', 'rapid', 'classic']
+
+def parse_ranking_cursor(raw):
+    """Converte o cursor '<rating>:<discord_id>' em (rating, discord_id)"""
+    rating, sep, discord_id = raw.partition(':')
+    if not sep or not discord_id:
+        raise ValueError('Cursor inválido. Use <rating>:<discord_id>')
+    return int(rating), discord_id
+
 @app.route('/api/ranking/<mode>', methods=['GET'])
+@validators.conditional(('players',), 'public, max-age=30, stale-while-revalidate=60')
 def get_ranking(mode):
     """
     Retorna o ranking de um modo específico (bullet, blitz, rapid, classic)
     GET /api/ranking/blitz
+    GET /api/ranking/blitz?limit=50
+    GET /api/ranking/blitz?limit=50&cursor=<rating>:<discord_id>
+
+    Sem `limit` retorna a lista completa. Com `limit`, a resposta traz
+    `next_cursor` para buscar a página seguinte (paginação por keyset).
     """
-    valid_modes = ['bullet', 'blitz', 'rapid', 'classic']
+    if mode not in VALID_MODES:
+        return jsonify({'error': f'Modo inválido. Use: {", ".join(VALID_MODES)}'}), 400
     
-    if mode not in valid_modes:
-        return jsonify({'error': f'Modo inválido. Use: {", ".join(valid_modes)}'}), 400
+    try:
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            limit = max(1, min(limit, config.RANKING_MAX_LIMIT))
+        cursor_arg = request.args.get('cursor')
+        after = parse_ranking_cursor(cursor_arg) if cursor_arg else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        return cached_snapshot(
+            ('ranking', mode, limit, after),
+            lambda: build_ranking(mode, limit, after)
+        )
+    
+    except Exception as e:
+        return error_response(e, 'Erro ao buscar ranking')
+
+@app.route('/api/ranking/<mode>/position/<discord_id>', methods=['GET'])
+@validators.conditional(('players',), 'public, max-age=30')
+def get_ranking_position(mode, discord_id):
+    """
+    Posição de um jogador no ranking de um modo, com os vizinhos acima e
+    abaixo, sem precisar baixar o ranking inteiro
+    GET /api/ranking/blitz/position/123456789
+    GET /api/ranking/blitz/position/123456789?window=10
+    """
+    if mode not in VALID_MODES:
+        return jsonify({'error': f'Modo inválido. Use: {", ".join(VALID_MODES)}'}), 400
+    
+    window = request.args.get('window', config.RANKING_POSITION_WINDOW, type=int)
+    window = max(0, min(window, config.RANKING_POSITION_MAX_WINDOW))
+    
+    try:
+        payload = cached_payload(
+            ('ranking-position', mode, discord_id, window),
+            lambda: build_ranking_position(mode, discord_id, window)
+        )
+        if payload is None:
+            return jsonify({'error': 'Jogador não encontrado'}), 404
+        return jsonify(payload)
+    
+    except Exception as e:
+        return error_response(e, 'Erro ao buscar posição no ranking')
+
+def build_ranking_position(mode, discord_id, window):
+    """Payload de /api/ranking/<mode>/position/<id> (None se o jogador não existe)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT * FROM players WHERE discord_id = ?', (discord_id,))
+        player = cursor.fetchone()
+        if not player:
+            return None
+        
+        player_dict = dict(player)
+        ranks = ranks_por_modo(cursor, player_dict)
+        rank = ranks[mode]
+        rating = player_dict[f'rating_{mode}']
         
-        # Buscar todos os jogadores ordenados por rating do modo
+        acima, abaixo = [], []
+        if rank is not None and window > 0:
+            rating_col = f'rating_{mode}'
+            where = f'({ranking_filter(mode)})'
+            # Acima: primeiro os empatados no rating com discord_id menor,
+            # depois os de rating maior (cada parte é uma faixa do índice)
+            cursor.execute(f'''
+                SELECT {ranking_columns(mode)} FROM players
+                WHERE {where} AND {rating_col} = ? AND discord_id < ?
+                ORDER BY discord_id DESC LIMIT ?
+            ''', (rating, discord_id, window))
+            rows = cursor.fetchall()
+            if len(rows) < window:
+                cursor.execute(f'''
+                    SELECT {ranking_columns(mode)} FROM players
+                    WHERE {where} AND {rating_col} > ?
+                    ORDER BY {rating_col} ASC, discord_id DESC LIMIT ?
+                ''', (rating, window - len(rows)))
+                rows += cursor.fetchall()
+            acima = [format_ranking_row(row, rank - i) for i, row in enumerate(rows, 1)][::-1]
+            
+            cursor.execute(f'''
+                SELECT {ranking_columns(mode)} FROM players
+                WHERE {where} AND ({rating_col} < ? OR ({rating_col} = ? AND discord_id > ?))
+                ORDER BY {rating_col} DESC, discord_id ASC LIMIT ?
+            ''', (rating, rating, discord_id, window))
+            abaixo = [format_ranking_row(row, rank + i) for i, row in enumerate(cursor.fetchall(), 1)]
+    finally:
+        conn.close()
+    
+    total = count_ranking_players(mode)
+    return {
+        'modo': mode,
+        'id_discord': player_dict['discord_id'],
+        'nome': player_dict['discord_username'],
+        'rating': rating or 1200,
+        'rank': rank,
+        'total_jogadores': total,
+        'percentil': round((1 - (rank - 1) / total) * 100, 1) if rank and total else None,
+        'ranks': ranks,
+        'acima': acima,
+        'abaixo': abaixo,
+        'ultimo_update': validators.changed_at(('players',))
+    }
+
+def count_ranking_players(mode):
+    """Total de jogadores no ranking de um modo (cacheado por versão do banco)"""
+    def count():
+        conn = get_db_connection()
+        total = conn.execute(
+            f'SELECT COUNT(*) FROM players WHERE {ranking_filter(mode)}'
+        ).fetchone()[0]
+        conn.close()
+        return total
+    return cached_payload(('ranking-count', mode), count)
+
+def rank_position(cursor, mode, rating, discord_id):
+    """
+    Posição de (rating, discord_id) no ranking de um modo, na mesma ordem do
+    /api/ranking (rating decrescente, discord_id como desempate). São duas
+    contagens por faixa do índice parcial do modo, sem ler a tabela.
+    """
+    rating_col = f'rating_{mode}'
+    where = f'({ranking_filter(mode)})'
+    cursor.execute(f'''
+        SELECT
+            (SELECT COUNT(*) FROM players WHERE {where} AND {rating_col} > ?)
+          + (SELECT COUNT(*) FROM players WHERE {where} AND {rating_col} = ? AND discord_id < ?)
+    ''', (rating, rating, discord_id))
+    return cursor.fetchone()[0] + 1
+
+def is_ranked(player_dict, mode):
+    """Se o jogador aparece no ranking do modo (mesma regra de ranking_filter)"""
+    return any(
+        (player_dict.get(f'{col}_{mode}') or 0) > 0
+        for col in ('rating', 'wins', 'losses', 'draws')
+    )
+
+def ranks_por_modo(cursor, player_dict):
+    """{modo: posição no ranking} de um jogador (None se não ranqueado)"""
+    return {
+        mode: rank_position(cursor, mode, player_dict[f'rating_{mode}'], player_dict['discord_id'])
+        if is_ranked(player_dict, mode) else None
+        for mode in VALID_MODES
+    }
+
+def format_ranking_row(row, rank):
+    """Linha de players (colunas do modo já renomeadas) no formato do ranking"""
+    player_dict = dict(row)
+    total_partidas = (player_dict['vitorias'] or 0) + (player_dict['derrotas'] or 0) + (player_dict['empates'] or 0)
+    win_rate = 0
+    if total_partidas > 0:
+        win_rate = round((player_dict['vitorias'] or 0) / total_partidas * 100, 1)
+    
+    return {
+        'rank': rank,
+        'id_discord': player_dict['discord_id'],
+        'nome': player_dict['discord_username'],
+        'lichess_username': player_dict['lichess_username'],
+        'rating': player_dict['rating'] or 1200,
+        'vitorias': player_dict['vitorias'] or 0,
+        'derrotas': player_dict['derrotas'] or 0,
+        'empates': player_dict['empates'] or 0,
+        'partidas_jogadas': total_partidas,
+        'win_rate': win_rate
+    }
+
+def ranking_columns(mode):
+    """Colunas do SELECT de ranking, com os nomes usados no payload"""
+    return f'''
+            discord_id,
+            discord_username,
+            lichess_username,
+            rating_{mode} as rating,
+            wins_{mode} as vitorias,
+            losses_{mode} as derrotas,
+            draws_{mode} as empates'''
+
+def build_ranking(mode, limit=None, after=None):
+    """
+    Monta o payload do ranking de um modo.
+    `after` é o (rating, discord_id) da última linha da página anterior; a
+    ordem é rating decrescente com discord_id como desempate.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    rating_col = f'rating_{mode}'
+    
+    where = f'({ranking_filter(mode)})'
+    params = []
+    first_rank = 1
+    if after is not None:
+        after_rating, after_id = after
+        # Rank absoluto: quantos jogadores vêm antes ou no próprio cursor
+        first_rank = rank_position(cursor, mode, after_rating, after_id) + 1
+        where += f' AND ({rating_col} < ? OR ({rating_col} = ? AND discord_id > ?))'
+        params += [after_rating, after_rating, after_id]
+    
+    sql = f'''
+        SELECT {ranking_columns(mode)}
+        FROM players
+        WHERE {where}
+        ORDER BY {rating_col} DESC, discord_id ASC
+    '''
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    conn.close()
+    
+    jogadores = [format_ranking_row(row, rank) for rank, row in enumerate(rows, first_rank)]
+    
+    next_cursor = None
+    if limit is not None and len(rows) == limit:
+        last = rows[-1]
+        next_cursor = f"{last['rating']}:{last['discord_id']}"
+    
+    return {
+        'modo': mode,
+        'ultimo_update': validators.changed_at(('players',)),
+        'total_jogadores': count_ranking_players(mode),
+        'limit': limit,
+        'next_cursor': next_cursor,
+        'jogadores': jogadores
+    }
+
+def stats_por_modo(player_dict, ranks=None):
+    """
+    Stats de todos os modos a partir de uma linha de players
+    (`ranks` de ranks_por_modo acrescenta a posição em cada modo)
+    """
+    stats = {}
+    
+    for mode in VALID_MODES:
         rating_col = f'rating_{mode}'
         wins_col = f'wins_{mode}'
         losses_col = f'losses_{mode}'
         draws_col = f'draws_{mode}'
         
-        cursor.execute(f'''
-            SELECT 
-                discord_id,
-                discord_username,
-                lichess_username,
-                {rating_col} as rating,
-                {wins_col} as vitorias,
-                {losses_col} as derrotas,
-                {draws_col} as empates
-            FROM players
-            WHERE {rating_col} > 0 OR {wins_col} > 0 OR {losses_col} > 0 OR {draws_col} > 0
-            ORDER BY {rating_col} DESC
-        ''')
-        
-        rows = cursor.fetchall()
-        conn.close()
+        vitorias = player_dict.get(wins_col, 0) or 0
+        derrotas = player_dict.get(losses_col, 0) or 0
+        empates = player_dict.get(draws_col, 0) or 0
+        total = vitorias + derrotas + empates
         
-        jogadores = []
-        for idx, row in enumerate(rows, 1):
-            player_dict = dict(row)
-            total_partidas = (player_dict['vitorias'] or 0) + (player_dict['derrotas'] or 0) + (player_dict['empates'] or 0)
-            win_rate = 0
-            if total_partidas > 0:
-                win_rate = round((player_dict['vitorias'] or 0) / total_partidas * 100, 1)
-            
-            jogadores.append({
-                'rank': idx,
-                'id_discord': player_dict['discord_id'],
-                'nome': player_dict['discord_username'],
-                'lichess_username': player_dict['lichess_username'],
-                'rating': player_dict['rating'] or 1200,
-                'vitorias': player_dict['vitorias'] or 0,
-                'derrotas': player_dict['derrotas'] or 0,
-                'empates': player_dict['empates'] or 0,
-                'partidas_jogadas': total_partidas,
-                'win_rate': win_rate
-            })
-        
-        return jsonify({
-            'modo': mode,
-            'ultimo_update': datetime.now().isoformat() + 'Z',
-            'total_jogadores': len(jogadores),
-            'jogadores': jogadores
-        })
+        stats[mode] = {
+            'rating': player_dict.get(rating_col, 1200) or 1200,
+            'vitorias': vitorias,
+            'derrotas': derrotas,
+            'empates': empates,
+            'partidas_jogadas': total,
+            'win_rate': round(vitorias / total * 100, 1) if total > 0 else 0
+        }
+        if ranks is not None:
+            stats[mode]['rank'] = ranks[mode]
     
-    except Exception as e:
-        print(f'Erro ao buscar ranking: {e}')
-        return jsonify({'error': str(e)}), 500
+    return stats
+
+def load_achievements(cursor, discord_id):
+    """Conquistas de um jogador, mais recentes primeiro"""
+    cursor.execute('''
+        SELECT achievement_name, description, value, unlocked_at, achievement_type
+        FROM achievements 
+        WHERE player_id = ?
+        ORDER BY unlocked_at DESC
+    ''', (discord_id,))
+    return [dict(row) for row in cursor.fetchall()]
+
+_has_player_games = False
+
+def player_games_source(conn):
+    """
+    Prefixo das consultas em player_games: vazio quando a tabela existe;
+    antes da migração 3 (adiada ou com erro), uma CTE sobre game_history
+    """
+    global _has_player_games
+    if not _has_player_games:
+        _has_player_games = table_exists(conn, 'player_games')
+    return '' if _has_player_games else player_games_fallback_cte()
+
+def load_partidas(cursor, discord_id, modo=None, limit=50):
+    """
+    Últimas partidas de um jogador já formatadas. player_games tem uma linha
+    por (jogador, partida) do ponto de vista do jogador, então basta uma
+    leitura por faixa do índice.
+    """
+    source = player_games_source(cursor.connection)
+    if modo and modo.lower() != 'todos':
+        cursor.execute(f'''
+            {source}
+            SELECT * FROM player_games
+            WHERE player_id = ? AND mode = ?
+            ORDER BY played_at DESC
+            LIMIT ?
+        ''', (discord_id, modo, limit))
+    else:
+        cursor.execute(f'''
+            {source}
+            SELECT * FROM player_games
+            WHERE player_id = ?
+            ORDER BY played_at DESC
+            LIMIT ?
+        ''', (discord_id, limit))
+    return [format_partida(row) for row in cursor.fetchall()]
+
+def player_profile(player_dict):
+    """Dados básicos de um jogador"""
+    return {
+        'id_discord': player_dict['discord_id'],
+        'nome': player_dict['discord_username'],
+        'lichess_username': player_dict['lichess_username'],
+        'avatar_url': f'/api/avatar/{player_dict["discord_id"]}',  # Usar rota proxy da API
+        'avatar_hash': player_dict.get('avatar_hash'),
+    }
 
 @app.route('/api/jogador/<discord_id>', methods=['GET'])
+@validators.conditional(('players', 'game_history', 'achievements'), 'public, max-age=15')
 def get_jogador_detalhes(discord_id):
     """
     Retorna detalhes de um jogador específico com stats de todos os modos
@@ -208,126 +786,395 @@ def get_jogador_detalhes(discord_id):
         
         player_dict = dict(player)
         
-        # Buscar histórico de partidas
-        cursor.execute('''
-            SELECT * FROM game_history
-            WHERE player1_id = ? OR player2_id = ?
-            ORDER BY played_at DESC
-            LIMIT 20
-        ''', (discord_id, discord_id))
+        # Buscar histórico de partidas (via player_games, por faixa do índice)
+        cursor.execute(f'''
+            {player_games_source(conn)}
+            SELECT g.* FROM player_games pg
+            JOIN game_history g ON g.id = pg.game_id
+            WHERE pg.player_id = ?
+            ORDER BY pg.played_at DESC
+            LIMIT 10
+        ''', (discord_id,))
         
         historico = [dict(row) for row in cursor.fetchall()]
         
-        # Buscar achievements
-        cursor.execute('''
-            SELECT achievement_name, description, value, unlocked_at, achievement_type
-            FROM achievements 
-            WHERE player_id = ?
-            ORDER BY unlocked_at DESC
-        ''', (discord_id,))
-        
-        achievements = [dict(row) for row in cursor.fetchall()]
+        achievements = load_achievements(cursor, discord_id)
+        ranks = ranks_por_modo(cursor, player_dict)
         conn.close()
         
-        # Formatar resposta
-        modes = ['bullet', 'blitz', 'rapid', 'classic']
-        stats_por_modo = {}
-        
-        for mode in modes:
-            rating_col = f'rating_{mode}'
-            wins_col = f'wins_{mode}'
-            losses_col = f'losses_{mode}'
-            draws_col = f'draws_{mode}'
-            
-            vitorias = player_dict.get(wins_col, 0) or 0
-            derrotas = player_dict.get(losses_col, 0) or 0
-            empates = player_dict.get(draws_col, 0) or 0
-            total = vitorias + derrotas + empates
-            
-            stats_por_modo[mode] = {
-                'rating': player_dict.get(rating_col, 1200) or 1200,
-                'vitorias': vitorias,
-                'derrotas': derrotas,
-                'empates': empates,
-                'partidas_jogadas': total,
-                'win_rate': round(vitorias / total * 100, 1) if total > 0 else 0
-            }
-        
-        # Gerar URL do avatar via API proxy
-        avatar_url = f'/api/avatar/{player_dict["discord_id"]}'  # Usar rota proxy da API
-        
-        return jsonify({
-            'id_discord': player_dict['discord_id'],
-            'nome': player_dict['discord_username'],
-            'lichess_username': player_dict['lichess_username'],
-            'avatar_url': avatar_url,
-            'avatar_hash': player_dict.get('avatar_hash'),
-            'estatisticas': stats_por_modo,
-            'historico_recente': historico[:10],
+        response = player_profile(player_dict)
+        response.update({
+            'estatisticas': stats_por_modo(player_dict, ranks),
+            'ranks': ranks,
+            'historico_recente': historico,
             'achievements': achievements,
-            'ultima_atualizacao': datetime.now().isoformat() + 'Z'
+            'ultima_atualizacao': validators.changed_at(('players', 'game_history', 'achievements'))
         })
+        return jsonify(response)
     
     except Exception as e:
-        print(f'Erro ao buscar jogador: {e}')
-        return jsonify({'error': str(e)}), 500
+        return error_response(e, 'Erro ao buscar jogador')
 
-@app.route('/api/stats-gerais', methods=['GET'])
-def get_stats_gerais():
+BUNDLE_PARTS = ('profile', 'stats', 'achievements', 'history')
+
+@app.route('/api/jogador/<discord_id>/bundle', methods=['GET'])
+@validators.conditional(('players', 'game_history', 'achievements'), 'public, max-age=15')
+def get_jogador_bundle(discord_id):
     """
-    Retorna estatísticas gerais da comunidade
-    GET /api/stats-gerais
+    Perfil, stats por modo, conquistas e a primeira página do histórico de
+    um jogador em uma única resposta (uma conexão, uma transação)
+    GET /api/jogador/123456789/bundle
+    GET /api/jogador/123456789/bundle?include=stats,achievements
+    GET /api/jogador/123456789/bundle?include=history&modo=blitz&limit=20
     """
+    include_arg = request.args.get('include')
+    include = set(include_arg.split(',')) if include_arg else set(BUNDLE_PARTS)
+    invalid = include - set(BUNDLE_PARTS)
+    if invalid:
+        return jsonify({'error': f'include inválido: {", ".join(sorted(invalid))}. Use: {", ".join(BUNDLE_PARTS)}'}), 400
+    
+    modo = request.args.get('modo')
+    limit = max(1, min(request.args.get('limit', 50, type=int), 50))
+    
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Total de jogadores
-        cursor.execute('SELECT COUNT(*) as total FROM players')
-        total_jogadores = cursor.fetchone()['total']
+        # Todas as leituras enxergam o mesmo estado do banco
+        begin_read(conn)
+        cursor.execute('SELECT * FROM players WHERE discord_id = ?', (discord_id,))
+        player = cursor.fetchone()
         
-        # Total de partidas
-        cursor.execute('SELECT COUNT(*) as total FROM game_history')
-        total_partidas = cursor.fetchone()['total']
+        if not player:
+            conn.close()
+            return jsonify({'error': 'Jogador não encontrado'}), 404
         
-        # Top 5 jogadores por modo
-        modes = ['bullet', 'blitz', 'rapid', 'classic']
-        top_por_modo = {}
+        player_dict = dict(player)
+        response = {'id_discord': player_dict['discord_id']}
         
-        for mode in modes:
-            rating_col = f'rating_{mode}'
-            wins_col = f'wins_{mode}'
-            
-            cursor.execute(f'''
-                SELECT discord_username, {rating_col} as rating
-                FROM players
-                WHERE {rating_col} > 0
-                ORDER BY {rating_col} DESC
-                LIMIT 5
-            ''')
-            
-            top_por_modo[mode] = [
-                {
-                    'nome': row['discord_username'],
-                    'rating': row['rating']
-                }
-                for row in cursor.fetchall()
+        if 'profile' in include:
+            response.update(player_profile(player_dict))
+        if 'stats' in include:
+            ranks = ranks_por_modo(cursor, player_dict)
+            response['estatisticas'] = stats_por_modo(player_dict, ranks)
+            response['ranks'] = ranks
+        if 'achievements' in include:
+            response['achievements'] = load_achievements(cursor, discord_id)
+        if 'history' in include:
+            response['historico'] = {
+                'modo': modo or 'todos',
+                'partidas': load_partidas(cursor, discord_id, modo, limit)
+            }
+        
+        conn.rollback()
+        conn.close()
+        
+        response['ultima_atualizacao'] = validators.changed_at(('players', 'game_history', 'achievements'))
+        return jsonify(response)
+    
+    except Exception as e:
+        return error_response(e, 'Erro ao buscar bundle do jogador')
+
+@app.route('/api/jogador/<discord_id>/rating-history', methods=['GET'])
+@validators.conditional(('game_history',), 'public, max-age=30')
+def get_rating_history(discord_id):
+    """
+    Curva de rating de um jogador por modo, reduzida a no máximo `points`
+    pontos (LTTB) para caber em um gráfico
+    GET /api/jogador/123456789/rating-history
+    GET /api/jogador/123456789/rating-history?modo=blitz&from=2025-01-01&to=2025-06-30&points=300
+    """
+    modo = request.args.get('modo')
+    if modo and modo not in VALID_MODES:
+        return jsonify({'error': f'Modo inválido. Use: {", ".join(VALID_MODES)}'}), 400
+    modes = [modo] if modo else VALID_MODES
+    
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    points = request.args.get('points', config.RATING_HISTORY_POINTS, type=int)
+    points = max(3, min(points, config.RATING_HISTORY_MAX_POINTS))
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1 FROM players WHERE discord_id = ?', (discord_id,))
+        if not cursor.fetchone():
+            conn.close()
+            return jsonify({'error': 'Jogador não encontrado'}), 404
+        
+        version = get_data_version()
+        source = player_games_source(conn)
+        # Mesma transação para todas as séries
+        begin_read(conn)
+        series = {mode: rating_history.get(conn, discord_id, mode, version, source) for mode in modes}
+        conn.rollback()
+        conn.close()
+        
+        curvas = {}
+        for mode, mode_series in series.items():
+            window = mode_series.window(date_from, date_to)
+            # x = horário da partida (ou a posição, se o played_at não for ISO)
+            xy = [
+                (ts if ts is not None else idx, rating, played_at, game_id)
+                for idx, (played_at, game_id, rating, ts) in enumerate(window)
             ]
+            ratings = [p[1] for p in xy]
+            curvas[mode] = {
+                'total_partidas': len(xy),
+                'reduzido': len(xy) > points,
+                'rating_atual': ratings[-1] if ratings else None,
+                'rating_min': min(ratings) if ratings else None,
+                'rating_max': max(ratings) if ratings else None,
+                'pontos': [
+                    {'data': played_at, 'rating': rating, 'game_id': game_id}
+                    for _, rating, played_at, game_id in lttb(xy, points)
+                ]
+            }
         
+        return jsonify({
+            'id_discord': discord_id,
+            'from': date_from,
+            'to': date_to,
+            'points': points,
+            'curvas': curvas,
+            'ultima_atualizacao': validators.changed_at(('game_history',))
+        })
+    
+    except Exception as e:
+        return error_response(e, 'Erro ao buscar histórico de rating')
+
+@app.route('/api/jogador/<discord_id>/breakdown', methods=['GET'])
+@validators.conditional(('game_history',), 'public, max-age=30')
+def get_breakdown(discord_id):
+    """
+    Desempenho do jogador por faixa de rating do oponente, por time control
+    e por oponente (pontuação, performance rating e quantidade de partidas)
+    GET /api/jogador/123456789/breakdown
+    GET /api/jogador/123456789/breakdown?modo=blitz
+    """
+    modo = request.args.get('modo')
+    if modo and modo.lower() == 'todos':
+        modo = None
+    if modo and modo not in VALID_MODES:
+        return jsonify({'error': f'Modo inválido. Use: {", ".join(VALID_MODES)}'}), 400
+
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1 FROM players WHERE discord_id = ?', (discord_id,))
+        if not cursor.fetchone():
+            conn.close()
+            return jsonify({'error': 'Jogador não encontrado'}), 404
+
+        # Recalculado só quando as partidas do jogador mudam
+        source = player_games_source(conn)
+        begin_read(conn)
+        breakdown = breakdown_cache.get(
+            (discord_id, modo),
+            get_data_version(),
+            lambda: player_stamp(conn, discord_id, modo, source),
+            lambda stamp: compute_breakdown(
+                conn, discord_id, modo,
+                band_width=config.BREAKDOWN_RATING_BAND,
+                top_opponents=config.BREAKDOWN_TOP_OPPONENTS,
+                source=source
+            ),
+        )
+        conn.rollback()
+        conn.close()
+
+        return jsonify({
+            'id_discord': discord_id,
+            'modo': modo or 'todos',
+            'faixa_rating': config.BREAKDOWN_RATING_BAND,
+            **breakdown,
+            'ultima_atualizacao': validators.changed_at(('game_history',))
+        })
+
+    except Exception as e:
+        return error_response(e, 'Erro ao buscar desempenho do jogador')
+
+@app.route('/api/jogadores', methods=['GET'])
+@validators.conditional(('players',), 'public, max-age=30')
+def get_jogadores_batch():
+    """
+    Dados básicos e stats de vários jogadores em uma única consulta
+    GET /api/jogadores?ids=123,456,789
+    """
+    ids = [i.strip() for i in request.args.get('ids', '').split(',') if i.strip()]
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return jsonify({'error': 'Informe ids=<id1>,<id2>,...'}), 400
+    if len(ids) > config.BATCH_MAX_IDS:
+        return jsonify({'error': f'Máximo de {config.BATCH_MAX_IDS} ids por requisição'}), 400
+    
+    try:
+        conn = get_db_connection()
+        placeholders = ','.join('?' * len(ids))
+        rows = conn.execute(
+            f'SELECT * FROM players WHERE discord_id IN ({placeholders})', ids
+        ).fetchall()
         conn.close()
         
+        found = {}
+        for row in rows:
+            player_dict = dict(row)
+            jogador = player_profile(player_dict)
+            jogador['estatisticas'] = stats_por_modo(player_dict)
+            found[player_dict['discord_id']] = jogador
+        
         return jsonify({
-            'total_jogadores': total_jogadores,
-            'total_partidas': total_partidas,
-            'top_por_modo': top_por_modo,
-            'ultima_atualizacao': datetime.now().isoformat() + 'Z'
+            'jogadores': [found[i] for i in ids if i in found],
+            'nao_encontrados': [i for i in ids if i not in found],
+            'ultima_atualizacao': validators.changed_at(('players',))
         })
     
     except Exception as e:
-        print(f'Erro ao buscar stats gerais: {e}')
-        return jsonify({'error': str(e)}), 500
+        return error_response(e, 'Erro ao buscar jogadores')
+
+@app.route('/api/stats-gerais', methods=['GET'])
+@validators.conditional(('players', 'game_history'), 'public, max-age=60, stale-while-revalidate=300')
+def get_stats_gerais():
+    """
+    Retorna estatísticas gerais da comunidade
+    GET /api/stats-gerais
+    """
+    try:
+        return cached_snapshot(('stats-gerais',), build_stats_gerais)
+    
+    except Exception as e:
+        return error_response(e, 'Erro ao buscar stats gerais')
+
+STATS_TOP_N = 5
+
+def load_community_counts(cursor):
+    """
+    Contadores de community_stats (mantidos por triggers). Antes da
+    migração 7 ser aplicada, conta direto nas tabelas.
+    """
+    if table_exists(cursor.connection, 'community_stats'):
+        cursor.execute('SELECT key, value FROM community_stats')
+        return {row['key']: row['value'] for row in cursor.fetchall()}
+    
+    counts = {
+        'players': cursor.execute('SELECT COUNT(*) FROM players').fetchone()[0],
+        'games': cursor.execute('SELECT COUNT(*) FROM game_history').fetchone()[0],
+    }
+    cursor.execute("SELECT 'games_' || COALESCE(mode, '') AS key, COUNT(*) AS value FROM game_history GROUP BY 1")
+    counts.update({row['key']: row['value'] for row in cursor.fetchall()})
+    return counts
+
+def build_stats_gerais():
+    """Monta o payload de estatísticas gerais"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    begin_read(conn)
+    
+    counts = load_community_counts(cursor)
+    
+    # Uma única passada em players: top N de cada modo (window functions),
+    # rating médio e jogadores ranqueados por modo
+    columns = []
+    for mode in VALID_MODES:
+        rating_col = f'rating_{mode}'
+        columns.append(f'''
+            ROW_NUMBER() OVER (
+                ORDER BY CASE WHEN {rating_col} > 0 THEN {rating_col} END DESC, discord_id
+            ) AS pos_{mode},
+            AVG(CASE WHEN {ranking_filter(mode)} THEN {rating_col} END) OVER () AS media_{mode},
+            COUNT(CASE WHEN {ranking_filter(mode)} THEN 1 END) OVER () AS ranqueados_{mode}''')
+    top_filter = ' OR '.join(f'(pos_{mode} <= ? AND rating_{mode} > 0)' for mode in VALID_MODES)
+    cursor.execute(f'''
+        SELECT * FROM (
+            SELECT discord_username, {', '.join(f'rating_{mode}' for mode in VALID_MODES)},
+                {','.join(columns)}
+            FROM players
+        )
+        WHERE {top_filter} OR pos_{VALID_MODES[0]} = 1  -- ao menos uma linha para as médias
+    ''', [STATS_TOP_N] * len(VALID_MODES))
+    rows = cursor.fetchall()
+    
+    # Jogadores com partidas nos últimos 7 e 30 dias (faixa do índice por data)
+    cursor.execute('''
+        SELECT
+            COUNT(DISTINCT CASE WHEN played_at >= datetime('now', '-7 days') THEN player_id END) AS ativos_7d,
+            COUNT(DISTINCT player_id) AS ativos_30d
+        FROM (
+            SELECT player1_id AS player_id, played_at FROM game_history
+            WHERE played_at >= datetime('now', '-30 days')
+            UNION ALL
+            SELECT player2_id, played_at FROM game_history
+            WHERE played_at >= datetime('now', '-30 days')
+        )
+    ''')
+    ativos = cursor.fetchone()
+    
+    conn.rollback()
+    conn.close()
+    
+    top_por_modo = {}
+    rating_medio_por_modo = {}
+    ranqueados_por_modo = {}
+    for mode in VALID_MODES:
+        top = sorted(
+            (row for row in rows if row[f'pos_{mode}'] <= STATS_TOP_N and (row[f'rating_{mode}'] or 0) > 0),
+            key=lambda row: row[f'pos_{mode}']
+        )
+        top_por_modo[mode] = [
+            {
+                'nome': row['discord_username'],
+                'rating': row[f'rating_{mode}']
+            }
+            for row in top
+        ]
+        media = rows[0][f'media_{mode}'] if rows else None
+        rating_medio_por_modo[mode] = round(media, 1) if media is not None else None
+        ranqueados_por_modo[mode] = rows[0][f'ranqueados_{mode}'] if rows else 0
+    
+    return {
+        'total_jogadores': counts.get('players', 0),
+        'total_partidas': counts.get('games', 0),
+        'top_por_modo': top_por_modo,
+        'partidas_por_modo': {mode: counts.get(f'games_{mode}', 0) for mode in VALID_MODES},
+        'rating_medio_por_modo': rating_medio_por_modo,
+        'jogadores_ranqueados_por_modo': ranqueados_por_modo,
+        'jogadores_ativos': {
+            '7d': ativos['ativos_7d'],
+            '30d': ativos['ativos_30d']
+        },
+        'ultima_atualizacao': validators.changed_at(('players', 'game_history'))
+    }
+
+RESULTADO_LABELS = {
+    'win': ('Vitória', 'green'),
+    'loss': ('Derrota', 'red'),
+    'draw': ('Empate', 'gray'),
+}
+
+def format_partida(row):
+    """Formata uma linha de player_games (já orientada para o jogador)"""
+    resultado, cor_resultado = RESULTADO_LABELS.get(row['result'], RESULTADO_LABELS['loss'])
+    variacao_rating = row['rating_delta'] or 0
+    sinal = '+' if variacao_rating > 0 else ''
+    
+    return {
+        'id': row['game_id'],
+        'oponente_id': row['opponent_id'],
+        'oponente_nome': row['opponent_name'],
+        'resultado': resultado,
+        'cor_resultado': cor_resultado,
+        'modo': row['mode'],
+        'time_control': row['time_control'],
+        'rating_antes': row['rating_before'] or 0,
+        'rating_depois': row['rating_after'] or 0,
+        'variacao_rating': sinal + str(variacao_rating),
+        'rating_oponente': row['opponent_rating_before'] or 0,
+        'link_partida': row['game_url'],
+        'data': row['played_at']
+    }
 
 @app.route('/api/historico/<discord_id>', methods=['GET'])
+@validators.conditional(('game_history',), 'public, max-age=15')
 def get_historico(discord_id):
     """
     Retorna o histórico de partidas de um jogador
@@ -339,112 +1186,10 @@ def get_historico(discord_id):
         
         # Permite filtrar por modo via query param '?modo=blitz|rapid|bullet|classic'
         modo_filter = request.args.get('modo')
-        print(f'[DEBUG] Buscando histórico para {discord_id}, modo: {modo_filter}')
-        
-        if modo_filter and modo_filter.lower() != 'todos':
-            print(f'[DEBUG] Filtrando por modo: {modo_filter}')
-            cursor.execute('''
-                SELECT 
-                    id,
-                    player1_id,
-                    player2_id,
-                    player1_name,
-                    player2_name,
-                    winner_id,
-                    result,
-                    mode,
-                    time_control,
-                    game_url,
-                    player1_rating_before,
-                    player2_rating_before,
-                    player1_rating_after,
-                    player2_rating_after,
-                    played_at
-                FROM game_history
-                WHERE (player1_id = ? OR player2_id = ?) AND mode = ?
-                ORDER BY played_at DESC
-                LIMIT 50
-            ''', (discord_id, discord_id, modo_filter))
-        else:
-            # Buscar partidas do jogador (como player1 ou player2)
-            print(f'[DEBUG] Buscando todas as partidas')
-            cursor.execute('''
-                SELECT 
-                    id,
-                    player1_id,
-                    player2_id,
-                    player1_name,
-                    player2_name,
-                    winner_id,
-                    result,
-                    mode,
-                    time_control,
-                    game_url,
-                    player1_rating_before,
-                    player2_rating_before,
-                    player1_rating_after,
-                    player2_rating_after,
-                    played_at
-                FROM game_history
-                WHERE player1_id = ? OR player2_id = ?
-                ORDER BY played_at DESC
-                LIMIT 50
-            ''', (discord_id, discord_id))
-        
-        rows = cursor.fetchall()
-        print(f'[DEBUG] Total de partidas encontradas: {len(rows)}')
+        partidas = load_partidas(cursor, discord_id, modo_filter)
         conn.close()
         
-        partidas = []
-        for row in rows:
-            row_dict = dict(row)
-            
-            # Determinar se foi vitória, derrota ou empate
-            if row_dict['result'] == 'draw':
-                resultado = 'Empate'
-                cor_resultado = 'gray'
-            elif row_dict['winner_id'] == discord_id:
-                resultado = 'Vitória'
-                cor_resultado = 'green'
-            else:
-                resultado = 'Derrota'
-                cor_resultado = 'red'
-            
-            # Determinar oponente
-            if row_dict['player1_id'] == discord_id:
-                oponente_id = row_dict['player2_id']
-                oponente_nome = row_dict['player2_name']
-                rating_antes = row_dict['player1_rating_before']
-                rating_depois = row_dict['player1_rating_after']
-                rating_oponente_antes = row_dict['player2_rating_before']
-            else:
-                oponente_id = row_dict['player1_id']
-                oponente_nome = row_dict['player1_name']
-                rating_antes = row_dict['player2_rating_before']
-                rating_depois = row_dict['player2_rating_after']
-                rating_oponente_antes = row_dict['player1_rating_before']
-            
-            # Calcular variação de rating
-            variacao_rating = (rating_depois or 0) - (rating_antes or 0) if rating_depois and rating_antes else 0
-            sinal = '+' if variacao_rating > 0 else ''
-            
-            partidas.append({
-                'id': row_dict['id'],
-                'oponente_id': oponente_id,
-                'oponente_nome': oponente_nome,
-                'resultado': resultado,
-                'cor_resultado': cor_resultado,
-                'modo': row_dict['mode'],
-                'time_control': row_dict['time_control'],
-                'rating_antes': rating_antes or 0,
-                'rating_depois': rating_depois or 0,
-                'variacao_rating': sinal + str(variacao_rating),
-                'rating_oponente': rating_oponente_antes or 0,
-                'link_partida': row_dict['game_url'],
-                'data': row_dict['played_at']
-            })
-        
-        print(f'[DEBUG] Retornando {len(partidas)} partidas processadas')
+        logger.debug('Historico de %s (modo: %s): %d partidas', discord_id, modo_filter or 'todos', len(partidas))
         return jsonify({
             'discord_id': discord_id,
             'total_partidas': len(partidas),
@@ -452,145 +1197,372 @@ def get_historico(discord_id):
         })
     
     except Exception as e:
-        print(f'[ERROR] Erro ao buscar histórico: {e}')
-        import traceback
-        traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
+        return error_response(e, 'Erro ao buscar histórico')
+
+@app.route('/api/h2h/<id_a>/<id_b>', methods=['GET'])
+@validators.conditional(('players', 'game_history'), 'public, max-age=15')
+def get_head_to_head(id_a, id_b):
+    """
+    Confronto direto entre dois jogadores (visto pelo lado do primeiro)
+    GET /api/h2h/123/456
+    GET /api/h2h/123/456?modo=blitz&n=20
+    """
+    modo = request.args.get('modo')
+    if modo and modo.lower() == 'todos':
+        modo = None
+    if modo and modo not in VALID_MODES:
+        return jsonify({'error': f'Modo inválido. Use: {", ".join(VALID_MODES)}'}), 400
+    if id_a == id_b:
+        return jsonify({'error': 'Informe dois jogadores diferentes'}), 400
+    n = request.args.get('n', config.H2H_RECENT_GAMES, type=int)
+    n = max(0, min(n, config.H2H_MAX_RECENT_GAMES))
+
+    try:
+        conn = get_db_connection()
+        players = {
+            row['discord_id']: dict(row)
+            for row in conn.execute(
+                'SELECT * FROM players WHERE discord_id IN (?, ?)', (id_a, id_b)
+            ).fetchall()
+        }
+        missing = [pid for pid in (id_a, id_b) if pid not in players]
+        if missing:
+            conn.close()
+            return jsonify({'error': f'Jogador não encontrado: {", ".join(missing)}'}), 404
+
+        summary = head_to_head.get(conn, id_a, id_b, modo, get_data_version(), player_games_source(conn))
+        conn.close()
+
+        total = summary.total
+        pontos = total['vitorias'] + total['empates'] / 2
+        return jsonify({
+            'jogador': player_profile(players[id_a]),
+            'oponente': player_profile(players[id_b]),
+            'modo': modo or 'todos',
+            **total,
+            'pontuacao': round(pontos / total['partidas'] * 100, 1) if total['partidas'] else 0,
+            'por_modo': summary.por_modo,
+            'primeira_partida': summary.first_played,
+            'ultima_partida': summary.last_played,
+            'ultimas_partidas': [format_partida(row) for row in summary.recent[:n]]
+        })
+
+    except Exception as e:
+        return error_response(e, 'Erro ao buscar confronto direto')
+
+def export_response(name, sql, params, columns):
+    """
+    Resposta em streaming de uma exportação. Usa uma conexão própria (não
+    ocupa o pool durante o download) e uma vaga do limitador de exportação,
+    ambas liberadas quando o servidor fecha a resposta.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    limiter = concurrency_limiters['export']
+    if not limiter.try_acquire():
+        return overloaded_response(503, 'Muitas exportações em andamento, tente novamente', config.OVERLOAD_RETRY_AFTER)
+    try:
+        conn = connect_readonly(READ_DB_PATH, config.DB_READ_BUSY_TIMEOUT)
+        conn.execute('PRAGMA query_only=ON')
+    except Exception:
+        limiter.release()
+        raise
+
+    response = Response(
+        export.stream_rows(conn, sql, params, columns, fmt, config.EXPORT_BATCH_SIZE),
+        mimetype=export.FORMATS[fmt]
+    )
+    closed = []
+
+    def finish():
+        if not closed:
+            closed.append(True)
+            conn.close()
+            limiter.release()
+
+    response.call_on_close(finish)
+    response.headers['Content-Disposition'] = f'attachment; filename="legion-chess-{name}.{fmt}"'
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def export_args():
+    """Parâmetros comuns das exportações (None + resposta de erro se inválidos)"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in export.FORMATS:
+        return None, (jsonify({'error': f'Formato inválido. Use: {", ".join(export.FORMATS)}'}), 400)
+    modo = request.args.get('modo')
+    if modo and modo not in VALID_MODES:
+        return None, (jsonify({'error': f'Modo inválido. Use: {", ".join(VALID_MODES)}'}), 400)
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit <= 0:
+        return None, (jsonify({'error': 'limit deve ser positivo'}), 400)
+    return {'modo': modo, 'limit': limit, 'after': request.args.get('after')}, None
+
+@app.route('/api/export/games', methods=['GET'])
+def export_games():
+    """
+    Exporta partidas em ordem de id, em NDJSON (padrão) ou CSV
+    GET /api/export/games?format=csv
+    GET /api/export/games?modo=blitz&from=2025-01-01&to=2025-06-30&jogador=123
+    GET /api/export/games?after=<último id recebido>&limit=100000
+
+    Para retomar um download interrompido, repita a chamada com `after`
+    igual ao último id recebido.
+    """
+    args, error = export_args()
+    if error:
+        return error
+    try:
+        after = int(args['after']) if args['after'] else 0
+    except ValueError:
+        return jsonify({'error': 'after deve ser o id da última partida recebida'}), 400
+
+    where = ['id > :after']
+    params = {'after': after}
+    source = ''
+    if args['modo']:
+        where.append('mode = :modo')
+        params['modo'] = args['modo']
+    # "+played_at" mantém a leitura em ordem de id (sem ordenar em memória)
+    if request.args.get('from'):
+        where.append('+played_at >= :date_from')
+        params['date_from'] = request.args['from']
+    if request.args.get('to'):
+        # '2025-06-30' inclui o dia inteiro
+        where.append('+played_at <= :date_to')
+        params['date_to'] = request.args['to'] + '\uffff'
+    if request.args.get('jogador'):
+        source = player_games_source(get_db_connection())
+        where.append('id IN (SELECT game_id FROM player_games WHERE player_id = :jogador)')
+        params['jogador'] = request.args['jogador']
+
+    sql = f'''
+        {source}
+        SELECT {", ".join(export.GAME_COLUMNS)} FROM game_history
+        WHERE {" AND ".join(where)}
+        ORDER BY id
+    '''
+    if args['limit']:
+        sql += ' LIMIT :limit'
+        params['limit'] = args['limit']
+    return export_response('games', sql, params, export.GAME_COLUMNS)
+
+@app.route('/api/export/players', methods=['GET'])
+def export_players():
+    """
+    Exporta jogadores em ordem de discord_id, em NDJSON (padrão) ou CSV
+    GET /api/export/players?format=csv
+    GET /api/export/players?modo=blitz          (só quem aparece no ranking)
+    GET /api/export/players?after=<último discord_id recebido>
+    """
+    args, error = export_args()
+    if error:
+        return error
+
+    where = ['discord_id > :after']
+    params = {'after': args['after'] or ''}
+    if args['modo']:
+        where.append(f'({ranking_filter(args["modo"])})')
+
+    sql = f'''
+        SELECT {", ".join(export.PLAYER_COLUMNS)} FROM players
+        WHERE {" AND ".join(where)}
+        ORDER BY discord_id
+    '''
+    if args['limit']:
+        sql += ' LIMIT :limit'
+        params['limit'] = args['limit']
+    return export_response('players', sql, params, export.PLAYER_COLUMNS)
 
 @app.route('/api/tournaments/in-progress', methods=['GET'])
+@validators.conditional(('swiss_tournaments', 'swiss_participants', 'players'), 'public, max-age=10')
 def get_in_progress_tournaments():
     """
     Retorna uma lista de torneios suíços em andamento.
     GET /api/tournaments/in-progress
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT
-                t.id,
-                t.name,
-                t.description,
-                'swiss' as mode,
-                t.time_control,
-                t.nb_rounds,
-                t.started_at,
-                p.discord_username as created_by_name,
-                COUNT(sp.player_id) as participant_count
-            FROM swiss_tournaments t
-            LEFT JOIN players p ON t.created_by = p.discord_id
-            LEFT JOIN swiss_participants sp ON t.id = sp.tournament_id
-            WHERE t.status IN ('in_progress', 'open')
-            GROUP BY t.id, t.name, t.description, t.time_control, t.nb_rounds, t.started_at, p.discord_username
-            ORDER BY t.created_at DESC
-        """)
-        
-        rows = cursor.fetchall()
+        return jsonify(cached_payload(('tournaments-in-progress',), build_in_progress_tournaments))
+    
+    except Exception as e:
+        return error_response(e, 'Erro ao buscar torneios em andamento')
+
+def build_in_progress_tournaments():
+    """Monta o payload dos torneios suíços em andamento"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT
+            t.id,
+            t.name,
+            t.description,
+            'swiss' as mode,
+            t.time_control,
+            t.nb_rounds,
+            t.started_at,
+            p.discord_username as created_by_name,
+            COUNT(sp.player_id) as participant_count
+        FROM swiss_tournaments t
+        LEFT JOIN players p ON t.created_by = p.discord_id
+        LEFT JOIN swiss_participants sp ON t.id = sp.tournament_id
+        WHERE t.status IN ('in_progress', 'open')
+        GROUP BY t.id, t.name, t.description, t.time_control, t.nb_rounds, t.started_at, p.discord_username
+        ORDER BY t.created_at DESC
+    """)
+    
+    rows = cursor.fetchall()
+    
+    # Participantes de todos os torneios ativos em uma única consulta
+    cursor.execute("""
+        SELECT 
+            sp.tournament_id,
+            p.discord_username,
+            p.rating_blitz,
+            p.rating_rapid,
+            p.rating_classic,
+            p.rating_bullet
+        FROM swiss_participants sp
+        JOIN swiss_tournaments t ON t.id = sp.tournament_id
+        JOIN players p ON sp.player_id = p.discord_id
+        WHERE t.status IN ('in_progress', 'open')
+    """)
+    
+    participants_by_tournament = {}
+    for participant in cursor.fetchall():
+        participants_by_tournament.setdefault(participant['tournament_id'], []).append(participant)
+    
+    tournaments = []
+    for row in rows:
+        tournament = dict(row)
         
-        tournaments = []
-        for row in rows:
-            tournament = dict(row)
-            
-            # Buscar participantes do torneio
-            cursor2 = conn.cursor()
-            cursor2.execute("""
-                SELECT 
-                    p.discord_username,
-                    p.rating_blitz,
-                    p.rating_rapid,
-                    p.rating_classic,
-                    p.rating_bullet
-                FROM swiss_participants sp
-                JOIN players p ON sp.player_id = p.discord_id
-                WHERE sp.tournament_id = ?
-            """, (tournament['id'],))
-            
-            participants_raw = cursor2.fetchall()
-            
-            # Processar participantes e determinar rating baseado no time_control
-            participants = []
-            for participant_row in participants_raw:
-                participant = dict(participant_row)
-                # Determinar o rating baseado no time_control
-                time_control = tournament['time_control']
-                if '3+0' in time_control or '2+1' in time_control:
-                    rating = participant['rating_bullet'] or 1200
-                    mode = 'Bullet'
-                elif '5+3' in time_control or '10+0' in time_control:
-                    rating = participant['rating_blitz'] or 1200
-                    mode = 'Blitz'
-                elif '15+10' in time_control or '30+0' in time_control:
-                    rating = participant['rating_rapid'] or 1200
-                    mode = 'Rápida'
-                else:
-                    rating = participant['rating_classic'] or 1200
-                    mode = 'Clássico'
-                
-                participants.append({
-                    'name': participant['discord_username'],
-                    'rating': rating,
-                    'mode': mode
-                })
-            
-            # Ordenar participantes por rating em ordem decrescente (maior para menor)
-            participants.sort(key=lambda x: x['rating'], reverse=True)
-            
-            tournament['participants'] = participants
-            tournaments.append(tournament)
+        # Rating dos participantes conforme o modo do time_control
+        mode = classify_time_control(tournament['time_control'])
+        rating_col = f'rating_{mode}'
+        participants = [
+            {
+                'name': participant['discord_username'],
+                'rating': participant[rating_col] or 1200,
+                'mode': MODE_LABELS[mode]
+            }
+            for participant in participants_by_tournament.get(tournament['id'], [])
+        ]
         
-        conn.close()
+        # Ordenar participantes por rating em ordem decrescente (maior para menor)
+        participants.sort(key=lambda x: x['rating'], reverse=True)
         
-        return jsonify({
-            'ultimo_update': datetime.now().isoformat() + 'Z',
-            'tournaments': tournaments
-        })
+        tournament['participants'] = participants
+        tournaments.append(tournament)
     
-    except Exception as e:
-        print(f'Erro ao buscar torneios em andamento: {e}')
-        return jsonify({'error': str(e)}), 500
+    conn.close()
+    
+    return {
+        'ultimo_update': validators.changed_at(('swiss_tournaments', 'swiss_participants', 'players')),
+        'tournaments': tournaments
+    }
 
 
 @app.route('/api/tournaments/swiss', methods=['GET'])
+@validators.conditional(('swiss_tournaments', 'players'), 'public, max-age=300')
 def get_swiss_tournaments():
     """
     Retorna uma lista de torneios suíços finalizados.
     GET /api/tournaments/swiss
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # A sintaxe do SQL foi corrigida para garantir compatibilidade e clareza
-        cursor.execute("""
-            SELECT
-                t.id,
-                t.name,
-                t.description,
-                'swiss' as mode,
-                t.time_control,
-                t.finished_at,
-                p.discord_username as winner_name
-            FROM swiss_tournaments t
-            LEFT JOIN players p ON t.winner_id = p.discord_id
-            WHERE t.status = 'finished'
-            ORDER BY t.finished_at DESC
-        """)
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        tournaments = [dict(row) for row in rows]
-        
-        return jsonify({
-            'ultimo_update': datetime.now().isoformat() + 'Z',
-            'tournaments': tournaments
-        })
+        return cached_snapshot(('tournaments-swiss',), build_swiss_tournaments)
     
     except Exception as e:
-        print(f'Erro ao buscar torneios: {e}')
-        return jsonify({'error': str(e)}), 500
+        return error_response(e, 'Erro ao buscar torneios')
 
+def build_swiss_tournaments():
+    """Monta o payload dos torneios suíços finalizados"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    # A sintaxe do SQL foi corrigida para garantir compatibilidade e clareza
+    cursor.execute("""
+        SELECT
+            t.id,
+            t.name,
+            t.description,
+            'swiss' as mode,
+            t.time_control,
+            t.finished_at,
+            p.discord_username as winner_name
+        FROM swiss_tournaments t
+        LEFT JOIN players p ON t.winner_id = p.discord_id
+        WHERE t.status = 'finished'
+        ORDER BY t.finished_at DESC
+    """)
+    
+    rows = cursor.fetchall()
+    conn.close()
+    
+    tournaments = [dict(row) for row in rows]
+    
+    return {
+        'ultimo_update': validators.changed_at(('swiss_tournaments', 'players')),
+        'tournaments': tournaments
+    }
+
+
+def stream_topics():
+    """Tópicos do /api/stream e o builder do payload de cada um"""
+    def ranking_topic(mode):
+        limit = config.STREAM_RANKING_LIMIT
+        return lambda: cached_payload(('ranking', mode, limit, None), lambda: build_ranking(mode, limit))
+    
+    topics = {
+        'tournaments': lambda: cached_payload(('tournaments-in-progress',), build_in_progress_tournaments),
+        'stats': lambda: cached_payload(('stats-gerais',), build_stats_gerais),
+    }
+    for mode in VALID_MODES:
+        topics[f'ranking-{mode}'] = ranking_topic(mode)
+    return topics
+
+event_broadcaster = EventBroadcaster(
+    get_data_version,
+    stream_topics(),
+    poll_interval=config.STREAM_POLL_INTERVAL,
+    heartbeat=config.STREAM_HEARTBEAT,
+    max_subscribers=config.STREAM_MAX_SUBSCRIBERS,
+)
+
+@app.route('/api/stream', methods=['GET'])
+def event_stream():
+    """
+    Canal Server-Sent Events com snapshots de torneios, rankings e stats
+    sempre que os dados mudam (substitui o polling do frontend)
+    GET /api/stream
+    GET /api/stream?topics=tournaments,ranking-blitz
+
+    Eventos: tournaments, stats, ranking-<modo>. Ao reconectar o navegador
+    envia Last-Event-ID e recebe só o que perdeu.
+    """
+    topics = request.args.get('topics')
+    topics = [t.strip() for t in topics.split(',') if t.strip()] if topics else None
+    
+    try:
+        event_broadcaster.start()
+        last_event_id = event_broadcaster.parse_event_id(
+            request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+        )
+        subscriber = event_broadcaster.subscribe(topics)
+    except TooManySubscribers as e:
+        logger.warning('Stream lotado (%s): aumente STREAM_MAX_SUBSCRIBERS', e)
+        response = jsonify({'error': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    except Exception as e:
+        return error_response(e, 'Erro ao abrir stream')
+    
+    return Response(
+        event_broadcaster.stream(subscriber, last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/', methods=['GET'])
 def index():
@@ -628,7 +1600,84 @@ def static_files(filename):
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check"""
-    return jsonify({'status': 'ok', 'database': DB_PATH}), 200
+    return jsonify({
+        'status': 'ok',
+        'database': DB_PATH,
+        'pool': get_db_pool().stats(),
+        'cache': response_cache.stats(),
+        'avatars': avatar_cache.stats(),
+        'avatar_prewarm': avatar_prewarmer.stats(),
+        'stream': event_broadcaster.stats(),
+        'rating_history': rating_history.stats(),
+        'head_to_head': head_to_head.stats(),
+        'breakdown': breakdown_cache.stats(),
+        'read_isolation': read_isolation_stats(),
+        'admission': admission_stats()
+    }), 200
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """
+    Métricas no formato texto do Prometheus (latência por rota, status,
+    tempo de banco vs serialização, pool e cache)
+    GET /api/metrics
+    """
+    pool = get_db_pool().stats()
+    cache = response_cache.stats()
+    stream = event_broadcaster.stats()
+    gauges = {
+        'legion_db_pool_open': ('Conexões abertas no pool', pool['open']),
+        'legion_db_pool_in_use': ('Conexões em uso', pool['in_use']),
+        'legion_db_pool_waits_total': ('Esperas por conexão livre', pool['waits']),
+        'legion_db_pool_timeouts_total': ('Timeouts esperando conexão', pool['timeouts']),
+        'legion_cache_entries': ('Entradas no cache de respostas', cache['entries']),
+        'legion_cache_hits_total': ('Acertos do cache de respostas', cache['hits']),
+        'legion_cache_misses_total': ('Faltas do cache de respostas', cache['misses']),
+        'legion_stream_subscribers': ('Clientes conectados em /api/stream', stream['subscribers']),
+        'legion_stream_rejected_total': ('Conexões recusadas em /api/stream (limite de clientes)', stream['rejected']),
+        'legion_rate_limited_total': ('Requisições recusadas pelo rate limit (429)', sum(rate_limiter.stats()['limited'].values())),
+    }
+    lag = read_isolation_stats()['lag_seconds']
+    if lag is not None:
+        gauges['legion_read_lag_seconds'] = ('Atraso da leitura em relação ao banco do bot (réplica)', lag)
+    for name, limiter in concurrency_limiters.items():
+        stats = limiter.stats()
+        gauges[f'legion_admission_{name}_active'] = (f'Handlers ({name}) executando agora', stats['active'])
+        gauges[f'legion_admission_{name}_rejected_total'] = (f'Requisições ({name}) recusadas por concorrência (503)', stats['rejected'])
+    return Response(http_metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+def require_api_key(view):
+    """
+    Exige o header X-API-Key igual a config.API_KEY. Sem uma chave própria
+    configurada (vazia ou a de exemplo do repositório) a rota nem existe.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not config.API_KEY or config.API_KEY == config.API_KEY_PLACEHOLDER:
+            return jsonify({'error': 'Rota não encontrada'}), 404
+        provided = request.headers.get('X-API-Key', '')
+        if not hmac.compare_digest(provided, config.API_KEY):
+            return jsonify({'error': 'API key inválida ou ausente (header X-API-Key)'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/api/debug/slow-queries', methods=['GET', 'DELETE'])
+@require_api_key
+def debug_slow_queries():
+    """
+    Consultas SQL mais lentas que SLOW_QUERY_THRESHOLD_MS, com o plano
+    GET /api/debug/slow-queries     (header X-API-Key)
+    DELETE /api/debug/slow-queries  (limpa o buffer)
+    """
+    if slow_query_log is None:
+        return jsonify({'enabled': False, 'queries': []})
+    if request.method == 'DELETE':
+        slow_query_log.clear()
+    return jsonify({
+        'enabled': True,
+        **slow_query_log.stats(),
+        'queries': slow_query_log.records()
+    })
 
 @app.route('/api/debug/db-info', methods=['GET'])
 def debug_db_info():
@@ -663,10 +1712,23 @@ def debug_db_info():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def send_avatar(entry):
+    """Envia um avatar do cache em disco (com ETag e suporte a 304)"""
+    img_response = send_file(
+        entry.path,
+        mimetype=entry.content_type,
+        as_attachment=False,
+        etag=entry.etag,
+        conditional=True,
+        max_age=86400
+    )
+    img_response.headers['Access-Control-Allow-Origin'] = '*'
+    return img_response
+
 @app.route('/api/avatar/<discord_id>', methods=['GET'])
 def get_avatar(discord_id):
     """
-    Proxy para avatar do Discord
+    Proxy para avatar do Discord (com cache em disco)
     GET /api/avatar/123456789
     """
     try:
@@ -678,48 +1740,22 @@ def get_avatar(discord_id):
         conn.close()
         
         avatar_hash = row[0] if row else None
-        
-        # Gerar URL do avatar
-        if avatar_hash:
-            avatar_url = f"https://cdn.discordapp.com/avatars/{discord_id}/{avatar_hash}.png"
-        else:
-            default_avatar_id = int(discord_id) % 5
-            avatar_url = f"https://cdn.discordapp.com/embed/avatars/{default_avatar_id}.png"
-        
-        # Buscar a imagem do Discord
-        response = requests.get(avatar_url, timeout=10)
-        if response.ok:
-            img_response = send_file(
-                BytesIO(response.content),
-                mimetype=response.headers.get('content-type', 'image/png'),
-                as_attachment=False
-            )
-            img_response.headers['Cache-Control'] = 'public, max-age=86400'
-            img_response.headers['Access-Control-Allow-Origin'] = '*'
-            return img_response
-        
-        # Fallback se falhar
-        return redirect(avatar_url)
+        try:
+            return send_avatar(avatar_cache.get(discord_id, avatar_hash))
+        except FileNotFoundError:
+            # Outro worker apagou o arquivo entre a busca e o envio
+            return send_avatar(avatar_cache.get(discord_id, avatar_hash))
     
     except Exception as e:
-        print(f'Erro ao buscar avatar: {e}')
+        logger.exception('Erro ao buscar avatar')
         # Fallback para avatar padrão
-        default_avatar_id = int(discord_id) % 5
-        default_url = f"https://cdn.discordapp.com/embed/avatars/{default_avatar_id}.png"
         try:
-            response = requests.get(default_url, timeout=10)
-            img_response = send_file(
-                BytesIO(response.content),
-                mimetype='image/png',
-                as_attachment=False
-            )
-            img_response.headers['Cache-Control'] = 'public, max-age=86400'
-            img_response.headers['Access-Control-Allow-Origin'] = '*'
-            return img_response
-        except:
-            return redirect(default_url)
+            return send_avatar(avatar_cache.get(discord_id, None))
+        except Exception:
+            return redirect(avatar_cache.avatar_url(discord_id))
 
 @app.route('/api/achievements/<discord_id>', methods=['GET'])
+@validators.conditional(('achievements',), 'public, max-age=60')
 def get_player_achievements(discord_id):
     """
     Retorna as conquistas (achievements) de um jogador
@@ -729,49 +1765,80 @@ def get_player_achievements(discord_id):
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT achievement_name, description, value, unlocked_at, achievement_type
-            FROM achievements 
-            WHERE player_id = ?
-            ORDER BY unlocked_at DESC
-        ''', (discord_id,))
-        
-        achievements = [dict(row) for row in cursor.fetchall()]
+        achievements = load_achievements(cursor, discord_id)
         conn.close()
         
         return jsonify({
             'achievements': achievements,
             'total': len(achievements),
-            'ultima_atualizacao': datetime.now().isoformat() + 'Z'
+            'ultima_atualizacao': validators.changed_at(('achievements',))
         })
     
     except Exception as e:
-        print(f'Erro ao buscar achievements: {e}')
-        return jsonify({'error': str(e)}), 500
+        return error_response(e, 'Erro ao buscar achievements')
+
+_has_players_fts = False
+
+def players_fts_ready(conn):
+    """Indica se o índice FTS5 dos jogadores já foi criado pelas migrações"""
+    global _has_players_fts
+    if not _has_players_fts:
+        _has_players_fts = table_exists(conn, 'players_fts')
+    return _has_players_fts
 
 @app.route('/api/search', methods=['GET'])
+@validators.conditional(('players',), 'public, max-age=30')
 def search_players():
     """
-    Busca jogadores por nome
+    Busca jogadores por nome (Discord ou Lichess)
     GET /api/search?query=nome
+    GET /api/search?query=nome&mode=rapid
+
+    Resultados ordenados pela qualidade do casamento (nome exato, prefixo,
+    trecho) e depois pelo rating do modo (padrão: blitz).
     """
     query = request.args.get('query', '').strip().lower()
     if not query or len(query) < 2:
         return jsonify([])
     
+    mode = request.args.get('mode', 'blitz')
+    if mode not in VALID_MODES:
+        return jsonify({'error': f'Modo inválido. Use: {", ".join(VALID_MODES)}'}), 400
+    
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Search in discord_username, using blitz stats
-        cursor.execute('''
-            SELECT discord_id, discord_username, lichess_username, avatar_hash,
-                   rating_blitz, wins_blitz, losses_blitz, draws_blitz
-            FROM players
-            WHERE LOWER(discord_username) LIKE ?
-            ORDER BY rating_blitz DESC
+        select = f'''
+            SELECT p.discord_id, p.discord_username, p.lichess_username, p.avatar_hash,
+                   p.rating_{mode} AS rating, p.wins_{mode} AS wins,
+                   p.losses_{mode} AS losses, p.draws_{mode} AS draws,
+                   CASE
+                       WHEN LOWER(p.discord_username) = :q OR LOWER(p.lichess_username) = :q THEN 0
+                       WHEN SUBSTR(LOWER(p.discord_username), 1, LENGTH(:q)) = :q
+                         OR SUBSTR(LOWER(p.lichess_username), 1, LENGTH(:q)) = :q THEN 1
+                       ELSE 2
+                   END AS match_quality
+        '''
+        order = '''
+            ORDER BY match_quality, rating DESC
             LIMIT 10
-        ''', ('%' + query + '%',))
+        '''
+        
+        # O tokenizer trigram só indexa trechos de 3+ caracteres
+        if len(query) >= 3 and players_fts_ready(conn):
+            fts_query = '{discord_username lichess_username} : "' + query.replace('"', '""') + '"'
+            cursor.execute(select + '''
+                FROM players_fts f
+                JOIN players p ON p.rowid = f.rowid
+                WHERE players_fts MATCH :fts
+            ''' + order, {'q': query, 'fts': fts_query})
+        else:
+            cursor.execute(select + '''
+                FROM players p
+                WHERE INSTR(LOWER(p.discord_username), :q) > 0
+                   OR INSTR(LOWER(p.lichess_username), :q) > 0
+            ''' + order, {'q': query})
         
         rows = cursor.fetchall()
         conn.close()
@@ -779,8 +1846,8 @@ def search_players():
         results = []
         for row in rows:
             player_dict = dict(row)
-            total_games = (player_dict['wins_blitz'] or 0) + (player_dict['losses_blitz'] or 0) + (player_dict['draws_blitz'] or 0)
-            win_rate = round((player_dict['wins_blitz'] or 0) / total_games * 100, 1) if total_games > 0 else 0
+            total_games = (player_dict['wins'] or 0) + (player_dict['losses'] or 0) + (player_dict['draws'] or 0)
+            win_rate = round((player_dict['wins'] or 0) / total_games * 100, 1) if total_games > 0 else 0
             
             avatar_url = f'{request.host_url}api/avatar/{player_dict["discord_id"]}'
             
@@ -789,10 +1856,11 @@ def search_players():
                 'nome': player_dict['discord_username'],
                 'lichess_username': player_dict['lichess_username'],
                 'avatar_url': avatar_url,
-                'rating': player_dict['rating_blitz'] or 1200,
-                'vitorias': player_dict['wins_blitz'] or 0,
-                'derrotas': player_dict['losses_blitz'] or 0,
-                'empates': player_dict['draws_blitz'] or 0,
+                'modo': mode,
+                'rating': player_dict['rating'] or 1200,
+                'vitorias': player_dict['wins'] or 0,
+                'derrotas': player_dict['losses'] or 0,
+                'empates': player_dict['draws'] or 0,
                 'partidas_jogadas': total_games,
                 'win_rate': win_rate
             })
@@ -800,8 +1868,7 @@ def search_players():
         return jsonify(results)
     
     except Exception as e:
-        print(f'Erro na busca: {e}')
-        return jsonify({'error': str(e)}), 500
+        return error_response(e, 'Erro na busca')
 
 @app.errorhandler(404)
 def not_found(error):
@@ -812,9 +1879,12 @@ def server_error(error):
     return jsonify({'error': 'Erro no servidor'}), 500
 
 def run_api():
-    """Função para rodar a API em uma thread separada junto com o bot"""
-    port = int(os.environ.get("PORT", 8080)) # Discloud usa a porta 8080 ou a env PORT
-    app.run(debug=False, host='0.0.0.0', port=port)
+    """
+    Função para rodar a API em uma thread separada junto com o bot.
+    Em produção fora do bot use `python serve.py` (vários workers).
+    """
+    from serve import serve
+    serve(sys.modules[__name__], embedded=True)
 
 if __name__ == '__main__':
     # Verificar se banco existe, se não, criar
@@ -0,0 +1,309 @@
+"""
+Cache em disco dos avatares do Discord
+Cada avatar é guardado por (discord_id, avatar_hash) e revalidado no CDN
+com ETag/If-Modified-Since quando fica velho
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import SingleFlight
+
+
+class AvatarUnavailable(Exception):
+    """O CDN não devolveu o avatar e não há cópia local"""
+
+
+class AvatarEntry:
+    """Avatar disponível no disco"""
+
+    def __init__(self, path, content_type, etag, size, fetched_at):
+        self.path = path
+        self.content_type = content_type
+        self.etag = etag
+        self.size = size
+        self.fetched_at = fetched_at
+        self.last_used = fetched_at
+
+    def to_meta(self):
+        return {
+            'content_type': self.content_type,
+            'etag': self.etag,
+            'size': self.size,
+            'fetched_at': self.fetched_at,
+        }
+
+
+class AvatarCache:
+    """
+    Cache de avatares em disco limitado por tamanho total.
+
+    `fetcher(url, headers)` faz a requisição ao CDN e retorna
+    (status, conteúdo, headers); por padrão usa uma requests.Session com
+    keep-alive. Pode ser trocado por um stub local nos testes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=128 * 1024 * 1024, fresh_for=86400,
+                 cdn_base='https://cdn.discordapp.com', timeout=10, fetcher=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fresh_for = fresh_for
+        self.cdn_base = cdn_base.rstrip('/')
+        self.timeout = timeout
+        self.fetcher = fetcher or self._http_fetch
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._entries = {}
+        self._upstream_meta = {}
+        self._total_bytes = 0
+        self._loaded = False
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.errors = 0
+
+    # ------------------------------------------
+    # URLs e chaves
+    # ------------------------------------------
+
+    def avatar_url(self, discord_id, avatar_hash=None):
+        """URL do avatar no CDN (ou de um dos 5 avatares padrão)"""
+        if avatar_hash:
+            return f'{self.cdn_base}/avatars/{discord_id}/{avatar_hash}.png'
+        default_avatar_id = int(discord_id) % 5
+        return f'{self.cdn_base}/embed/avatars/{default_avatar_id}.png'
+
+    def _key(self, discord_id, avatar_hash):
+        raw = f'{discord_id}:{avatar_hash or "default"}'
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + '.img', base + '.json'
+
+    # ------------------------------------------
+    # Índice em memória
+    # ------------------------------------------
+
+    def _load(self):
+        """Carrega o índice do que já está no disco (uma vez)"""
+        with self._lock:
+            if self._loaded:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if not name.endswith('.json'):
+                        continue
+                    key = name[:-5]
+                    img_path, meta_path = self._paths(key)
+                    try:
+                        with open(meta_path, encoding='utf-8') as f:
+                            meta = json.load(f)
+                        size = os.path.getsize(img_path)
+                    except (OSError, ValueError):
+                        continue
+                    self._entries[key] = AvatarEntry(
+                        img_path, meta['content_type'], meta['etag'], size, meta['fetched_at']
+                    )
+                    self._upstream_meta[key] = meta.get('upstream', {})
+                    self._total_bytes += size
+            self._loaded = True
+
+    def _load_entry(self, key):
+        """
+        Procura no disco um avatar que não está no índice em memória
+        (gravado por outro processo, p.ex. outro worker do gunicorn)
+        """
+        img_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            size = os.path.getsize(img_path)
+        except (OSError, ValueError):
+            return None
+        entry = AvatarEntry(img_path, meta['content_type'], meta['etag'], size, meta['fetched_at'])
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            self._entries[key] = entry
+            self._upstream_meta[key] = meta.get('upstream', {})
+            self._total_bytes += size
+        return entry
+
+    def _forget(self, key, entry):
+        """Tira do índice uma entrada cujo arquivo não existe mais"""
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                return
+            del self._entries[key]
+            self._upstream_meta.pop(key, None)
+            self._total_bytes -= entry.size
+
+    # ------------------------------------------
+    # Busca
+    # ------------------------------------------
+
+    def _http_fetch(self, url, headers):
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        return response.status_code, response.content, response.headers
+
+    def get(self, discord_id, avatar_hash=None):
+        """
+        Retorna o AvatarEntry do avatar, buscando/revalidando no CDN se
+        necessário. Misses simultâneos do mesmo avatar fazem uma única busca.
+        """
+        self._load()
+        key = self._key(discord_id, avatar_hash)
+
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and not os.path.exists(entry.path):
+            # Apagado do disco pelo despejo de outro processo: busca de novo
+            self._forget(key, entry)
+            entry = None
+        if entry is None:
+            entry = self._load_entry(key)
+
+        with self._lock:
+            if entry is not None and time.time() - entry.fetched_at < self.fresh_for:
+                self.hits += 1
+                entry.last_used = time.time()
+                return entry
+
+        url = self.avatar_url(discord_id, avatar_hash)
+        return self._flight.do(key, lambda: self._fetch(key, url))
+
+    def _fetch(self, key, url):
+        with self._lock:
+            entry = self._entries.get(key)
+            upstream = dict(self._upstream_meta.get(key, {}))
+            self.misses += 1
+
+        headers = {}
+        if entry is not None:
+            if upstream.get('etag'):
+                headers['If-None-Match'] = upstream['etag']
+            if upstream.get('last_modified'):
+                headers['If-Modified-Since'] = upstream['last_modified']
+
+        try:
+            status, content, response_headers = self.fetcher(url, headers)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            if entry is not None:
+                return entry
+            raise AvatarUnavailable(f'Falha ao buscar {url}: {e}')
+
+        if status == 304 and entry is not None:
+            entry.fetched_at = time.time()
+            self._write_meta(key, entry, upstream)
+            with self._lock:
+                self.revalidated += 1
+            return entry
+
+        if status != 200:
+            with self._lock:
+                self.errors += 1
+            if entry is not None:
+                return entry
+            raise AvatarUnavailable(f'CDN respondeu {status} para {url}')
+
+        upstream = {
+            'etag': response_headers.get('ETag'),
+            'last_modified': response_headers.get('Last-Modified'),
+        }
+        return self._store(key, content, response_headers.get('Content-Type', 'image/png'), upstream)
+
+    # ------------------------------------------
+    # Disco
+    # ------------------------------------------
+
+    def _write_meta(self, key, entry, upstream):
+        _, meta_path = self._paths(key)
+        meta = entry.to_meta()
+        meta['upstream'] = upstream
+        tmp_path = f'{meta_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def _store(self, key, content, content_type, upstream):
+        img_path, _ = self._paths(key)
+        os.makedirs(os.path.dirname(img_path), exist_ok=True)
+
+        tmp_path = f'{img_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, img_path)
+
+        entry = AvatarEntry(
+            img_path,
+            content_type,
+            hashlib.sha256(content).hexdigest()[:32],
+            len(content),
+            time.time(),
+        )
+        self._write_meta(key, entry, upstream)
+
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None:
+                self._total_bytes -= old.size
+            self._entries[key] = entry
+            self._upstream_meta[key] = upstream
+            self._total_bytes += entry.size
+        self._evict(keep=key)
+        return entry
+
+    def _evict(self, keep=None):
+        """Remove os avatares usados há mais tempo até caber em max_bytes"""
+        with self._lock:
+            if self._total_bytes <= self.max_bytes:
+                return
+            victims = sorted(
+                (entry.last_used, key) for key, entry in self._entries.items() if key != keep
+            )
+            removed = []
+            for _, key in victims:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                entry = self._entries.pop(key)
+                self._upstream_meta.pop(key, None)
+                self._total_bytes -= entry.size
+                removed.append(key)
+
+        for key in removed:
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+                'errors': self.errors,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0,
+            }
@@ -0,0 +1,213 @@
+"""
+Pré-aquecimento do cache de avatares
+Busca em segundo plano os avatares do topo de cada ranking e os que mudaram
+de avatar_hash, antes que algum visitante precise deles
+"""
+
+import heapq
+import queue
+import threading
+import time
+from collections import deque
+
+from migrations import MODES, ranking_filter
+from log_config import get_logger
+
+logger = get_logger('avatars')
+
+
+class AvatarPrewarmer:
+    """
+    Observa a tabela players e enfileira avatares para buscar.
+
+    `connect()` deve retornar uma conexão de leitura (fechada com close()),
+    `data_version()` um token que muda quando o banco muda e `fetch(discord_id,
+    avatar_hash)` busca o avatar (por padrão AvatarCache.get).
+    """
+
+    def __init__(self, avatar_cache, connect, data_version, fetch=None, top_n=50,
+                 workers=4, interval=30, max_retries=3, backoff=5):
+        self.avatar_cache = avatar_cache
+        self.connect = connect
+        self.data_version = data_version
+        self.fetch = fetch or avatar_cache.get
+        self.top_n = top_n
+        self.workers = workers
+        self.interval = interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._retries = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+        self._known_hashes = None
+        self._known_top = set()
+        self._last_version = None
+
+        self._latencies = deque(maxlen=200)
+        self.fetched = 0
+        self.failed = 0
+        self.retried = 0
+        self.scans = 0
+        self.in_flight = 0
+
+    # ------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        watcher = threading.Thread(target=self._watch_loop, name='avatar-prewarm-watch', daemon=True)
+        self._threads.append(watcher)
+        for i in range(self.workers):
+            worker = threading.Thread(target=self._work_loop, name=f'avatar-prewarm-{i}', daemon=True)
+            self._threads.append(worker)
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=5):
+        if not self._threads:
+            return
+        self._stop.set()
+        for _ in range(self.workers):
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # ------------------------------------------
+    # Observação do banco
+    # ------------------------------------------
+
+    def scan(self):
+        """Compara players com o último estado visto e enfileira o que mudou"""
+        conn = self.connect()
+        try:
+            hashes = {
+                row[0]: row[1]
+                for row in conn.execute('SELECT discord_id, avatar_hash FROM players')
+            }
+            top = set()
+            for mode in MODES:
+                rows = conn.execute(f'''
+                    SELECT discord_id FROM players
+                    WHERE {ranking_filter(mode)}
+                    ORDER BY rating_{mode} DESC, discord_id ASC
+                    LIMIT ?
+                ''', (self.top_n,))
+                top.update(row[0] for row in rows)
+        finally:
+            conn.close()
+
+        if self._known_hashes is None:
+            # Primeira varredura: aquece só o topo dos rankings
+            targets = top
+        else:
+            changed = {
+                discord_id for discord_id, avatar_hash in hashes.items()
+                if discord_id in self._known_hashes and self._known_hashes[discord_id] != avatar_hash
+            }
+            targets = changed | (top - self._known_top)
+
+        self._known_hashes = hashes
+        self._known_top = top
+        self.scans += 1
+
+        for discord_id in targets:
+            self.enqueue(discord_id, hashes.get(discord_id))
+        return len(targets)
+
+    def enqueue(self, discord_id, avatar_hash, attempt=0):
+        key = (discord_id, avatar_hash)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._queue.put((discord_id, avatar_hash, attempt))
+
+    def _watch_loop(self):
+        next_scan = 0
+        while not self._stop.is_set():
+            now = time.monotonic()
+
+            with self._lock:
+                due = []
+                while self._retries and self._retries[0][0] <= now:
+                    due.append(heapq.heappop(self._retries)[1])
+            for discord_id, avatar_hash, attempt in due:
+                self.enqueue(discord_id, avatar_hash, attempt)
+
+            if now >= next_scan:
+                next_scan = now + self.interval
+                try:
+                    version = self.data_version()
+                    if version != self._last_version:
+                        self.scan()
+                        self._last_version = version
+                except Exception as e:
+                    logger.warning('Pre-aquecimento de avatares: %s', e)
+
+            self._stop.wait(1)
+
+    # ------------------------------------------
+    # Workers
+    # ------------------------------------------
+
+    def _work_loop(self):
+        while not self._stop.is_set():
+            item = self._queue.get()
+            if item is None:
+                break
+            discord_id, avatar_hash, attempt = item
+            with self._lock:
+                self._pending.discard((discord_id, avatar_hash))
+                self.in_flight += 1
+
+            start = time.monotonic()
+            try:
+                self.fetch(discord_id, avatar_hash)
+                with self._lock:
+                    self.fetched += 1
+                    self._latencies.append(time.monotonic() - start)
+            except Exception:
+                with self._lock:
+                    if attempt < self.max_retries:
+                        self.retried += 1
+                        due = time.monotonic() + self.backoff * (2 ** attempt)
+                        heapq.heappush(self._retries, (due, (discord_id, avatar_hash, attempt + 1)))
+                    else:
+                        self.failed += 1
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            retry_backlog = len(self._retries)
+            fetched, failed, retried, in_flight = self.fetched, self.failed, self.retried, self.in_flight
+
+        def percentile(p):
+            if not latencies:
+                return 0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1)
+
+        return {
+            'running': bool(self._threads),
+            'queue_depth': self._queue.qsize(),
+            'retry_backlog': retry_backlog,
+            'in_flight': in_flight,
+            'scans': self.scans,
+            'fetched': fetched,
+            'failed': failed,
+            'retried': retried,
+            'fetch_ms_p50': percentile(0.50),
+            'fetch_ms_p95': percentile(0.95),
+            'cache_hit_ratio': self.avatar_cache.stats()['hit_ratio'],
+        }
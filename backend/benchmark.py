@@ -0,0 +1,431 @@
+"""
+Benchmark da API
+Dispara requisições em todos os endpoints de leitura contra um banco real ou
+sintético, pelo test client do Flask (custo do app, sem rede) e/ou por um
+servidor HTTP de verdade com concorrência. Mostra vazão e p50/p95/p99 por
+endpoint e salva o resultado em JSON para comparar execuções.
+
+Uso:
+    python benchmark.py --scale small
+    python benchmark.py --db ../legion_chess.db --mode http --concurrency 16
+    python benchmark.py --scale medium --output depois.json --baseline antes.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+import synthetic_db
+
+MODES = ('bullet', 'blitz', 'rapid', 'classic')
+RUN_MODES = ('testclient', 'http', 'both')
+PERCENTILES = (50, 95, 99)
+
+
+# ==========================================
+# ENDPOINTS
+# ==========================================
+
+def sample_ids(db_path, count, seed):
+    """IDs de jogadores para as rotas por jogador: os mais ativos e alguns aleatórios"""
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        active = [row[0] for row in conn.execute('''
+            SELECT player1_id FROM game_history
+            GROUP BY player1_id ORDER BY COUNT(*) DESC LIMIT ?
+        ''', (count,))]
+        everyone = [row[0] for row in conn.execute('SELECT discord_id FROM players')]
+    finally:
+        conn.close()
+    rng = random.Random(seed)
+    return active + rng.sample(everyone, min(count, len(everyone)))
+
+
+def ranking_pages(flask_app, limit=100):
+    """
+    Primeira e segunda página de cada ranking. A paginação é por keyset:
+    a segunda página usa o next_cursor devolvido pela primeira
+    """
+    client = flask_app.test_client()
+    urls = []
+    for mode in MODES:
+        first = f'/api/ranking/{mode}?limit={limit}'
+        urls.append(first)
+        next_cursor = client.get(first).get_json().get('next_cursor')
+        if next_cursor:
+            urls.append(f'{first}&cursor={quote(next_cursor)}')
+    return urls
+
+
+def build_endpoints(ids, seed, ranking_page_urls):
+    """
+    {rota: [urls]}: cada rota é exercitada com várias URLs (jogadores e
+    parâmetros diferentes) para não medir só o caso que já está em cache.
+    Avatares ficam de fora (dependem do CDN do Discord).
+    """
+    rng = random.Random(seed)
+    some = lambda k: [rng.choice(ids) for _ in range(k)]
+    return {
+        '/api/ranking/<mode>': [f'/api/ranking/{mode}' for mode in MODES]
+                               + ranking_page_urls,
+        '/api/ranking/<mode>/position/<id>': [f'/api/ranking/{rng.choice(MODES)}/position/{i}' for i in some(20)],
+        '/api/jogador/<id>': [f'/api/jogador/{i}' for i in some(20)],
+        '/api/jogador/<id>/bundle': [f'/api/jogador/{i}/bundle' for i in some(20)],
+        '/api/jogador/<id>/rating-history': [f'/api/jogador/{i}/rating-history' for i in some(20)],
+        '/api/jogador/<id>/breakdown': [f'/api/jogador/{i}/breakdown' for i in some(20)],
+        '/api/jogadores': [f'/api/jogadores?ids={",".join(some(20))}' for _ in range(10)],
+        '/api/historico/<id>': [f'/api/historico/{i}' for i in some(20)],
+        '/api/h2h/<a>/<b>': [f'/api/h2h/{a}/{b}' for a, b in zip(some(20), some(20)) if a != b],
+        '/api/achievements/<id>': [f'/api/achievements/{i}' for i in some(20)],
+        '/api/search': [f'/api/search?query={q}' for q in ('jog', 'jogador_00', 'li_jog', '0001', '_000')],
+        '/api/stats-gerais': ['/api/stats-gerais'],
+        '/api/tournaments/in-progress': ['/api/tournaments/in-progress'],
+        '/api/tournaments/swiss': ['/api/tournaments/swiss'],
+        '/api/health': ['/api/health'],
+        '/api/metrics': ['/api/metrics'],
+    }
+
+
+# ==========================================
+# CLIENTES
+# ==========================================
+
+class TestClientRunner:
+    """Requisições direto no WSGI app (um test client por thread)"""
+
+    name = 'testclient'
+
+    def __init__(self, flask_app):
+        self.app = flask_app
+        self._local = threading.local()
+
+    def get(self, url):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.get(url)
+        response.get_data()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class HTTPRunner:
+    """Servidor HTTP real em uma porta livre, com uma sessão keep-alive por thread"""
+
+    name = 'http'
+
+    def __init__(self, flask_app, server, threads):
+        import requests
+        self._requests = requests
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+        self.server_name = server
+        self._server, port = self._start(flask_app, server, threads)
+        self.base_url = f'http://127.0.0.1:{port}'
+
+    def _start(self, flask_app, server, threads):
+        if server == 'waitress':
+            from waitress.server import create_server
+            httpd = create_server(flask_app, host='127.0.0.1', port=0, threads=threads, ident='legion-chess-bench')
+            port = httpd.effective_port
+            self._thread = threading.Thread(target=httpd.run, daemon=True)
+        else:
+            from werkzeug.serving import make_server
+            logging.getLogger('werkzeug').setLevel(logging.WARNING)  # sem log por requisição
+            httpd = make_server('127.0.0.1', 0, flask_app, threaded=True)
+            port = httpd.server_port
+            self._thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return httpd, port
+
+    def get(self, url):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+            with self._sessions_lock:
+                self._sessions.append(session)
+        response = session.get(self.base_url + url, timeout=60)
+        return response.status_code
+
+    def close(self):
+        for session in self._sessions:
+            session.close()
+        if self.server_name == 'waitress':
+            self._server.close()
+        else:
+            self._server.shutdown()
+        self._thread.join(timeout=5)
+
+
+# ==========================================
+# MEDIÇÃO
+# ==========================================
+
+def percentile(sorted_values, pct):
+    """Percentil pelo método nearest-rank (valores já ordenados)"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, wall):
+    ordered = sorted(latencies)
+    count = len(ordered)
+    stats = {
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': round(count / wall, 1) if wall > 0 else None,
+        'mean_ms': round(sum(ordered) / count * 1000, 3) if count else None,
+        'max_ms': round(ordered[-1] * 1000, 3) if count else None,
+    }
+    for pct in PERCENTILES:
+        value = percentile(ordered, pct)
+        stats[f'p{pct}_ms'] = round(value * 1000, 3) if value is not None else None
+    return stats
+
+
+def run_endpoint(runner, urls, requests_per_endpoint, concurrency, warmup):
+    """Executa `requests_per_endpoint` requisições distribuídas entre as threads"""
+    for url in urls[:warmup] if warmup else ():
+        runner.get(url)
+
+    plan = [urls[i % len(urls)] for i in range(requests_per_endpoint)]
+    latencies = [None] * len(plan)
+    errors = [0]
+    errors_lock = threading.Lock()
+    counter = iter(range(len(plan)))
+    counter_lock = threading.Lock()
+
+    def worker():
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                status = runner.get(plan[i])
+            except Exception:
+                status = None
+            latencies[i] = time.perf_counter() - start
+            if status is None or status >= 400:
+                with errors_lock:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - started
+    return summarize(latencies, errors[0], wall)
+
+
+def run_all(runner, endpoints, args):
+    results = {}
+    for route, urls in endpoints.items():
+        stats = run_endpoint(runner, urls, args.requests, args.concurrency, args.warmup)
+        results[route] = stats
+        print_row(route, stats)
+    return results
+
+
+# ==========================================
+# RELATÓRIO
+# ==========================================
+
+def print_header(title):
+    print(f'\n== {title} ==')
+    print(f'{"endpoint":<40} {"req/s":>9} {"p50":>8} {"p95":>8} {"p99":>8} {"max":>8} {"erros":>6}')
+
+
+def fmt_ms(value):
+    return '-' if value is None else f'{value:.2f}'
+
+
+def print_row(route, stats):
+    print(
+        f'{route:<40} {stats["throughput_rps"] or 0:>9.1f} {fmt_ms(stats["p50_ms"]):>8} '
+        f'{fmt_ms(stats["p95_ms"]):>8} {fmt_ms(stats["p99_ms"]):>8} {fmt_ms(stats["max_ms"]):>8} '
+        f'{stats["errors"]:>6}'
+    )
+
+
+def compare(current, baseline, tolerance):
+    """
+    Compara p50/p95 de cada endpoint com a execução base.
+    Retorna a lista de regressões acima de `tolerance` (%).
+    """
+    regressions = []
+    for run_mode, routes in current['results'].items():
+        base_routes = baseline.get('results', {}).get(run_mode)
+        if not base_routes:
+            continue
+        print(f'\n== Comparação com a base ({run_mode}) ==')
+        print(f'{"endpoint":<40} {"p50 base":>9} {"p50":>8} {"Δ%":>7} {"p95 base":>9} {"p95":>8} {"Δ%":>7}')
+        for route, stats in routes.items():
+            base = base_routes.get(route)
+            if not base:
+                continue
+            deltas = {}
+            for key in ('p50_ms', 'p95_ms'):
+                if base.get(key) and stats.get(key) is not None:
+                    deltas[key] = (stats[key] - base[key]) / base[key] * 100
+            flag = ' <-- regressão' if any(d > tolerance for d in deltas.values()) else ''
+            print(
+                f'{route:<40} {fmt_ms(base.get("p50_ms")):>9} {fmt_ms(stats["p50_ms"]):>8} '
+                f'{deltas.get("p50_ms", 0):>+7.1f} {fmt_ms(base.get("p95_ms")):>9} '
+                f'{fmt_ms(stats["p95_ms"]):>8} {deltas.get("p95_ms", 0):>+7.1f}{flag}'
+            )
+            if flag:
+                regressions.append({'mode': run_mode, 'route': route, **{k: round(v, 1) for k, v in deltas.items()}})
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def table_counts(db_path):
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        return {
+            table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            for table in ('players', 'game_history', 'achievements', 'swiss_tournaments', 'swiss_participants')
+        }
+    finally:
+        conn.close()
+
+
+# ==========================================
+# MAIN
+# ==========================================
+
+def prepare_database(args):
+    """Usa --db ou gera (e reaproveita) um banco sintético da escala pedida"""
+    if args.db:
+        return os.path.abspath(args.db)
+    cache_dir = os.path.join(tempfile.gettempdir(), 'legion-chess-bench')
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f'{args.scale}-{args.seed}.db')
+    if not os.path.exists(path) or args.regenerate:
+        players, games, achievements, tournaments, participants = synthetic_db.SCALES[args.scale]
+        print(f'[INFO] Gerando banco sintético ({args.scale}) em {path}')
+        synthetic_db.generate(
+            path, players=players, games=games, achievements=achievements,
+            tournaments=tournaments, participants=participants, seed=args.seed, overwrite=True,
+        )
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos endpoints da API Legion Chess')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--db', help='Banco a usar (padrão: gera um sintético)')
+    source.add_argument('--scale', choices=synthetic_db.SCALES, default='small', help='Escala do banco sintético')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--regenerate', action='store_true', help='Gera o banco sintético de novo')
+    parser.add_argument('--mode', choices=RUN_MODES, default='both', help='test client, HTTP ou ambos')
+    parser.add_argument('--server', choices=('waitress', 'werkzeug'), default='waitress', help='Servidor no modo http')
+    parser.add_argument('--requests', type=int, default=200, help='Requisições por endpoint')
+    parser.add_argument('--concurrency', type=int, default=8, help='Clientes simultâneos')
+    parser.add_argument('--warmup', type=int, default=5, help='Requisições de aquecimento por endpoint')
+    parser.add_argument('--no-cache', action='store_true', help='Desliga o cache de respostas do app')
+    parser.add_argument('--endpoints', help='Só as rotas que contêm este texto (ex: ranking)')
+    parser.add_argument('--output', help='Salva o resultado em JSON')
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--tolerance', type=float, default=10.0, help='Piora tolerada em %% antes de acusar regressão')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Sai com código 1 se houver regressão')
+    args = parser.parse_args()
+
+    db_path = prepare_database(args)
+    os.environ['LEGION_DB_PATH'] = db_path
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    import config
+    if args.no_cache:
+        config.CACHE_ENABLED = False
+    config.AVATAR_PREWARM_ENABLED = False
+    import app as api
+    api.init_database()
+
+    endpoints = build_endpoints(sample_ids(db_path, 10, args.seed), args.seed, ranking_pages(api.app))
+    if args.endpoints:
+        endpoints = {route: urls for route, urls in endpoints.items() if args.endpoints in route}
+
+    report = {
+        'meta': {
+            'started_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'db': db_path,
+            'scale': None if args.db else args.scale,
+            'tables': table_counts(db_path),
+            'requests_per_endpoint': args.requests,
+            'concurrency': args.concurrency,
+            'cache': not args.no_cache,
+            'server': args.server if args.mode != 'testclient' else None,
+        },
+        'results': {},
+    }
+
+    run_modes = ('testclient', 'http') if args.mode == 'both' else (args.mode,)
+    for run_mode in run_modes:
+        if run_mode == 'testclient':
+            runner = TestClientRunner(api.app)
+            print_header('test client (sem rede)')
+        else:
+            runner = HTTPRunner(api.app, args.server, args.concurrency)
+            print_header(f'HTTP ({args.server}, {args.concurrency} clientes)')
+        try:
+            report['results'][run_mode] = run_all(runner, endpoints, args)
+        finally:
+            runner.close()
+
+    api.stop_background_workers()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        report['regressions'] = regressions
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'\n[OK] Resultado salvo em {args.output}')
+
+    if regressions:
+        print(f'[WARN] {len(regressions)} endpoint(s) acima da tolerância de {args.tolerance:.0f}%')
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
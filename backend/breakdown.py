@@ -0,0 +1,133 @@
+"""
+Desempenho de um jogador por faixa de rating do oponente, por time control
+e por oponente
+Uma única agregação sobre as partidas do jogador em player_games (agrupada
+por oponente, time control e faixa) é consolidada nos três recortes
+"""
+
+from collections import namedtuple
+
+from migrations import PLAYER_GAMES_STAMP
+
+# Soma de uma combinação (oponente, time control, faixa) vinda do SQL
+Group = namedtuple('Group', (
+    'opponent_id', 'opponent_name', 'time_control', 'band',
+    'games', 'wins', 'draws', 'losses', 'rating_delta',
+    'rated_games', 'rated_score', 'opponent_rating_sum',
+))
+
+
+def player_games_filter(player_id, mode):
+    sql = 'WHERE player_id = ?'
+    params = [player_id]
+    if mode:
+        sql += ' AND mode = ?'
+        params.append(mode)
+    return sql, params
+
+
+def player_stamp(conn, player_id, mode=None, source=''):
+    """Carimbo das partidas do jogador: muda com partida nova, substituída ou editada"""
+    where, params = player_games_filter(player_id, mode)
+    return tuple(conn.execute(f'{source} SELECT {PLAYER_GAMES_STAMP} FROM player_games {where}', params).fetchone())
+
+
+def load_groups(conn, player_id, mode, band_width, source=''):
+    """
+    Agregação das partidas do jogador por (oponente, time control, faixa).
+    `source` é o prefixo das consultas em player_games
+    """
+    where, params = player_games_filter(player_id, mode)
+    rows = conn.execute(f'''
+        {source}
+        SELECT opponent_id,
+               MAX(opponent_name),
+               time_control,
+               CASE WHEN opponent_rating_before > 0
+                    THEN opponent_rating_before / ? * ? END AS band,
+               COUNT(*),
+               SUM(result = 'win'),
+               SUM(result = 'draw'),
+               SUM(result = 'loss'),
+               TOTAL(rating_delta),
+               SUM(opponent_rating_before > 0),
+               TOTAL(CASE WHEN opponent_rating_before > 0
+                          THEN (result = 'win') + (result = 'draw') * 0.5 END),
+               TOTAL(CASE WHEN opponent_rating_before > 0 THEN opponent_rating_before END)
+        FROM player_games {where}
+        GROUP BY opponent_id, time_control, band
+    ''', [band_width, band_width, *params]).fetchall()
+    return [Group(*row) for row in rows]
+
+
+class Totals:
+    __slots__ = ('games', 'wins', 'draws', 'losses', 'rating_delta',
+                 'rated_games', 'rated_score', 'opponent_rating_sum')
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def add(self, group):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + (getattr(group, name) or 0))
+
+    def to_dict(self):
+        """Placar, pontuação (%) e performance rating do recorte"""
+        avg_opponent = self.opponent_rating_sum / self.rated_games if self.rated_games else None
+        performance = None
+        if self.rated_games:
+            # Performance linear: média dos oponentes + 400 * (V - D) / N
+            rated_wins_minus_losses = 2 * self.rated_score - self.rated_games
+            performance = round(avg_opponent + 400 * rated_wins_minus_losses / self.rated_games)
+        score = self.wins + self.draws / 2
+        return {
+            'partidas': self.games,
+            'vitorias': self.wins,
+            'derrotas': self.losses,
+            'empates': self.draws,
+            'pontuacao': round(score / self.games * 100, 1) if self.games else 0,
+            'rating_medio_oponentes': round(avg_opponent) if avg_opponent is not None else None,
+            'performance': performance,
+            'rating_delta': int(self.rating_delta),
+        }
+
+
+def compute_breakdown(conn, player_id, mode=None, band_width=200, top_opponents=20, source=''):
+    """Consolida a agregação do jogador em geral, faixas, time controls e oponentes"""
+    overall = Totals()
+    bands, time_controls, opponents, names = {}, {}, {}, {}
+
+    for group in load_groups(conn, player_id, mode, band_width, source):
+        overall.add(group)
+        bands.setdefault(group.band, Totals()).add(group)
+        time_controls.setdefault(group.time_control, Totals()).add(group)
+        opponents.setdefault(group.opponent_id, Totals()).add(group)
+        names[group.opponent_id] = group.opponent_name
+
+    por_faixa = []
+    for band in sorted(bands, key=lambda b: (b is None, b or 0)):
+        entry = {'faixa': f'{band}-{band + band_width - 1}' if band is not None else 'sem rating',
+                 'rating_min': band,
+                 'rating_max': band + band_width - 1 if band is not None else None}
+        entry.update(bands[band].to_dict())
+        por_faixa.append(entry)
+
+    por_time_control = [
+        {'time_control': tc, **totals.to_dict()}
+        for tc, totals in sorted(time_controls.items(), key=lambda item: -item[1].games)
+    ]
+
+    ranked_opponents = sorted(opponents.items(), key=lambda item: (-item[1].games, item[0] or ''))
+    por_oponente = [
+        {'oponente_id': opponent_id, 'oponente_nome': names[opponent_id], **totals.to_dict()}
+        for opponent_id, totals in ranked_opponents[:top_opponents]
+    ]
+
+    return {
+        'geral': overall.to_dict(),
+        'por_faixa_rating': por_faixa,
+        'por_time_control': por_time_control,
+        'por_oponente': por_oponente,
+        'total_oponentes': len(opponents),
+    }
@@ -0,0 +1,185 @@
+"""
+Cache de respostas do Backend
+LRU limitado por número de entradas, invalidado pela versão dos dados do banco
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class SingleFlight:
+    """
+    Garante que apenas uma thread execute `fn` por chave ao mesmo tempo.
+    As demais esperam e recebem o mesmo resultado (ou a mesma exceção).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['event'].set()
+
+
+class ResponseCache:
+    """
+    Cache LRU de payloads já calculados.
+
+    Cada entrada guarda a versão dos dados com que foi calculada; se a versão
+    atual do banco for outra a entrada é descartada na hora. O TTL serve só
+    como garantia extra. Misses simultâneos da mesma chave são agrupados em
+    uma única execução do builder.
+    """
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry_version, expires_at, value = entry
+            if entry_version != version or time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def get_or_compute(self, key, version, builder):
+        """Retorna o valor em cache para (key, version) ou calcula com builder()"""
+        entry = self._lookup(key, version)
+        if entry is not None:
+            with self._lock:
+                self.hits += 1
+            return entry[2]
+
+        def compute():
+            # Outra thread pode ter preenchido a entrada enquanto esperávamos
+            entry = self._lookup(key, version)
+            if entry is not None:
+                return entry[2]
+            with self._lock:
+                self.misses += 1
+            value = builder()
+            self.set(key, version, value)
+            return value
+
+        return self._flight.do((key, version), compute)
+
+    def set(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'coalesced': self._flight.coalesced,
+            }
+
+
+class StampedCache:
+    """
+    LRU de valores que dependem só de uma parte do banco (ex: as partidas
+    de um jogador).
+
+    Com a mesma versão dos dados o valor é devolvido direto. Se o banco
+    mudou, `stamp()` (uma consulta barata, ex: COUNT/MAX pelo índice) diz
+    se aquela parte mudou; só então o valor é recalculado com build(stamp).
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.revalidated = 0
+        self.rebuilds = 0
+
+    def get(self, key, version, stamp, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry[0] == version:
+                    self.hits += 1
+                    return entry[2]
+
+        return self._flight.do(key, lambda: self._refresh(key, entry, version, stamp, build))
+
+    def _refresh(self, key, entry, version, stamp, build):
+        current = stamp()
+        if entry is not None and entry[1] == current:
+            value = entry[2]
+            with self._lock:
+                self.revalidated += 1
+        else:
+            value = build(current)
+            with self._lock:
+                self.rebuilds += 1
+
+        with self._lock:
+            self._entries[key] = (version, current, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'revalidated': self.revalidated,
+                'rebuilds': self.rebuilds,
+            }
@@ -26,6 +26,24 @@ CORS_ORIGINS = [
     'http://localhost:8000',  # Se abrir via servidor local
 ]
 
+# ==========================================
+# SERVIDOR DE PRODUÇÃO (serve.py)
+# ==========================================
+
+# auto = gunicorn no Linux (vários processos), waitress no Windows;
+# ou force com 'gunicorn', 'waitress' ou 'werkzeug'
+SERVER_BACKEND = os.environ.get('SERVER_BACKEND', 'auto')
+SERVER_HOST = os.environ.get('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.environ.get('PORT', 8080))  # Discloud usa a porta 8080 ou a env PORT
+SERVER_WORKERS = int(os.environ.get('WEB_CONCURRENCY', min(2 * (os.cpu_count() or 1) + 1, 8)))
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 8))  # Threads por worker
+SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT', 60))  # Worker travado é reiniciado
+SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30))  # Tempo para terminar requisições ao parar
+SERVER_KEEPALIVE = 5
+# Recicla cada worker após N requisições (com jitter para não reiniciarem juntos)
+SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', 5000))
+SERVER_MAX_REQUESTS_JITTER = 500
+
 # ==========================================
 # MODO DE OPERAÇÃO
 # ==========================================
@@ -38,16 +56,117 @@ USE_REAL_DATABASE = True
 # LOGGING
 # ==========================================
 
-LOG_LEVEL = 'DEBUG'  # DEBUG, INFO, WARNING, ERROR
-LOG_FILE = None  # None = não salvar em arquivo
-                 # ou 'app.log' = salvar aqui
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')  # DEBUG, INFO, WARNING, ERROR
+LOG_FILE = os.environ.get('LOG_FILE')  # None = não salvar em arquivo
+                                       # ou 'app.log' = salvar aqui (rotativo)
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')  # text ou json (uma linha JSON por evento)
+
+# Latência por rota, banco vs serialização, exposto em /api/metrics
+METRICS_ENABLED = True
+
+# Consultas acima do limite ficam em /api/debug/slow-queries (exige API_KEY)
+SLOW_QUERY_LOG_ENABLED = os.environ.get('SLOW_QUERY_LOG', '0') == '1'
+SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 50))
+SLOW_QUERY_BUFFER_SIZE = 200
 
 # ==========================================
-# CACHE (Próxima versão)
+# POOL DE CONEXÕES
 # ==========================================
 
-CACHE_ENABLED = False
+DB_POOL_SIZE = 8  # Máximo de conexões somente-leitura abertas
+DB_POOL_TIMEOUT = 2  # Segundos esperando uma conexão livre
+DB_BUSY_TIMEOUT = 30  # Segundos esperando o bot liberar o banco (migrações)
+DB_READ_BUSY_TIMEOUT = 2  # Leitores da API desistem antes e respondem 503
+DB_MMAP_SIZE = 256 * 1024 * 1024  # 256 MB mapeados em memória
+DB_CACHE_SIZE_KB = 16 * 1024  # Cache de páginas por conexão (16 MB)
+DB_HEALTHCHECK_INTERVAL = 30  # Conexões ociosas há mais tempo são verificadas
+
+# ==========================================
+# ISOLAMENTO DE LEITURA
+# ==========================================
+
+# snapshot: lê o banco do bot em WAL; cada requisição vê um único estado do
+#           banco (transação de leitura) e nunca espera pelas escritas do bot
+# replica:  lê uma cópia feita com a API de backup do SQLite, trocada de forma
+#           atômica a cada REPLICA_REFRESH_INTERVAL segundos (não no Windows)
+# off:      leitura direta, sem transação por requisição
+READ_ISOLATION = os.environ.get('READ_ISOLATION', 'snapshot')
+REPLICA_PATH = os.environ.get('REPLICA_PATH')  # None = legion_chess.replica.db ao lado do banco
+REPLICA_REFRESH_INTERVAL = 5
+
+# ==========================================
+# CACHE
+# ==========================================
+
+# Respostas de ranking/estatísticas ficam em memória até o banco mudar
+# (PRAGMA data_version / mtime); o timeout é só uma garantia extra
+CACHE_ENABLED = True
 CACHE_TIMEOUT = 300  # 5 minutos em segundos
+CACHE_MAX_ENTRIES = 256
+
+# Tamanho máximo de página em /api/ranking/<mode>?limit=
+RANKING_MAX_LIMIT = 500
+
+# Vizinhos acima/abaixo em /api/ranking/<mode>/position/<id>?window=
+RANKING_POSITION_WINDOW = 5
+RANKING_POSITION_MAX_WINDOW = 25
+
+# Pontos por curva em /api/jogador/<id>/rating-history?points=
+RATING_HISTORY_POINTS = 200
+RATING_HISTORY_MAX_POINTS = 1000
+RATING_HISTORY_MAX_SERIES = 512  # Séries (jogador, modo) mantidas em memória
+
+# Confronto direto em /api/h2h/<a>/<b>?n=
+H2H_RECENT_GAMES = 10  # Últimas partidas do par na resposta
+H2H_MAX_RECENT_GAMES = 50
+H2H_CACHE_MAX_PAIRS = 1024  # Pares mantidos em memória
+
+# Desempenho por faixa/time control/oponente em /api/jogador/<id>/breakdown
+BREAKDOWN_RATING_BAND = 200  # Largura das faixas de rating do oponente
+BREAKDOWN_TOP_OPPONENTS = 20  # Oponentes mais frequentes na resposta
+BREAKDOWN_CACHE_MAX_PLAYERS = 512  # (jogador, modo) mantidos em memória
+
+# Máximo de ids em /api/jogadores?ids=
+BATCH_MAX_IDS = 100
+
+# Exportação em streaming (/api/export/games e /api/export/players)
+EXPORT_BATCH_SIZE = 1000  # Linhas lidas por fetchmany
+EXPORT_MAX_CONCURRENT = 2  # Exportações simultâneas por processo
+
+# ==========================================
+# STREAM (Server-Sent Events em /api/stream)
+# ==========================================
+
+STREAM_POLL_INTERVAL = 1  # Segundos entre verificações de mudança no banco
+STREAM_HEARTBEAT = 15  # Segundos entre heartbeats para manter a conexão
+# Clientes por processo. Cada cliente conectado ocupa uma thread enquanto a
+# conexão durar (gthread/waitress são bloqueantes), então o serve.py soma
+# esse número às SERVER_THREADS: o stream tem threads próprias e não tira
+# threads da API. O custo é uma thread quase sempre parada por cliente
+# (pouca memória); o acesso ao banco continua limitado por DB_MAX_CONCURRENT.
+# Acima do limite: 503 (contado em /api/metrics) e o frontend faz polling
+# até conseguir reconectar.
+STREAM_MAX_SUBSCRIBERS = int(os.environ.get('STREAM_MAX_SUBSCRIBERS', 64))
+STREAM_RANKING_LIMIT = 50  # Jogadores enviados nos eventos de ranking
+
+# ==========================================
+# AVATARES
+# ==========================================
+
+# Cópias locais dos avatares do Discord servidos por /api/avatar/<id>
+AVATAR_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'avatar_cache')
+AVATAR_CACHE_MAX_MB = 128
+AVATAR_FRESH_SECONDS = 86400  # Depois disso o avatar é revalidado no CDN
+AVATAR_FETCH_TIMEOUT = 10
+# Permite apontar para um CDN falso local nos testes
+AVATAR_CDN_BASE = os.environ.get('AVATAR_CDN_BASE', 'https://cdn.discordapp.com')
+
+# Pré-aquecimento em segundo plano (topo de cada ranking + avatares trocados)
+AVATAR_PREWARM_ENABLED = True
+AVATAR_PREWARM_TOP_N = 50
+AVATAR_PREWARM_WORKERS = 4
+AVATAR_PREWARM_INTERVAL = 30  # Segundos entre verificações do banco
+AVATAR_PREWARM_MAX_RETRIES = 3
 
 # ==========================================
 # SEGURANÇA (Próxima versão)
@@ -55,12 +174,29 @@ CACHE_TIMEOUT = 300  # 5 minutos em segundos
 
 # Ativar autenticação
 AUTH_ENABLED = False
-API_KEY = 'sua-chave-secreta'
-
-# Rate limiting
-RATE_LIMIT_ENABLED = False
-RATE_LIMIT_REQUESTS = 100
-RATE_LIMIT_PERIOD = 3600  # 1 hora em segundos
+# Valor de exemplo público: enquanto API_KEY não for definida no ambiente
+# (ou continuar igual a ele), as rotas protegidas respondem 404
+API_KEY_PLACEHOLDER = 'sua-chave-secreta'
+API_KEY = os.environ.get('API_KEY', API_KEY_PLACEHOLDER)
+
+# Rate limiting (token bucket por cliente e classe de rota)
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT', '0') == '1'
+RATE_LIMIT_REQUESTS = 300  # Orçamento padrão por cliente...
+RATE_LIMIT_PERIOD = 60  # ...a cada 60 segundos
+# Rotas caras com orçamento separado: {classe: (requisições, período)}
+RATE_LIMIT_ROUTE_CLASSES = {
+    'avatar': (600, 60),  # Uma página de ranking pede dezenas de avatares
+    'historico': (60, 60),
+    'export': (10, 60),
+}
+RATE_LIMIT_MAX_CLIENTS = 10000  # Clientes acompanhados em memória
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))  # Proxies à frente da API (X-Forwarded-For)
+
+# Limite de handlers executando ao mesmo tempo (por processo)
+DB_MAX_CONCURRENT = DB_POOL_SIZE  # Handlers que usam o banco
+AVATAR_MAX_CONCURRENT = 4  # Buscas de avatar (podem ir ao CDN)
+ADMISSION_QUEUE_TIMEOUT = 0.25  # Segundos esperando vaga antes do 503
+OVERLOAD_RETRY_AFTER = 2  # Retry-After das respostas 503
 
 # ==========================================
 # VALIDAÇÃO
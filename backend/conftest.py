@@ -0,0 +1,99 @@
+"""
+Fixtures dos testes (pytest)
+A API é importada uma única vez, apontando para um banco sintético gerado
+em um diretório temporário (synthetic_db.py)
+"""
+
+import os
+import sqlite3
+
+import pytest
+
+# Scripts manuais que falam com um servidor rodando em localhost
+collect_ignore = ['test.py', 'test_api.py', 'test_all_modes.py', 'test_avatar_proxy.py', 'test_ranking.py']
+
+SYNTHETIC = {'players': 60, 'games': 1500, 'achievements': 120, 'tournaments': 4, 'participants': 8}
+
+
+@pytest.fixture(scope='session')
+def db_path(tmp_path_factory):
+    from synthetic_db import generate
+
+    path = str(tmp_path_factory.mktemp('db') / 'legion_chess.db')
+    generate(path, seed=7, **SYNTHETIC)
+    return path
+
+
+@pytest.fixture(scope='session')
+def api(db_path, tmp_path_factory):
+    """Módulo app configurado para o banco sintético"""
+    os.environ['LEGION_DB_PATH'] = db_path
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    import config
+    config.AVATAR_PREWARM_ENABLED = False
+    config.AVATAR_CACHE_DIR = str(tmp_path_factory.mktemp('avatars'))
+
+    import app
+    app.init_database()
+    yield app
+    app.stop_background_workers()
+
+
+@pytest.fixture
+def client(api):
+    return api.app.test_client()
+
+
+@pytest.fixture
+def db(api, db_path):
+    """Conexão de escrita no banco sintético (como o bot)"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def player_ids(db):
+    """Jogadores ordenados do mais ativo para o menos ativo"""
+    return [row[0] for row in db.execute('''
+        SELECT player_id FROM (
+            SELECT player1_id AS player_id FROM game_history
+            UNION ALL
+            SELECT player2_id FROM game_history
+        )
+        GROUP BY player_id ORDER BY COUNT(*) DESC, player_id
+    ''')]
+
+
+@pytest.fixture
+def without_player_games(api, db, monkeypatch):
+    """Simula um banco antes da migração 3 (sem player_games) durante o teste"""
+    db.execute('ALTER TABLE player_games RENAME TO player_games_off')
+    db.commit()
+    monkeypatch.setattr(api, '_has_player_games', False)
+    yield
+    db.execute('ALTER TABLE player_games_off RENAME TO player_games')
+    db.commit()
+
+
+@pytest.fixture
+def replace_game(db):
+    """Substitui uma partida com INSERT OR REPLACE (como o bot); a original volta no fim do teste"""
+    originals = []
+
+    def write(row):
+        columns = ', '.join(row)
+        marks = ', '.join('?' * len(row))
+        db.execute(f'INSERT OR REPLACE INTO game_history ({columns}) VALUES ({marks})', list(row.values()))
+        db.commit()
+
+    def replace(game_id, **changes):
+        row = dict(db.execute('SELECT * FROM game_history WHERE id = ?', (game_id,)).fetchone())
+        originals.append(row)
+        write(dict(row, **changes))
+
+    yield replace
+    for row in reversed(originals):
+        write(row)
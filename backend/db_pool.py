@@ -0,0 +1,365 @@
+"""
+Pool de conexões SQLite para o Backend
+Mantém conexões somente-leitura abertas e pré-configuradas entre requisições
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from urllib.request import pathname2url
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão livre no pool dentro do tempo limite"""
+
+
+def is_db_busy(error):
+    """Erro de sobrecarga (pool esgotado ou banco travado pelo bot), não um bug"""
+    if isinstance(error, PoolTimeout):
+        return True
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return 'locked' in message or 'busy' in message
+    return False
+
+
+class PooledConnection(sqlite3.Connection):
+    """Conexão que volta para o pool em close() em vez de ser fechada"""
+
+    def close(self):
+        pool = getattr(self, '_pool', None)
+        if pool is None:
+            super().close()
+        else:
+            pool.release(self)
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or getattr(self, '_cursor_factory', None) or sqlite3.Cursor)
+
+    def execute(self, sql, parameters=()):
+        # Connection.execute não passa por cursor(); usa o mesmo cursor_factory
+        return self.cursor().execute(sql, parameters)
+
+    def close_real(self):
+        """Fecha a conexão de verdade (usado pelo próprio pool)"""
+        self._pool = None
+        super().close()
+
+
+def connect_readonly(db_path, busy_timeout=30, factory=sqlite3.Connection):
+    """Abre uma conexão somente-leitura (mode=ro) utilizável por qualquer thread"""
+    uri = f'file:{pathname2url(os.path.abspath(db_path))}?mode=ro'
+    return sqlite3.connect(
+        uri,
+        uri=True,
+        timeout=busy_timeout,
+        check_same_thread=False,
+        factory=factory,
+    )
+
+
+def enable_wal(db_path):
+    """Coloca o banco em modo WAL (configuração persistente no arquivo)"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        mode = conn.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+    finally:
+        conn.close()
+    return mode
+
+
+class ConnectionPool:
+    """
+    Pool limitado de conexões somente-leitura.
+
+    As conexões são abertas uma única vez, com mmap/cache configurados e
+    query_only ligado, e reaproveitadas em ordem LIFO para manter o cache
+    de páginas quente. Conexões ociosas há mais de `healthcheck_interval`
+    segundos são verificadas com um SELECT 1 antes de serem entregues.
+    `cursor_factory` define a classe dos cursores (ex: cursor com métricas).
+
+    Com `snapshot=True` cada conexão entregue já está em uma transação de
+    leitura: todas as consultas até o close() veem o mesmo estado do banco
+    (em WAL, sem esperar nem bloquear o bot). Com `watch_file=True` o pool
+    percebe quando o arquivo foi trocado (réplica) e reabre as conexões.
+    """
+
+    def __init__(self, db_path, size=8, timeout=5.0, busy_timeout=30,
+                 mmap_size=268435456, cache_size_kb=16384, healthcheck_interval=30,
+                 cursor_factory=None, snapshot=False, watch_file=False):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.busy_timeout = busy_timeout
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.healthcheck_interval = healthcheck_interval
+        self.cursor_factory = cursor_factory
+        self.snapshot = snapshot
+        self.watch_file = watch_file
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._idle = []
+        self._total = 0
+        self._in_use = 0
+        self._generation = 0
+        self._file_id = self._current_file_id() if self.watch_file else None
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._swaps = 0
+
+    def _check_fork(self):
+        """
+        Após um fork (workers do gunicorn) as conexões herdadas do processo
+        pai não podem ser usadas nem fechadas: o filho começa um pool novo.
+        """
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _current_file_id(self):
+        try:
+            st = os.stat(self.db_path)
+            return st.st_ino, st.st_mtime_ns
+        except OSError:
+            return None
+
+    def _check_swap(self):
+        """
+        Se o arquivo foi substituído, as conexões abertas ainda apontam para
+        o antigo: as ociosas são fechadas e as em uso descartadas na volta
+        """
+        file_id = self._current_file_id()
+        if file_id is None or file_id == self._file_id:
+            return
+        with self._cond:
+            if file_id == self._file_id:
+                return
+            self._file_id = file_id
+            self._generation += 1
+            self._swaps += 1
+            stale, self._idle = self._idle, []
+        for conn in stale:
+            self._discard(conn)
+
+    def _connect(self):
+        conn = connect_readonly(self.db_path, self.busy_timeout, factory=PooledConnection)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute(f'PRAGMA cache_size={-int(self.cache_size_kb)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA query_only=ON')
+        conn._pool = self
+        conn._generation = self._generation
+        conn._cursor_factory = self.cursor_factory
+        conn._last_used = time.monotonic()
+        conn._checked_out = False
+        return conn
+
+    def _is_healthy(self, conn):
+        if time.monotonic() - conn._last_used < self.healthcheck_interval:
+            return True
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """Retira uma conexão do pool, esperando até `timeout` segundos"""
+        self._check_fork()
+        if self.watch_file:
+            self._check_swap()
+        start = time.monotonic()
+        waited = False
+
+        while True:
+            create = False
+            with self._cond:
+                while not self._idle and self._total >= self.size:
+                    remaining = self.timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        self._record_wait(time.monotonic() - start)
+                        raise PoolTimeout(
+                            f'Nenhuma conexão livre no pool após {self.timeout}s'
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    self._total += 1
+                    create = True
+                    conn = None
+
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created += 1
+            elif not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+            if self.snapshot:
+                try:
+                    # A transação de leitura começa no primeiro SELECT
+                    sqlite3.Connection.execute(conn, 'BEGIN')
+                except sqlite3.Error:
+                    self._discard(conn)
+                    continue
+            break
+
+        with self._cond:
+            self._in_use += 1
+            self._checkouts += 1
+            if waited:
+                self._record_wait(time.monotonic() - start)
+            # Identifica este empréstimo: um close() atrasado de quem já
+            # devolveu a conexão não pode devolvê-la de novo
+            conn._checkout = self._checkouts
+            conn._checked_out = True
+        return conn
+
+    def _record_wait(self, elapsed):
+        # Chamado com self._cond adquirido
+        self._waits += 1
+        self._wait_time += elapsed
+        self._max_wait = max(self._max_wait, elapsed)
+
+    def release(self, conn, checkout=None):
+        """
+        Devolve a conexão ao pool (chamadas repetidas são ignoradas).
+        Com `checkout` (o conn._checkout de quando foi retirada), só devolve
+        se a conexão ainda estiver no mesmo empréstimo.
+        """
+        if self._pid != os.getpid():
+            return
+        with self._cond:
+            if not getattr(conn, '_checked_out', False):
+                return
+            if checkout is not None and checkout != conn._checkout:
+                return
+            conn._checked_out = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            with self._cond:
+                self._in_use -= 1
+            self._discard(conn)
+            return
+        if conn._generation != self._generation:
+            with self._cond:
+                self._in_use -= 1
+            self._discard(conn)
+            return
+
+        conn._last_used = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn):
+        try:
+            conn.close_real()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._total -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def close_all(self):
+        """Fecha todas as conexões ociosas"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Retorna estatísticas de uso do pool"""
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._total,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_total_ms': round(self._wait_time * 1000, 2),
+                'wait_time_max_ms': round(self._max_wait * 1000, 2),
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'discarded': self._discarded,
+                'file_swaps': self._swaps,
+            }
+
+
+class DataVersion:
+    """
+    Detecta mudanças no banco feitas por outras conexões (o bot).
+
+    Usa uma conexão dedicada para ler PRAGMA data_version, que só muda quando
+    outra conexão faz commit, junto com o mtime do arquivo e do -wal. Se o
+    arquivo for substituído (réplica de leitura) a conexão é reaberta.
+    """
+
+    def __init__(self, db_path, busy_timeout=30):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self._lock = threading.Lock()
+        self._conn = None
+        self._inode = None
+        self._pid = os.getpid()
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return 0
+
+    def current(self):
+        """Retorna um token que muda sempre que os dados do banco mudam"""
+        if self._pid != os.getpid():
+            # Processo filho: a conexão herdada pertence ao pai
+            self._lock = threading.Lock()
+            self._conn = None
+            self._pid = os.getpid()
+        with self._lock:
+            try:
+                inode = os.stat(self.db_path).st_ino
+            except OSError:
+                inode = None
+            try:
+                if self._conn is not None and inode != self._inode:
+                    self._conn.close()
+                    self._conn = None
+                if self._conn is None:
+                    self._conn = connect_readonly(self.db_path, self.busy_timeout)
+                    self._inode = inode
+                version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            except sqlite3.Error:
+                self._conn = None
+                version = None
+        return (
+            version,
+            self._mtime(self.db_path),
+            self._mtime(self.db_path + '-wal'),
+        )
@@ -0,0 +1,59 @@
+"""
+Exportação em streaming (NDJSON ou CSV)
+As linhas são lidas em lotes com fetchmany e enviadas conforme são
+geradas, então a memória usada não depende do tamanho da tabela
+"""
+
+import csv
+import io
+import json
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+GAME_COLUMNS = (
+    'id', 'played_at', 'mode', 'time_control', 'result', 'winner_id',
+    'player1_id', 'player1_name', 'player1_rating_before', 'player1_rating_after',
+    'player2_id', 'player2_name', 'player2_rating_before', 'player2_rating_after',
+    'game_url',
+)
+
+PLAYER_COLUMNS = (
+    'discord_id', 'discord_username', 'lichess_username',
+    'rating_bullet', 'wins_bullet', 'losses_bullet', 'draws_bullet',
+    'rating_blitz', 'wins_blitz', 'losses_blitz', 'draws_blitz',
+    'rating_rapid', 'wins_rapid', 'losses_rapid', 'draws_rapid',
+    'rating_classic', 'wins_classic', 'losses_classic', 'draws_classic',
+    'wins', 'losses', 'draws',
+)
+
+
+def encode_ndjson(columns, rows):
+    return ''.join(
+        json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n'
+        for row in rows
+    )
+
+
+def encode_csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    return buffer.getvalue()
+
+
+def stream_rows(conn, sql, params, columns, fmt, batch_size=1000):
+    """
+    Gerador com o resultado de `sql` já serializado, um lote por vez.
+    Não fecha `conn`: quem monta a resposta fecha ao final do envio (o
+    gerador pode nem começar se o cliente desconectar antes).
+    """
+    cursor = conn.execute(sql, params)
+    if fmt == 'csv':
+        yield encode_csv([columns])
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield encode_csv(rows) if fmt == 'csv' else encode_ndjson(columns, rows)
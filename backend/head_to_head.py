@@ -0,0 +1,108 @@
+"""
+Confronto direto entre dois jogadores
+Placar, variação de rating e últimas partidas de um par, lidos em uma
+passada pelo índice (player_id, opponent_id, played_at) de player_games e
+guardados em cache até as partidas entre os dois mudarem
+"""
+
+from cache import StampedCache
+from migrations import PLAYER_GAMES_STAMP
+
+H2H_COLUMNS = (
+    'game_id, opponent_id, opponent_name, result, rating_before, rating_after, '
+    'rating_delta, opponent_rating_before, mode, time_control, game_url, played_at'
+)
+
+
+def empty_score():
+    return {'partidas': 0, 'vitorias': 0, 'derrotas': 0, 'empates': 0, 'rating_delta': 0}
+
+
+def add_result(score, result, delta):
+    score['partidas'] += 1
+    if result == 'win':
+        score['vitorias'] += 1
+    elif result == 'draw':
+        score['empates'] += 1
+    else:
+        score['derrotas'] += 1
+    score['rating_delta'] += delta or 0
+
+
+class PairSummary:
+    """Placar de um jogador contra um oponente (visto pelo lado do jogador)"""
+
+    def __init__(self, total, por_modo, recent, first_played, last_played):
+        self.total = total
+        self.por_modo = por_modo
+        self.recent = recent
+        self.first_played = first_played
+        self.last_played = last_played
+
+
+class HeadToHeadCache:
+    """
+    Placar dos pares mais consultados (LRU por jogador/oponente/modo).
+
+    Quando o banco muda, confere só o carimbo do par (PLAYER_GAMES_STAMP,
+    uma agregação sobre as partidas dos dois); o placar só é recalculado
+    se saiu, foi substituída ou editada uma partida entre os dois.
+    """
+
+    def __init__(self, max_pairs=1024, max_recent=50):
+        self.max_recent = max_recent
+        self._cache = StampedCache(max_entries=max_pairs)
+
+    def get(self, conn, player_id, opponent_id, mode, version, source=''):
+        """
+        Retorna o PairSummary de (player_id, opponent_id) no modo (None =
+        todos). `source` é o prefixo das consultas em player_games
+        """
+        where, params = self._where(player_id, opponent_id, mode)
+        return self._cache.get(
+            (player_id, opponent_id, mode),
+            version,
+            lambda: tuple(conn.execute(
+                f'{source} SELECT {PLAYER_GAMES_STAMP} FROM player_games {where}', params
+            ).fetchone()),
+            lambda stamp: self._load(conn, source, where, params),
+        )
+
+    def _where(self, player_id, opponent_id, mode):
+        sql = 'WHERE player_id = ? AND opponent_id = ?'
+        params = [player_id, opponent_id]
+        if mode:
+            sql += ' AND mode = ?'
+            params.append(mode)
+        return sql, params
+
+    def _load(self, conn, source, where, params):
+        total = empty_score()
+        por_modo = {}
+        recent = []
+        first_played = last_played = None
+
+        for row in conn.execute(f'''
+            {source}
+            SELECT {H2H_COLUMNS} FROM player_games {where}
+            ORDER BY played_at DESC, game_id DESC
+        ''', params):
+            add_result(total, row['result'], row['rating_delta'])
+            add_result(por_modo.setdefault(row['mode'], empty_score()), row['result'], row['rating_delta'])
+            if len(recent) < self.max_recent:
+                recent.append(dict(row))
+            if last_played is None:
+                last_played = row['played_at']
+            first_played = row['played_at']
+
+        return PairSummary(total, por_modo, recent, first_played, last_played)
+
+    def stats(self):
+        stats = self._cache.stats()
+        return {
+            'pairs': stats['entries'],
+            'max_pairs': stats['max_entries'],
+            'hits': stats['hits'],
+            'revalidated': stats['revalidated'],
+            'rebuilds': stats['rebuilds'],
+        }
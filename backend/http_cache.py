@@ -0,0 +1,83 @@
+"""
+Validadores HTTP (ETag / Last-Modified) para as respostas JSON
+Calculados a partir da versão das tabelas envolvidas, antes de montar o payload
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import make_response, request
+
+
+def parse_changed_at(value):
+    """Converte '2025-01-01T12:00:00.123Z' em datetime UTC"""
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=timezone.utc)
+
+
+class TableValidators:
+    """
+    Gera ETag/Last-Modified por rota a partir do estado das tabelas.
+
+    `load_state()` retorna {tabela: (versão, changed_at)}; quando a tabela
+    table_versions ainda não existe deve retornar None e `fallback_state()`
+    é usado (versão global do banco + mtime do arquivo).
+    """
+
+    def __init__(self, load_state, fallback_state):
+        self.load_state = load_state
+        self.fallback_state = fallback_state
+
+    def state(self, tables):
+        """Retorna (token de versão, datetime da última alteração) das tabelas"""
+        versions = self.load_state()
+        if versions is None:
+            return self.fallback_state()
+        known = [versions[t] for t in tables if t in versions]
+        if not known:
+            return self.fallback_state()
+        token = tuple(version for version, _ in known)
+        changed_at = max(parse_changed_at(changed) for _, changed in known)
+        return token, changed_at
+
+    def changed_at(self, tables):
+        """Horário ISO da última alteração real dos dados das tabelas"""
+        _, changed = self.state(tables)
+        return changed.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+    def conditional(self, tables, cache_control='public, max-age=30'):
+        """
+        Decorator de rota: responde 304 sem executar a view quando o cliente
+        já tem a versão atual (If-None-Match / If-Modified-Since).
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                try:
+                    token, changed_at = self.state(tables)
+                except Exception:
+                    return view(*args, **kwargs)
+
+                raw = f'{request.host_url}|{request.full_path}|{token}'
+                etag = hashlib.sha1(raw.encode()).hexdigest()[:20]
+                last_modified = changed_at.replace(microsecond=0)
+
+                not_modified = False
+                if request.if_none_match:
+                    not_modified = request.if_none_match.contains_weak(etag)
+                elif request.if_modified_since:
+                    not_modified = last_modified <= request.if_modified_since
+
+                if not_modified:
+                    response = make_response('', 304)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+
+                response.set_etag(etag, weak=True)
+                response.last_modified = last_modified
+                response.headers['Cache-Control'] = cache_control
+                return response
+            return wrapper
+        return decorator
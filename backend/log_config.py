@@ -0,0 +1,68 @@
+"""
+Configuração de logging da API (LOG_LEVEL / LOG_FILE do config.py)
+Só o logger 'legion_chess' é configurado, para não mexer no logging do bot
+quando a API roda embutida nele
+"""
+
+import json
+import logging
+import os
+from logging.handlers import RotatingFileHandler
+
+LOGGER_NAME = 'legion_chess'
+
+# Atributos padrão de LogRecord; o resto veio de `extra=` e vai para o JSON
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por evento, com os campos passados em `extra=`"""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def get_logger(name):
+    """Logger filho de 'legion_chess' (ex: get_logger('api'))"""
+    return logging.getLogger(f'{LOGGER_NAME}.{name}')
+
+
+def setup_logging(level='INFO', log_file=None, fmt='text', base_dir=None):
+    """
+    Configura o logger 'legion_chess' com saída no console e, se `log_file`
+    for informado, em arquivo rotativo (caminho relativo a `base_dir`).
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    if fmt == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        if base_dir and not os.path.isabs(log_file):
+            log_file = os.path.join(base_dir, log_file)
+        handlers.append(RotatingFileHandler(
+            log_file, maxBytes=10 * 1024 * 1024, backupCount=3, encoding='utf-8'
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    return logger
@@ -0,0 +1,206 @@
+"""
+Métricas da API no formato texto do Prometheus
+Latência por rota (histograma), contagem por status, requisições em
+andamento e quanto de cada requisição foi banco vs serialização
+"""
+
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+
+from flask.json.provider import DefaultJSONProvider
+
+# Limites dos buckets do histograma de latência (segundos)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Cronômetro da requisição atual (None fora de requisições)
+current_timer = ContextVar('current_timer', default=None)
+
+
+class RequestTimer:
+    """Acumula o tempo gasto no banco e serializando durante uma requisição"""
+
+    __slots__ = ('start', 'db', 'serialize', 'queries')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db = 0.0
+        self.serialize = 0.0
+        self.queries = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+def add_serialize_time(seconds):
+    timer = current_timer.get()
+    if timer is not None:
+        timer.serialize += seconds
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor que soma o tempo de execute/fetch no cronômetro da requisição"""
+
+    def execute(self, sql, parameters=()):
+        timer = current_timer.get()
+        if timer is None:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            timer.db += time.perf_counter() - start
+            timer.queries += 1
+
+    def _timed(self, fetch, *args):
+        timer = current_timer.get()
+        if timer is None:
+            return fetch(*args)
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            timer.db += time.perf_counter() - start
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._timed(super().fetchmany)
+        return self._timed(super().fetchmany, size)
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+    def __next__(self):
+        return self._timed(super().__next__)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """
+    Registro das métricas HTTP de um processo. Com vários workers do
+    gunicorn cada worker tem o seu; o Prometheus soma pelas instâncias.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._db_time = {}
+        self._serialize_time = {}
+        self._queries = {}
+        self._status = {}
+        self.in_flight = 0
+        self.started_at = time.time()
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, route, method, status, timer):
+        elapsed = timer.elapsed()
+        with self._lock:
+            self.in_flight -= 1
+            histogram = self._latency.get(route)
+            if histogram is None:
+                histogram = self._latency[route] = Histogram(self.buckets)
+            histogram.observe(elapsed)
+            self._db_time[route] = self._db_time.get(route, 0.0) + timer.db
+            self._serialize_time[route] = self._serialize_time.get(route, 0.0) + timer.serialize
+            self._queries[route] = self._queries.get(route, 0) + timer.queries
+            key = (route, method, status)
+            self._status[key] = self._status.get(key, 0) + 1
+        return elapsed
+
+    def render(self, gauges=None):
+        """
+        Texto no formato de exposição do Prometheus.
+        `gauges` é um dict {nome: (ajuda, valor)} com métricas extras.
+        """
+        with self._lock:
+            latency = {route: (list(h.counts), h.count, h.sum) for route, h in self._latency.items()}
+            db_time = dict(self._db_time)
+            serialize_time = dict(self._serialize_time)
+            queries = dict(self._queries)
+            status = dict(self._status)
+            in_flight = self.in_flight
+
+        lines = [
+            '# HELP legion_http_requests_total Requisições atendidas por rota, método e status',
+            '# TYPE legion_http_requests_total counter',
+        ]
+        for (route, method, code), count in sorted(status.items()):
+            lines.append(
+                f'legion_http_requests_total{{route="{escape_label(route)}",'
+                f'method="{method}",status="{code}"}} {count}'
+            )
+
+        lines += [
+            '# HELP legion_http_request_duration_seconds Latência das requisições por rota',
+            '# TYPE legion_http_request_duration_seconds histogram',
+        ]
+        for route, (counts, count, total) in sorted(latency.items()):
+            label = escape_label(route)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'legion_http_request_duration_seconds_bucket{{route="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'legion_http_request_duration_seconds_bucket{{route="{label}",le="+Inf"}} {count}')
+            lines.append(f'legion_http_request_duration_seconds_sum{{route="{label}"}} {total:.6f}')
+            lines.append(f'legion_http_request_duration_seconds_count{{route="{label}"}} {count}')
+
+        for name, help_text, values, fmt in (
+            ('legion_http_db_seconds_total', 'Tempo gasto no SQLite por rota', db_time, '{:.6f}'),
+            ('legion_http_serialize_seconds_total', 'Tempo gasto serializando JSON por rota', serialize_time, '{:.6f}'),
+            ('legion_http_db_queries_total', 'Consultas SQL executadas por rota', queries, '{}'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for route, value in sorted(values.items()):
+                lines.append(f'{name}{{route="{escape_label(route)}"}} {fmt.format(value)}')
+
+        lines += [
+            '# HELP legion_http_requests_in_flight Requisições em andamento',
+            '# TYPE legion_http_requests_in_flight gauge',
+            f'legion_http_requests_in_flight {in_flight}',
+            '# HELP legion_process_start_time_seconds Início do processo (epoch)',
+            '# TYPE legion_process_start_time_seconds gauge',
+            f'legion_process_start_time_seconds {self.started_at:.0f}',
+        ]
+
+        for name, (help_text, value) in sorted((gauges or {}).items()):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}']
+
+        return '\n'.join(lines) + '\n'
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider do Flask que mede o tempo de serialização do jsonify"""
+
+    def dumps(self, obj, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            add_serialize_time(time.perf_counter() - start)
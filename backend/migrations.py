@@ -0,0 +1,728 @@
+"""
+Migrações versionadas do schema do banco
+Cada migração roda uma única vez e fica registrada na tabela schema_version
+
+Uso:
+    python migrations.py                 # aplica as migrações pendentes
+    python migrations.py --db caminho.db
+    python migrations.py --status
+    python migrations.py --backfill-player-games
+"""
+
+import argparse
+import sqlite3
+
+MODES = ['bullet', 'blitz', 'rapid', 'classic']
+
+
+def ranking_filter(mode):
+    """
+    Cláusula WHERE dos jogadores que aparecem no ranking de um modo.
+    As consultas devem usar exatamente este texto para o SQLite escolher o
+    índice parcial do ranking (migração 6).
+    """
+    return (f'rating_{mode} > 0 OR wins_{mode} > 0 '
+            f'OR losses_{mode} > 0 OR draws_{mode} > 0')
+
+
+class MigrationPending(Exception):
+    """A migração depende de algo que ainda não existe no banco (ex: tabela do bot)"""
+
+
+def table_exists(conn, name):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?",
+        (name,)
+    ).fetchone()
+    return row is not None
+
+
+def require_tables(conn, *names):
+    missing = [name for name in names if not table_exists(conn, name)]
+    if missing:
+        raise MigrationPending(f'Tabelas ainda não criadas pelo bot: {", ".join(missing)}')
+
+
+# ==========================================
+# MIGRAÇÕES
+# ==========================================
+
+def m001_base_tables(conn):
+    """Tabelas mínimas usadas pela API"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS players (
+            discord_id TEXT PRIMARY KEY,
+            discord_username TEXT NOT NULL,
+            lichess_username TEXT,
+            rating INTEGER DEFAULT 1200,
+            rating_bullet INTEGER DEFAULT 1200,
+            rating_blitz INTEGER DEFAULT 1200,
+            rating_rapid INTEGER DEFAULT 1200,
+            rating_classic INTEGER DEFAULT 1200,
+            wins_bullet INTEGER DEFAULT 0,
+            losses_bullet INTEGER DEFAULT 0,
+            draws_bullet INTEGER DEFAULT 0,
+            wins_blitz INTEGER DEFAULT 0,
+            losses_blitz INTEGER DEFAULT 0,
+            draws_blitz INTEGER DEFAULT 0,
+            wins_rapid INTEGER DEFAULT 0,
+            losses_rapid INTEGER DEFAULT 0,
+            draws_rapid INTEGER DEFAULT 0,
+            wins_classic INTEGER DEFAULT 0,
+            losses_classic INTEGER DEFAULT 0,
+            draws_classic INTEGER DEFAULT 0,
+            wins INTEGER DEFAULT 0,
+            losses INTEGER DEFAULT 0,
+            draws INTEGER DEFAULT 0,
+            avatar_hash TEXT
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS swiss_tournaments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            status TEXT DEFAULT 'waiting',
+            max_players INTEGER DEFAULT 16,
+            current_round INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS swiss_participants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tournament_id INTEGER,
+            discord_id TEXT,
+            rating INTEGER DEFAULT 1200,
+            score REAL DEFAULT 0.0,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (tournament_id) REFERENCES swiss_tournaments (id),
+            FOREIGN KEY (discord_id) REFERENCES players (discord_id)
+        )
+    ''')
+
+
+def m002_hot_query_indexes(conn):
+    """Índices para histórico, conquistas e rankings"""
+    require_tables(conn, 'players', 'game_history', 'achievements')
+
+    # Histórico por jogador (cada lado da partida) ordenado por data.
+    # Substituídos por player_games (migração 3) e removidos na migração 11
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_game_history_p1_played '
+                 'ON game_history (player1_id, played_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_game_history_p2_played '
+                 'ON game_history (player2_id, played_at)')
+    # Mesmo acesso filtrando por modo (?modo=blitz)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_game_history_p1_mode_played '
+                 'ON game_history (player1_id, mode, played_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_game_history_p2_mode_played '
+                 'ON game_history (player2_id, mode, played_at)')
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_achievements_player_unlocked '
+                 'ON achievements (player_id, unlocked_at)')
+
+    # Rankings: rating decrescente com discord_id como desempate.
+    # Substituídos pelos índices parciais da migração 6 e removidos na migração 13
+    for mode in MODES:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_players_rating_{mode} '
+                     f'ON players (rating_{mode} DESC, discord_id)')
+
+    conn.execute('ANALYZE')
+
+
+PLAYER_GAMES_COLUMNS = (
+    'player_id, game_id, opponent_id, opponent_name, result, '
+    'rating_before, rating_after, rating_delta, opponent_rating_before, '
+    'mode, time_control, game_url, played_at'
+)
+
+# Carimbo de um recorte de player_games (ex: as partidas de um jogador) para
+# caches: além da quantidade e da última partida, somas ponderadas pelo
+# game_id que mudam quando uma partida existente é substituída (INSERT OR
+# REPLACE) ou editada pelo bot
+PLAYER_GAMES_STAMP = '''
+    COUNT(*),
+    MAX(game_id),
+    TOTAL(game_id * CASE result WHEN 'win' THEN 1 WHEN 'draw' THEN 2 ELSE 3 END),
+    TOTAL(game_id * rating_delta),
+    TOTAL(game_id * rating_after),
+    TOTAL(game_id * opponent_rating_before),
+    TOTAL(game_id * julianday(played_at)),
+    TOTAL(game_id * length(printf('%s|%s|%s|%s|%s', opponent_id, opponent_name,
+                                  mode, time_control, game_url)))
+'''
+
+
+def player_games_values(src, me, other):
+    """
+    Expressões SQL de uma linha de player_games vista pelo lado `me`
+    (player1/player2) da partida `src` (NEW nas triggers, g no backfill)
+    """
+    before = f'{src}.{me}_rating_before'
+    after = f'{src}.{me}_rating_after'
+    return f'''
+        {src}.{me}_id,
+        {src}.id,
+        {src}.{other}_id,
+        {src}.{other}_name,
+        CASE
+            WHEN {src}.result = 'draw' THEN 'draw'
+            WHEN {src}.winner_id = {src}.{me}_id THEN 'win'
+            ELSE 'loss'
+        END,
+        {before},
+        {after},
+        CASE WHEN {after} AND {before} THEN {after} - {before} ELSE 0 END,
+        {src}.{other}_rating_before,
+        {src}.mode,
+        {src}.time_control,
+        {src}.game_url,
+        COALESCE({src}.played_at, '')
+    '''
+
+
+def player_games_trigger_inserts():
+    """Corpo das triggers: as duas linhas (uma por lado) da partida NEW"""
+    return ''.join(
+        f'''
+            INSERT OR REPLACE INTO player_games ({PLAYER_GAMES_COLUMNS})
+            SELECT {player_games_values('NEW', me, other)}
+            WHERE NEW.{me}_id IS NOT NULL;
+        '''
+        for me, other in (('player1', 'player2'), ('player2', 'player1'))
+    )
+
+
+def player_games_fallback_cte():
+    """
+    CTE com o mesmo nome e colunas de player_games, calculada direto de
+    game_history, para ler o histórico antes da migração 3 ser aplicada.
+    O filtro por player_id é levado para dentro de cada lado do UNION ALL.
+    """
+    sides = ' UNION ALL '.join(
+        f'SELECT {player_games_values("g", me, other)} FROM game_history g WHERE g.{me}_id IS NOT NULL'
+        for me, other in (('player1', 'player2'), ('player2', 'player1'))
+    )
+    return f'WITH player_games ({PLAYER_GAMES_COLUMNS}) AS ({sides})'
+
+
+def backfill_player_games(conn):
+    """Reconstrói player_games a partir de todo o game_history"""
+    conn.execute('DELETE FROM player_games')
+    for me, other in (('player1', 'player2'), ('player2', 'player1')):
+        conn.execute(f'''
+            INSERT OR REPLACE INTO player_games ({PLAYER_GAMES_COLUMNS})
+            SELECT {player_games_values('g', me, other)}
+            FROM game_history g
+            WHERE g.{me}_id IS NOT NULL
+        ''')
+    return conn.execute('SELECT COUNT(*) FROM player_games').fetchone()[0]
+
+
+def m003_player_games(conn):
+    """
+    Tabela lateral com uma linha por (jogador, partida) já orientada do
+    ponto de vista do jogador, mantida por triggers em game_history
+    """
+    require_tables(conn, 'game_history')
+
+    # Agrupada por jogador/data: o histórico vira uma única leitura sequencial
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS player_games (
+            player_id TEXT NOT NULL,
+            game_id INTEGER NOT NULL,
+            opponent_id TEXT,
+            opponent_name TEXT,
+            result TEXT,
+            rating_before INTEGER,
+            rating_after INTEGER,
+            rating_delta INTEGER,
+            opponent_rating_before INTEGER,
+            mode TEXT,
+            time_control TEXT,
+            game_url TEXT,
+            played_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (player_id, played_at, game_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_player_games_mode '
+                 'ON player_games (player_id, mode, played_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_player_games_game '
+                 'ON player_games (game_id)')
+
+    inserts = player_games_trigger_inserts()
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_player_games_insert
+        AFTER INSERT ON game_history
+        BEGIN
+            DELETE FROM player_games WHERE game_id = NEW.id;
+            {inserts}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_player_games_update
+        AFTER UPDATE ON game_history
+        BEGIN
+            DELETE FROM player_games WHERE game_id = OLD.id;
+            {inserts}
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_player_games_delete
+        AFTER DELETE ON game_history
+        BEGIN
+            DELETE FROM player_games WHERE game_id = OLD.id;
+        END
+    ''')
+
+    backfill_player_games(conn)
+    conn.execute('ANALYZE player_games')
+
+
+def fts5_trigram_available(conn):
+    """Verifica se o SQLite tem FTS5 com o tokenizer trigram (3.34+)"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x, tokenize='trigram')")
+        conn.execute('DROP TABLE temp.fts5_probe')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def m004_players_fts(conn):
+    """
+    Índice FTS5 (trigram) dos nomes dos jogadores para /api/search,
+    mantido por triggers em players
+    """
+    require_tables(conn, 'players')
+    if not fts5_trigram_available(conn):
+        print('[WARN] SQLite sem FTS5/trigram: /api/search continua usando LIKE')
+        return
+
+    # rowid do índice = rowid do jogador; discord_id fica só como referência
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS players_fts USING fts5(
+            discord_id UNINDEXED,
+            discord_username,
+            lichess_username,
+            tokenize = 'trigram'
+        )
+    ''')
+    # O bot pode usar INSERT OR REPLACE, que não dispara a trigger de DELETE;
+    # por isso a inserção também limpa entradas antigas do mesmo discord_id
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_players_fts_insert
+        AFTER INSERT ON players
+        BEGIN
+            DELETE FROM players_fts WHERE discord_id = NEW.discord_id;
+            INSERT OR REPLACE INTO players_fts (rowid, discord_id, discord_username, lichess_username)
+            VALUES (NEW.rowid, NEW.discord_id, NEW.discord_username, NEW.lichess_username);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_players_fts_update
+        AFTER UPDATE OF discord_id, discord_username, lichess_username ON players
+        BEGIN
+            INSERT OR REPLACE INTO players_fts (rowid, discord_id, discord_username, lichess_username)
+            VALUES (NEW.rowid, NEW.discord_id, NEW.discord_username, NEW.lichess_username);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_players_fts_delete
+        AFTER DELETE ON players
+        BEGIN
+            DELETE FROM players_fts WHERE rowid = OLD.rowid;
+        END
+    ''')
+
+    conn.execute('DELETE FROM players_fts')
+    conn.execute('''
+        INSERT INTO players_fts (rowid, discord_id, discord_username, lichess_username)
+        SELECT rowid, discord_id, discord_username, lichess_username FROM players
+    ''')
+
+
+VERSIONED_TABLES = ['players', 'game_history', 'achievements',
+                    'swiss_tournaments', 'swiss_participants']
+
+
+def m005_table_versions(conn):
+    """
+    Versão e horário da última alteração de cada tabela, mantidos por
+    triggers (usados para ETag/Last-Modified das respostas)
+    """
+    require_tables(conn, *VERSIONED_TABLES)
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            changed_at TEXT NOT NULL
+        )
+    ''')
+    for table in VERSIONED_TABLES:
+        conn.execute('''
+            INSERT OR IGNORE INTO table_versions (table_name, version, changed_at)
+            VALUES (?, 0, strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+        ''', (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE table_versions
+                    SET version = version + 1,
+                        changed_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now')
+                    WHERE table_name = '{table}';
+                END
+            ''')
+
+
+def m006_ranking_partial_indexes(conn):
+    """
+    Índices parciais só com os jogadores ranqueados de cada modo: a posição
+    de um jogador (quantos estão à frente) vira uma contagem por faixa do
+    índice, sem ler a tabela players
+    """
+    require_tables(conn, 'players')
+
+    for mode in MODES:
+        conn.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_players_ranked_{mode}
+            ON players (rating_{mode} DESC, discord_id)
+            WHERE {ranking_filter(mode)}
+        ''')
+    conn.execute('ANALYZE players')
+
+
+def recount_community_stats(conn):
+    """Recalcula todos os contadores de community_stats a partir das tabelas"""
+    conn.execute('DELETE FROM community_stats')
+    conn.execute("INSERT INTO community_stats (key, value) SELECT 'players', COUNT(*) FROM players")
+    conn.execute("INSERT INTO community_stats (key, value) SELECT 'games', COUNT(*) FROM game_history")
+    conn.execute('''
+        INSERT INTO community_stats (key, value)
+        SELECT 'games_' || COALESCE(mode, ''), COUNT(*) FROM game_history GROUP BY 1
+    ''')
+
+
+def m007_community_stats(conn):
+    """
+    Contadores da comunidade (jogadores, partidas e partidas por modo)
+    mantidos por triggers, para /api/stats-gerais não precisar de COUNT(*)
+    """
+    require_tables(conn, 'players', 'game_history')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS community_stats (
+            key TEXT PRIMARY KEY NOT NULL,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+    def bump(key_expr, delta):
+        return f'''
+            INSERT INTO community_stats (key, value) VALUES ({key_expr}, {delta})
+            ON CONFLICT (key) DO UPDATE SET value = value + {delta};
+        '''
+
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_community_players_insert
+        AFTER INSERT ON players
+        BEGIN {bump("'players'", 1)} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_community_players_delete
+        AFTER DELETE ON players
+        BEGIN {bump("'players'", -1)} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_community_games_insert
+        AFTER INSERT ON game_history
+        BEGIN
+            {bump("'games'", 1)}
+            {bump("'games_' || COALESCE(NEW.mode, '')", 1)}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_community_games_delete
+        AFTER DELETE ON game_history
+        BEGIN
+            {bump("'games'", -1)}
+            {bump("'games_' || COALESCE(OLD.mode, '')", -1)}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_community_games_mode
+        AFTER UPDATE OF mode ON game_history
+        BEGIN
+            {bump("'games_' || COALESCE(OLD.mode, '')", -1)}
+            {bump("'games_' || COALESCE(NEW.mode, '')", 1)}
+        END
+    ''')
+
+    recount_community_stats(conn)
+
+    # Jogadores ativos nos últimos dias: faixa do índice por data
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_game_history_played '
+                 'ON game_history (played_at)')
+
+
+def m008_head_to_head_index(conn):
+    """Índice por par de jogadores para o confronto direto (/api/h2h)"""
+    require_tables(conn, 'player_games')
+
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_player_games_opponent '
+                 'ON player_games (player_id, opponent_id, played_at)')
+    conn.execute('ANALYZE player_games')
+
+
+def m009_player_games_replace(conn):
+    """
+    INSERT OR REPLACE em game_history não dispara a trigger de DELETE
+    (recursive_triggers desligado no bot): a trigger de INSERT passa a
+    apagar as linhas antigas da partida antes de inserir as novas, e as
+    linhas que sobraram de partidas substituídas são removidas
+    """
+    require_tables(conn, 'game_history', 'player_games')
+
+    conn.execute('DROP TRIGGER IF EXISTS trg_player_games_insert')
+    conn.execute(f'''
+        CREATE TRIGGER trg_player_games_insert
+        AFTER INSERT ON game_history
+        BEGIN
+            DELETE FROM player_games WHERE game_id = NEW.id;
+            {player_games_trigger_inserts()}
+        END
+    ''')
+
+    # Linhas que não batem mais com a partida atual (jogador ou data mudaram)
+    conn.execute('''
+        DELETE FROM player_games
+        WHERE NOT EXISTS (
+            SELECT 1 FROM game_history g
+            WHERE g.id = player_games.game_id
+              AND player_games.player_id IN (g.player1_id, g.player2_id)
+              AND player_games.played_at = COALESCE(g.played_at, '')
+        )
+    ''')
+
+
+def m010_community_stats_replace(conn):
+    """
+    Contadores corretos com INSERT OR REPLACE (usado pelo bot): a linha que
+    o REPLACE apaga não dispara a trigger de DELETE, então o contador de
+    jogadores passa a ser recontado (a tabela é pequena) e as partidas
+    descontam, antes do INSERT, a linha com o mesmo id que será substituída
+    """
+    require_tables(conn, 'players', 'game_history', 'community_stats')
+
+    set_players = '''
+        INSERT INTO community_stats (key, value) VALUES ('players', (SELECT COUNT(*) FROM players))
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value;
+    '''
+    for event in ('insert', 'delete'):
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_community_players_{event}')
+        conn.execute(f'''
+            CREATE TRIGGER trg_community_players_{event}
+            AFTER {event.upper()} ON players
+            BEGIN {set_players} END
+        ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_community_games_replace
+        BEFORE INSERT ON game_history
+        WHEN NEW.id IS NOT NULL
+        BEGIN
+            UPDATE community_stats SET value = value - 1
+            WHERE key IN ('games', (SELECT 'games_' || COALESCE(mode, '') FROM game_history WHERE id = NEW.id))
+              AND EXISTS (SELECT 1 FROM game_history WHERE id = NEW.id);
+        END
+    ''')
+
+    recount_community_stats(conn)
+
+
+def m011_drop_game_history_player_indexes(conn):
+    """
+    Remove os índices de game_history por jogador da migração 2: desde a
+    migração 3 as leituras por jogador usam player_games, e esses índices
+    só custavam escrita a cada partida gravada pelo bot
+    """
+    require_tables(conn, 'player_games')
+
+    for side in ('p1', 'p2'):
+        conn.execute(f'DROP INDEX IF EXISTS idx_game_history_{side}_played')
+        conn.execute(f'DROP INDEX IF EXISTS idx_game_history_{side}_mode_played')
+
+
+def m012_community_games_replace(conn):
+    """
+    A trigger BEFORE INSERT da migração 10 descontava a partida antiga
+    mesmo quando o INSERT não acontecia (INSERT OR IGNORE de um id que já
+    existe). Agora o BEFORE só anota a linha que pode ser substituída, e o
+    desconto acontece no AFTER INSERT, que só roda se a linha nova entrou
+    """
+    require_tables(conn, 'game_history', 'community_stats')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS community_stats_replaced (
+            id INTEGER PRIMARY KEY,
+            mode TEXT
+        )
+    ''')
+    conn.execute('DROP TRIGGER IF EXISTS trg_community_games_replace')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_community_games_before_insert
+        BEFORE INSERT ON game_history
+        WHEN NEW.id IS NOT NULL
+        BEGIN
+            DELETE FROM community_stats_replaced WHERE id = NEW.id;
+            INSERT INTO community_stats_replaced (id, mode)
+            SELECT id, mode FROM game_history WHERE id = NEW.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_community_games_replaced
+        AFTER INSERT ON game_history
+        WHEN EXISTS (SELECT 1 FROM community_stats_replaced WHERE id = NEW.id)
+        BEGIN
+            UPDATE community_stats SET value = value - 1
+            WHERE key IN ('games', (SELECT 'games_' || COALESCE(mode, '')
+                                    FROM community_stats_replaced WHERE id = NEW.id));
+            DELETE FROM community_stats_replaced WHERE id = NEW.id;
+        END
+    ''')
+
+    recount_community_stats(conn)
+
+
+def m013_drop_players_rating_indexes(conn):
+    """
+    Remove os índices de rating da migração 2: os índices parciais da
+    migração 6 têm as mesmas colunas e atendem todas as leituras do ranking
+    (que sempre filtram por ranking_filter), e os completos só custavam
+    escrita a cada rating atualizado pelo bot
+    """
+    require_tables(conn, 'players')
+
+    for mode in MODES:
+        conn.execute(f'DROP INDEX IF EXISTS idx_players_rating_{mode}')
+
+
+MIGRATIONS = [
+    (1, 'Tabelas base da API', m001_base_tables),
+    (2, 'Índices das consultas mais usadas', m002_hot_query_indexes),
+    (3, 'Tabela player_games mantida por triggers', m003_player_games),
+    (4, 'Índice FTS5 dos nomes dos jogadores', m004_players_fts),
+    (5, 'Versões por tabela para ETag/Last-Modified', m005_table_versions),
+    (6, 'Índices parciais dos rankings', m006_ranking_partial_indexes),
+    (7, 'Contadores da comunidade mantidos por triggers', m007_community_stats),
+    (8, 'Índice de confronto direto em player_games', m008_head_to_head_index),
+    (9, 'player_games consistente com INSERT OR REPLACE em game_history', m009_player_games_replace),
+    (10, 'Contadores da comunidade consistentes com INSERT OR REPLACE', m010_community_stats_replace),
+    (11, 'Remove índices de game_history por jogador', m011_drop_game_history_player_indexes),
+    (12, 'Contadores de partidas corretos com INSERT OR IGNORE', m012_community_games_replace),
+    (13, 'Remove índices de rating completos de players', m013_drop_players_rating_indexes),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ==========================================
+# EXECUÇÃO
+# ==========================================
+
+def current_version(conn):
+    """Versão atual do schema (0 se nunca migrado)"""
+    if not table_exists(conn, 'schema_version'):
+        return 0
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def run_migrations(conn):
+    """
+    Aplica as migrações pendentes, cada uma em sua própria transação.
+    Se o schema já estiver atualizado nenhum DDL é executado.
+    Retorna a lista de versões aplicadas.
+    """
+    if current_version(conn) >= LATEST_VERSION:
+        return []
+
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None
+    applied = []
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        for version, description, migrate in MIGRATIONS:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Outro processo pode ter aplicado enquanto esperávamos o lock
+                if current_version(conn) >= version:
+                    conn.execute('COMMIT')
+                    continue
+                migrate(conn)
+                conn.execute(
+                    'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                    (version, description)
+                )
+                conn.execute('COMMIT')
+                applied.append(version)
+            except MigrationPending as e:
+                conn.execute('ROLLBACK')
+                print(f'[WARN] Migração {version} adiada: {e}')
+                break
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+    finally:
+        conn.isolation_level = previous_isolation
+
+    return applied
+
+
+def main():
+    import config
+
+    parser = argparse.ArgumentParser(description='Migrações do banco da API')
+    parser.add_argument('--db', default=config.DB_PATH, help='Caminho do legion_chess.db')
+    parser.add_argument('--status', action='store_true', help='Só mostra a versão atual')
+    parser.add_argument('--backfill-player-games', action='store_true',
+                        help='Reconstrói player_games a partir de game_history')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    try:
+        version = current_version(conn)
+        print(f'[INFO] Schema na versão {version} (última: {LATEST_VERSION})')
+        if args.status:
+            return
+        applied = run_migrations(conn)
+        if applied:
+            print(f'[OK] Migrações aplicadas: {", ".join(map(str, applied))}')
+        else:
+            print('[OK] Nada a aplicar')
+
+        if args.backfill_player_games:
+            if not table_exists(conn, 'player_games'):
+                print('[ERROR] player_games ainda não existe (migração 3 pendente)')
+                return
+            with conn:
+                total = backfill_player_games(conn)
+            print(f'[OK] player_games reconstruída: {total} linhas')
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
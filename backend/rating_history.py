@@ -0,0 +1,171 @@
+"""
+Histórico de rating por jogador e modo
+Séries guardadas em memória e atualizadas só com as partidas novas, e
+redução de pontos (LTTB) para as curvas de quem tem milhares de partidas
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime
+
+from cache import SingleFlight
+
+
+def timestamp(played_at):
+    """Segundos desde a época de um played_at do SQLite (None se inválido)"""
+    try:
+        return datetime.fromisoformat(str(played_at).replace('Z', '')).timestamp()
+    except ValueError:
+        return None
+
+
+def lttb(points, threshold):
+    """
+    Largest-Triangle-Three-Buckets: reduz `points` [(x, y, ...)] a
+    `threshold` pontos mantendo o formato da curva (picos e vales).
+    O primeiro e o último ponto são sempre mantidos.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Média do próximo bucket (terceiro vértice do triângulo)
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        next_bucket = points[next_start:next_end] or [points[-1]]
+        avg_x = sum(p[0] for p in next_bucket) / len(next_bucket)
+        avg_y = sum(p[1] for p in next_bucket) / len(next_bucket)
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = points[a][0], points[a][1]
+
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+class RatingSeries:
+    """Pontos (played_at, game_id, rating_after, timestamp) de um jogador em um modo, em ordem"""
+
+    def __init__(self, points):
+        self.points = points
+        self.keys = [p[0] for p in points]
+        self.version = None
+
+    @property
+    def last_key(self):
+        return self.points[-1][:2] if self.points else None
+
+    def window(self, date_from=None, date_to=None):
+        """Pontos com played_at entre date_from e date_to (prefixos ISO, inclusivos)"""
+        keys = self.keys
+        start = bisect_left(keys, date_from) if date_from else 0
+        # '2025-01-31' deve incluir o dia inteiro: qualquer played_at que
+        # comece com o prefixo é menor que prefixo + '\uffff'
+        end = bisect_right(keys, date_to + '\uffff') if date_to else len(keys)
+        return self.points[start:end]
+
+
+class RatingHistoryCache:
+    """
+    Séries de rating em memória (LRU por jogador/modo).
+
+    Quando o banco muda, busca só as partidas posteriores ao último ponto
+    conhecido (faixa do índice de player_games). Se o número de partidas não
+    bater (partida apagada/editada) a série é recarregada do zero.
+    """
+
+    def __init__(self, max_series=512):
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._series = OrderedDict()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.appends = 0
+        self.rebuilds = 0
+
+    def get(self, conn, player_id, mode, version, source=''):
+        """
+        Retorna a RatingSeries atualizada de (player_id, mode). `source` é o
+        prefixo das consultas em player_games (ver player_games_source)
+        """
+        key = (player_id, mode)
+        with self._lock:
+            series = self._series.get(key)
+            if series is not None:
+                self._series.move_to_end(key)
+                if series.version == version:
+                    self.hits += 1
+                    return series
+
+        return self._flight.do(key, lambda: self._refresh(conn, key, series, version, source))
+
+    def _refresh(self, conn, key, series, version, source):
+        player_id, mode = key
+        if series is None:
+            series = self._rebuild(conn, player_id, mode, source)
+        else:
+            new_points = self._load(conn, player_id, mode, source, after=series.last_key)
+            total = conn.execute(f'''
+                {source}
+                SELECT COUNT(*) FROM player_games
+                WHERE player_id = ? AND mode = ? AND rating_after IS NOT NULL
+            ''', (player_id, mode)).fetchone()[0]
+            if total == len(series.points) + len(new_points):
+                series = RatingSeries(series.points + new_points)
+                with self._lock:
+                    self.appends += 1
+            else:
+                series = self._rebuild(conn, player_id, mode, source)
+
+        series.version = version
+        with self._lock:
+            self._series[key] = series
+            self._series.move_to_end(key)
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        return series
+
+    def _rebuild(self, conn, player_id, mode, source=''):
+        series = RatingSeries(self._load(conn, player_id, mode, source))
+        with self._lock:
+            self.rebuilds += 1
+        return series
+
+    def _load(self, conn, player_id, mode, source='', after=None):
+        sql = f'''
+            {source}
+            SELECT played_at, game_id, rating_after FROM player_games
+            WHERE player_id = ? AND mode = ? AND rating_after IS NOT NULL
+        '''
+        params = [player_id, mode]
+        if after is not None:
+            sql += ' AND (played_at > ? OR (played_at = ? AND game_id > ?))'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY played_at, game_id'
+        return [(row[0], row[1], row[2], timestamp(row[0])) for row in conn.execute(sql, params)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'series': len(self._series),
+                'max_series': self.max_series,
+                'hits': self.hits,
+                'appends': self.appends,
+                'rebuilds': self.rebuilds,
+            }
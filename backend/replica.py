@@ -0,0 +1,176 @@
+"""
+Réplica de leitura do banco do bot
+Copia o legion_chess.db com a API de backup online do SQLite para um
+arquivo separado, trocado de forma atômica (os.replace), para que as
+transações do bot nunca segurem os leitores da API
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from db_pool import connect_readonly
+from log_config import get_logger
+
+logger = get_logger('replica')
+
+
+def file_state(path):
+    """(mtime_ns, tamanho) do arquivo, ou (0, 0) se não existe"""
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return 0, 0
+
+
+class ReadReplica:
+    """
+    Mantém `replica_path` como cópia de `source_path`.
+
+    A cada `interval` segundos, se o banco de origem (ou o -wal) mudou, faz
+    o backup para um arquivo temporário e o coloca no lugar da réplica com
+    os.replace. Leitores com o arquivo antigo aberto continuam vendo a cópia
+    anterior até reabrirem a conexão (o pool faz isso ao notar a troca).
+
+    A cópia guarda em `replica_meta` o estado da origem e o horário do
+    backup, então qualquer processo consegue calcular o atraso da réplica.
+    """
+
+    def __init__(self, source_path, replica_path, interval=5, busy_timeout=30):
+        self.source_path = source_path
+        self.replica_path = replica_path
+        self.interval = interval
+        self.busy_timeout = busy_timeout
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._meta_cache = (None, None)
+
+        self.refreshes = 0
+        self.errors = 0
+        self.last_duration = None
+        self.last_error = None
+
+    def source_state(self):
+        """Token que muda quando o banco de origem é gravado"""
+        return [*file_state(self.source_path), *file_state(self.source_path + '-wal')]
+
+    # ------------------------------------------
+    # Cópia
+    # ------------------------------------------
+
+    def refresh(self, force=False):
+        """Atualiza a réplica se a origem mudou. Retorna True se copiou."""
+        with self._lock:
+            state = self.source_state()
+            if not force and os.path.exists(self.replica_path):
+                meta = self.meta()
+                if meta and meta.get('source_state') == state:
+                    return False
+
+            started = time.time()
+            tmp_path = f'{self.replica_path}.{os.getpid()}.tmp'
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+            source = connect_readonly(self.source_path, self.busy_timeout)
+            target = sqlite3.connect(tmp_path)
+            try:
+                # Uma única etapa: em WAL a leitura da origem não bloqueia o bot
+                source.backup(target)
+                # Réplica somente-leitura: sem -wal/-shm para abrir com mode=ro
+                target.execute('PRAGMA journal_mode=DELETE')
+                target.execute('CREATE TABLE IF NOT EXISTS replica_meta (key TEXT PRIMARY KEY, value TEXT)')
+                target.execute(
+                    'INSERT OR REPLACE INTO replica_meta (key, value) VALUES (?, ?)',
+                    ('state', json.dumps({'source_state': state, 'copied_at': started}))
+                )
+                target.commit()
+            finally:
+                target.close()
+                source.close()
+
+            os.replace(tmp_path, self.replica_path)
+            self.refreshes += 1
+            self.last_duration = time.time() - started
+            return True
+
+    def ensure(self):
+        """Garante que a réplica existe (chamado antes de abrir o pool)"""
+        if not os.path.exists(self.replica_path):
+            self.refresh(force=True)
+
+    def meta(self):
+        """Estado da origem copiado na réplica atual (cacheado por arquivo)"""
+        key = file_state(self.replica_path)
+        cached_key, cached_meta = self._meta_cache
+        if key == cached_key:
+            return cached_meta
+        try:
+            conn = connect_readonly(self.replica_path, self.busy_timeout)
+            try:
+                row = conn.execute("SELECT value FROM replica_meta WHERE key = 'state'").fetchone()
+            finally:
+                conn.close()
+            meta = json.loads(row[0]) if row else None
+        except sqlite3.Error:
+            meta = None
+        self._meta_cache = (key, meta)
+        return meta
+
+    def lag(self):
+        """
+        Atraso da réplica em segundos: 0 se ela reflete a origem; senão, o
+        tempo desde o último backup (limite superior do atraso real)
+        """
+        meta = self.meta()
+        if meta is None:
+            return None
+        if meta['source_state'] == self.source_state():
+            return 0.0
+        return max(0.0, time.time() - meta['copied_at'])
+
+    # ------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='read-replica', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                logger.warning('Falha ao atualizar a réplica de leitura: %s', e)
+
+    def stats(self):
+        meta = self.meta() or {}
+        lag = self.lag()
+        return {
+            'mode': 'replica',
+            'path': self.replica_path,
+            'lag_seconds': None if lag is None else round(lag, 3),
+            'copied_at': meta.get('copied_at'),
+            'size_bytes': file_state(self.replica_path)[1],
+            'refreshes': self.refreshes,
+            'last_duration_ms': None if self.last_duration is None else round(self.last_duration * 1000, 2),
+            'errors': self.errors,
+            'last_error': self.last_error,
+        }
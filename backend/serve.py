@@ -0,0 +1,204 @@
+"""
+Servidor de produção da API
+Roda o app com vários processos e threads (gunicorn) no lugar do servidor de
+desenvolvimento do Flask. No Windows, ou embutido no bot, usa waitress.
+
+Uso:
+    python serve.py
+    python serve.py --backend waitress --port 5000
+    python serve.py --workers 4 --threads 16
+"""
+
+import argparse
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: só roda com um processo (waitress)
+    fcntl = None
+
+BACKENDS = ('auto', 'gunicorn', 'waitress', 'werkzeug')
+
+_leader_lock = None
+
+
+def try_become_leader(lock_path):
+    """
+    Só um worker roda as tarefas de segundo plano (pré-aquecimento de
+    avatares). Quem pegar o lock do arquivo vira o líder; o lock é liberado
+    quando o processo termina e o próximo worker criado o assume.
+    """
+    global _leader_lock
+    if fcntl is None:
+        return True
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    lock_file = open(lock_path, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _leader_lock = lock_file
+    return True
+
+
+def available(module_name):
+    try:
+        __import__(module_name)
+        return True
+    except ImportError:
+        return False
+
+
+def choose_backend(backend, embedded):
+    """Resolve 'auto' para o melhor servidor disponível neste ambiente"""
+    if backend != 'auto':
+        if backend == 'gunicorn' and embedded:
+            # gunicorn precisa da thread principal (sinais) e faz fork do bot
+            print('[WARN] gunicorn nao roda embutido no bot; usando waitress')
+            backend = 'auto'
+        else:
+            return backend
+
+    if not embedded and os.name != 'nt' and available('gunicorn'):
+        return 'gunicorn'
+    if available('waitress'):
+        return 'waitress'
+    return 'werkzeug'
+
+
+def prepare(api):
+    """Aplica as migrações uma vez, antes de abrir a porta (e antes do fork)"""
+    if api._schema_ready:
+        return
+    try:
+        api.init_database()
+    except Exception as e:
+        print(f'[ERROR] Falha ao aplicar migracoes: {e}')
+
+
+def run_gunicorn(api, host, port, workers, threads):
+    from gunicorn.app.base import BaseApplication
+
+    class StandaloneApplication(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    lock_path = os.path.join(config.AVATAR_CACHE_DIR, '.background.lock')
+
+    def post_fork(server, worker):
+        # Threads não sobrevivem ao fork: cada worker inicia as suas
+        if try_become_leader(lock_path):
+            api.start_background_workers()
+            server.log.info('Worker %s executa as tarefas em segundo plano', worker.pid)
+
+        # Streams SSE não terminam sozinhos: encerra-os ao receber SIGTERM
+        # para o worker sair dentro do graceful_timeout
+        handle_exit = worker.handle_exit
+
+        def handle_exit_and_close_streams(sig, frame):
+            api.stop_background_workers()
+            handle_exit(sig, frame)
+
+        worker.handle_exit = handle_exit_and_close_streams
+
+    def worker_exit(server, worker):
+        api.stop_background_workers()
+
+    options = {
+        'bind': f'{host}:{port}',
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'timeout': config.SERVER_TIMEOUT,
+        'graceful_timeout': config.SERVER_GRACEFUL_TIMEOUT,
+        'keepalive': config.SERVER_KEEPALIVE,
+        'max_requests': config.SERVER_MAX_REQUESTS,
+        'max_requests_jitter': config.SERVER_MAX_REQUESTS_JITTER,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+        'proc_name': 'legion-chess-api',
+    }
+    StandaloneApplication(api.app, options).run()
+
+
+def run_waitress(api, host, port, threads):
+    from waitress import serve as waitress_serve
+
+    api.start_background_workers()
+    try:
+        waitress_serve(api.app, host=host, port=port, threads=threads, ident='legion-chess-api')
+    finally:
+        api.stop_background_workers()
+
+
+def run_werkzeug(api, host, port):
+    api.start_background_workers()
+    try:
+        api.app.run(debug=False, host=host, port=port, threaded=True, use_reloader=False)
+    finally:
+        api.stop_background_workers()
+
+
+def serve(api, backend=None, host=None, port=None, workers=None, threads=None, embedded=False):
+    """
+    Sobe a API com o servidor escolhido.
+
+    `api` é o módulo app já importado. Com `embedded=True` (thread do bot)
+    roda em um único processo, sem depender de sinais.
+    """
+    backend = choose_backend(backend or config.SERVER_BACKEND, embedded)
+    host = host or config.SERVER_HOST
+    port = port or config.SERVER_PORT
+    workers = workers or config.SERVER_WORKERS
+    # Threads extras só para os clientes do /api/stream (um por thread)
+    threads = (threads or config.SERVER_THREADS) + config.STREAM_MAX_SUBSCRIBERS
+
+    prepare(api)
+
+    if backend == 'gunicorn':
+        print(f'[INFO] gunicorn em http://{host}:{port} ({workers} workers x {threads} threads, '
+              f'{config.STREAM_MAX_SUBSCRIBERS} delas para o stream)')
+        run_gunicorn(api, host, port, workers, threads)
+    elif backend == 'waitress':
+        print(f'[INFO] waitress em http://{host}:{port} ({threads} threads, '
+              f'{config.STREAM_MAX_SUBSCRIBERS} delas para o stream)')
+        run_waitress(api, host, port, threads)
+    elif backend == 'werkzeug':
+        print(f'[WARN] Servidor de desenvolvimento do Flask em http://{host}:{port}')
+        run_werkzeug(api, host, port)
+    else:
+        raise ValueError(f'Servidor desconhecido: {backend}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor de produção da API Legion Chess')
+    parser.add_argument('--backend', choices=BACKENDS, default=config.SERVER_BACKEND)
+    parser.add_argument('--host', default=config.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=config.SERVER_PORT)
+    parser.add_argument('--workers', type=int, default=config.SERVER_WORKERS)
+    parser.add_argument('--threads', type=int, default=config.SERVER_THREADS)
+    args = parser.parse_args()
+
+    import app as api
+    serve(api, args.backend, args.host, args.port, args.workers, args.threads)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Log de consultas lentas
+Registra as consultas feitas pelas conexões do pool que passam de um limite,
+com o SQL normalizado, o formato dos parâmetros e o EXPLAIN QUERY PLAN
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from urllib.request import pathname2url
+
+from metrics import TimedCursor
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """SQL sem literais e espaços extras, para agrupar consultas iguais"""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(?, ...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def param_shape(parameters):
+    """Tipos dos parâmetros (os valores não são guardados)"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in parameters]
+
+
+class SlowQueryLog:
+    """
+    Buffer circular com as últimas consultas lentas.
+
+    O EXPLAIN QUERY PLAN roda em uma conexão própria (somente leitura), para
+    não interferir na conexão que executou a consulta.
+    """
+
+    def __init__(self, db_path, threshold_ms=50, size=200, busy_timeout=30):
+        self.db_path = db_path
+        self.threshold = threshold_ms / 1000
+        self.busy_timeout = busy_timeout
+        self._records = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._explain_lock = threading.Lock()
+        self._explain_conn = None
+        self._pid = os.getpid()
+        self.recorded = 0
+
+    def cursor_factory(self):
+        """Classe de cursor que reporta neste log (usada como cursor_factory do pool)"""
+        return type('SlowQueryCursor', (SlowQueryCursor,), {'slow_query_log': self})
+
+    def explain(self, sql, parameters):
+        with self._explain_lock:
+            try:
+                if self._conn_needs_open():
+                    uri = f'file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro'
+                    self._explain_conn = sqlite3.connect(
+                        uri, uri=True, timeout=self.busy_timeout, check_same_thread=False
+                    )
+                    self._pid = os.getpid()
+                rows = self._explain_conn.execute(f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+                return [row[3] for row in rows]
+            except sqlite3.Error as e:
+                return [f'(plano indisponível: {e})']
+
+    def _conn_needs_open(self):
+        # Após um fork a conexão herdada pertence ao processo pai
+        return self._explain_conn is None or self._pid != os.getpid()
+
+    def record(self, sql, parameters, duration, rows):
+        if duration < self.threshold:
+            return
+        entry = {
+            'at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
+            'sql': normalize_sql(sql),
+            'params': param_shape(parameters),
+            'duration_ms': round(duration * 1000, 2),
+            'rows': rows,
+            'plan': self.explain(sql, parameters),
+        }
+        with self._lock:
+            self._records.append(entry)
+            self.recorded += 1
+
+    def records(self):
+        """Consultas lentas registradas, mais recentes primeiro"""
+        with self._lock:
+            return list(reversed(self._records))
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'threshold_ms': round(self.threshold * 1000, 2),
+                'buffered': len(self._records),
+                'max_buffered': self._records.maxlen,
+                'recorded': self.recorded,
+            }
+
+
+class SlowQueryCursor(TimedCursor):
+    """
+    Cursor que mede cada consulta do execute() até o último fetch (o SQLite
+    só percorre as linhas conforme são lidas) e reporta as lentas ao log.
+    A medição fecha quando o resultado acaba, no próximo execute() ou quando
+    o cursor é descartado.
+    """
+
+    slow_query_log = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._pending = [sql, parameters, time.perf_counter() - start, 0]
+
+    def _measure(self, fetch, *args):
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            pending = getattr(self, '_pending', None)
+            if pending is not None:
+                pending[2] += time.perf_counter() - start
+
+    def _add_rows(self, count, done):
+        pending = getattr(self, '_pending', None)
+        if pending is not None:
+            pending[3] += count
+            if done:
+                self._finish()
+
+    def fetchone(self):
+        row = self._measure(super().fetchone)
+        self._add_rows(0 if row is None else 1, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._measure(super().fetchmany, size)
+        self._add_rows(len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        rows = self._measure(super().fetchall)
+        self._add_rows(len(rows), True)
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._measure(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        self._add_rows(1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def _finish(self):
+        pending = self.__dict__.pop('_pending', None)
+        if pending is not None and self.slow_query_log is not None:
+            self.slow_query_log.record(*pending)
@@ -0,0 +1,62 @@
+"""
+Snapshots de respostas JSON serializadas uma única vez
+Guardam o corpo pronto e as variantes gzip/brotli para servir direto
+"""
+
+import gzip
+import json
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; json da stdlib funciona igual
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # sem brotli, só gzip
+    brotli = None
+
+# Abaixo disso comprimir não compensa
+MIN_COMPRESS_SIZE = 1024
+
+
+def dumps(payload):
+    """Serializa o payload em bytes UTF-8 (chaves ordenadas, como o jsonify)"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+class Snapshot:
+    """Corpo JSON pronto de um payload, com variantes pré-comprimidas"""
+
+    def __init__(self, payload, gzip_level=6, brotli_quality=5):
+        body = dumps(payload)
+        self.variants = {'identity': body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.variants['gzip'] = gzip.compress(body, compresslevel=gzip_level, mtime=0)
+            if brotli is not None:
+                self.variants['br'] = brotli.compress(body, quality=brotli_quality)
+
+    def choose_encoding(self, accept_encodings):
+        """Escolhe a menor variante aceita pelo cliente"""
+        best = 'identity'
+        for encoding in ('gzip', 'br'):
+            if encoding in self.variants and accept_encodings[encoding]:
+                if len(self.variants[encoding]) < len(self.variants[best]):
+                    best = encoding
+        return best
+
+    def response(self, request):
+        """Monta a Response com a variante adequada ao Accept-Encoding"""
+        encoding = self.choose_encoding(request.accept_encodings)
+        response = Response(self.variants[encoding], mimetype='application/json')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    def stats(self):
+        return {encoding: len(body) for encoding, body in self.variants.items()}
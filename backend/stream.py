@@ -0,0 +1,213 @@
+"""
+Canal Server-Sent Events (/api/stream)
+Um único observador detecta mudanças no banco, recalcula os payloads uma vez
+e envia os novos snapshots para todos os clientes conectados
+"""
+
+import hashlib
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from snapshots import dumps
+from log_config import get_logger
+
+logger = get_logger('stream')
+
+
+class TooManySubscribers(Exception):
+    """Limite de clientes conectados ao stream atingido"""
+
+
+class Subscriber:
+    def __init__(self, topics, max_queue):
+        self.topics = topics
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = False
+
+
+class EventBroadcaster:
+    """
+    Publica eventos SSE por tópico.
+
+    `topics` é um dict {nome: builder()}; cada builder retorna o payload
+    atual do tópico. Os builders só rodam quando `data_version()` muda, e um
+    evento só é publicado se o payload realmente mudou.
+    """
+
+    def __init__(self, data_version, topics, poll_interval=1.0, heartbeat=15,
+                 max_subscribers=100, history_size=256, max_queue=64):
+        self.data_version = data_version
+        self.topics = topics
+        self.poll_interval = poll_interval
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self.max_queue = max_queue
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._latest = {}
+        self._digests = {}
+        self._next_id = 1
+        self._epoch = None
+        self._last_version = None
+        self._thread = None
+        self._stop = threading.Event()
+
+        self.published = 0
+        self.recomputes = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    # ------------------------------------------
+    # Observador
+    # ------------------------------------------
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            # Ids de evento só valem dentro deste processo; com vários workers
+            # o cliente pode reconectar em outro e precisa receber o snapshot
+            self._epoch = f'{os.getpid():x}{int(time.time()):x}'
+            self._thread = threading.Thread(target=self._watch_loop, name='sse-watch', daemon=True)
+            self._thread.start()
+        # Snapshot inicial já disponível para o primeiro cliente; se o banco
+        # estiver ocupado agora, o observador tenta de novo no próximo ciclo
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning('Falha ao calcular os eventos iniciais do stream: %s', e)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+        # Encerra os streams abertos; os clientes reconectam sozinhos
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.dropped = True
+            try:
+                sub.queue.put_nowait(None)
+            except queue.Full:
+                pass
+
+    def _watch_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning('Falha ao recalcular eventos do stream: %s', e)
+
+    def refresh(self):
+        """Recalcula os tópicos se o banco mudou e publica o que mudou"""
+        # start() e o observador podem chamar ao mesmo tempo
+        with self._refresh_lock:
+            version = self.data_version()
+            if version == self._last_version:
+                return
+            self.recomputes += 1
+            for topic, builder in self.topics.items():
+                data = dumps(builder())
+                digest = hashlib.sha1(data).hexdigest()
+                if self._digests.get(topic) != digest:
+                    self._digests[topic] = digest
+                    self.publish(topic, data)
+            self._last_version = version
+
+    def publish(self, topic, data):
+        with self._lock:
+            event = (self._next_id, topic, data)
+            self._next_id += 1
+            self._history.append(event)
+            self._latest[topic] = event
+            self.published += 1
+            subscribers = list(self._subscribers)
+
+        for sub in subscribers:
+            if topic not in sub.topics:
+                continue
+            try:
+                sub.queue.put_nowait(event)
+            except queue.Full:
+                # Cliente lento: derruba; ele reconecta com Last-Event-ID
+                sub.dropped = True
+                self.dropped += 1
+
+    # ------------------------------------------
+    # Clientes
+    # ------------------------------------------
+
+    def subscribe(self, topics=None):
+        topics = set(topics or self.topics) & set(self.topics)
+        sub = Subscriber(topics, self.max_queue)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                raise TooManySubscribers(f'Limite de {self.max_subscribers} conexões atingido')
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def _initial_events(self, sub, last_event_id):
+        """Eventos perdidos desde Last-Event-ID, ou o snapshot atual de cada tópico"""
+        with self._lock:
+            history = list(self._history)
+            latest = dict(self._latest)
+
+        if last_event_id is not None and history and history[0][0] <= last_event_id + 1:
+            return [event for event in history if event[0] > last_event_id and event[1] in sub.topics]
+        return sorted(event for topic, event in latest.items() if topic in sub.topics)
+
+    def parse_event_id(self, value):
+        """Converte o Last-Event-ID ('<epoch>-<n>') no número do evento, se for deste processo"""
+        epoch, _, number = (value or '').partition('-')
+        if epoch != self._epoch or not number.isdigit():
+            return None
+        return int(number)
+
+    def format_event(self, event):
+        event_id, topic, data = event
+        return f'id: {self._epoch}-{event_id}\nevent: {topic}\ndata: '.encode() + data + b'\n\n'
+
+    def stream(self, sub, last_event_id=None):
+        """Gerador com o corpo text/event-stream de um cliente"""
+        try:
+            yield f'retry: {int(self.poll_interval * 1000) + 2000}\n\n'.encode()
+            for event in self._initial_events(sub, last_event_id):
+                yield self.format_event(event)
+
+            while not sub.dropped:
+                try:
+                    event = sub.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield f': heartbeat {int(time.time())}\n\n'.encode()
+                    continue
+                if event is None:
+                    break
+                yield self.format_event(event)
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self._thread is not None,
+                'subscribers': len(self._subscribers),
+                'max_subscribers': self.max_subscribers,
+                'last_event_id': self._next_id - 1,
+                'published': self.published,
+                'recomputes': self.recomputes,
+                'dropped': self.dropped,
+                'rejected': self.rejected,
+            }
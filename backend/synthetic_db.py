@@ -0,0 +1,360 @@
+"""
+Gerador de bancos sintéticos do bot
+Cria um legion_chess.db com o esquema do bot (jogadores, partidas,
+conquistas, torneios suíços e participantes) no tamanho desejado, para
+testes de carga e benchmarks sem depender do banco de produção.
+
+Uso:
+    python synthetic_db.py bench.db --scale medium
+    python synthetic_db.py bench.db --players 5000 --games 200000 --seed 7
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Escalas pré-definidas: (jogadores, partidas, conquistas, torneios, participantes por torneio)
+SCALES = {
+    'tiny': (50, 500, 100, 5, 8),
+    'small': (500, 20000, 1500, 20, 16),
+    'medium': (5000, 250000, 15000, 100, 32),
+    'large': (20000, 1000000, 60000, 300, 64),
+}
+
+MODES = {'bullet': '1+0', 'blitz': '5+3', 'rapid': '15+10', 'classic': '30+20'}
+MODE_WEIGHTS = (2, 5, 2, 1)
+
+ACHIEVEMENTS = (
+    ('Primeira Vitória', 'Venceu a primeira partida', 'milestone'),
+    ('Veterano', 'Jogou 100 partidas', 'milestone'),
+    ('Sequência de 5', 'Venceu 5 partidas seguidas', 'streak'),
+    ('Sequência de 10', 'Venceu 10 partidas seguidas', 'streak'),
+    ('Mestre do Blitz', 'Chegou a 1800 no blitz', 'rating'),
+    ('Mestre do Rápido', 'Chegou a 1800 no rápido', 'rating'),
+    ('Campeão Suíço', 'Venceu um torneio suíço', 'tournament'),
+    ('Zebra', 'Venceu alguém 400 pontos acima', 'special'),
+)
+
+TOURNAMENT_TIME_CONTROLS = ('3+0', '3+2', '5+3', '10+0', '15+10')
+
+BATCH_SIZE = 10000
+
+SCHEMA = '''
+    CREATE TABLE players (
+        discord_id TEXT PRIMARY KEY,
+        discord_username TEXT NOT NULL,
+        lichess_username TEXT,
+        rating INTEGER DEFAULT 1200,
+        rating_bullet INTEGER DEFAULT 1200,
+        rating_blitz INTEGER DEFAULT 1200,
+        rating_rapid INTEGER DEFAULT 1200,
+        rating_classic INTEGER DEFAULT 1200,
+        wins_bullet INTEGER DEFAULT 0,
+        losses_bullet INTEGER DEFAULT 0,
+        draws_bullet INTEGER DEFAULT 0,
+        wins_blitz INTEGER DEFAULT 0,
+        losses_blitz INTEGER DEFAULT 0,
+        draws_blitz INTEGER DEFAULT 0,
+        wins_rapid INTEGER DEFAULT 0,
+        losses_rapid INTEGER DEFAULT 0,
+        draws_rapid INTEGER DEFAULT 0,
+        wins_classic INTEGER DEFAULT 0,
+        losses_classic INTEGER DEFAULT 0,
+        draws_classic INTEGER DEFAULT 0,
+        wins INTEGER DEFAULT 0,
+        losses INTEGER DEFAULT 0,
+        draws INTEGER DEFAULT 0,
+        avatar_hash TEXT
+    );
+
+    CREATE TABLE game_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        player1_id TEXT,
+        player2_id TEXT,
+        player1_name TEXT,
+        player2_name TEXT,
+        winner_id TEXT,
+        result TEXT,
+        mode TEXT,
+        time_control TEXT,
+        game_url TEXT,
+        player1_rating_before INTEGER,
+        player2_rating_before INTEGER,
+        player1_rating_after INTEGER,
+        player2_rating_after INTEGER,
+        played_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE achievements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        player_id TEXT,
+        achievement_name TEXT,
+        description TEXT,
+        value INTEGER,
+        unlocked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        achievement_type TEXT
+    );
+
+    CREATE TABLE swiss_tournaments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        description TEXT,
+        status TEXT DEFAULT 'open',
+        time_control TEXT,
+        nb_rounds INTEGER,
+        created_by TEXT,
+        winner_id TEXT,
+        max_players INTEGER DEFAULT 16,
+        current_round INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP
+    );
+
+    CREATE TABLE swiss_participants (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tournament_id INTEGER,
+        player_id TEXT,
+        score REAL DEFAULT 0,
+        joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+'''
+
+PLAYER_COLUMNS = (
+    'discord_id', 'discord_username', 'lichess_username', 'rating',
+    'rating_bullet', 'rating_blitz', 'rating_rapid', 'rating_classic',
+    'wins_bullet', 'losses_bullet', 'draws_bullet',
+    'wins_blitz', 'losses_blitz', 'draws_blitz',
+    'wins_rapid', 'losses_rapid', 'draws_rapid',
+    'wins_classic', 'losses_classic', 'draws_classic',
+    'wins', 'losses', 'draws', 'avatar_hash',
+)
+
+GAME_COLUMNS = (
+    'player1_id', 'player2_id', 'player1_name', 'player2_name', 'winner_id',
+    'result', 'mode', 'time_control', 'game_url',
+    'player1_rating_before', 'player2_rating_before',
+    'player1_rating_after', 'player2_rating_after', 'played_at',
+)
+
+
+def sql_timestamp(moment):
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def insert_many(conn, table, columns, rows):
+    sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+    for start in range(0, len(rows), BATCH_SIZE):
+        conn.executemany(sql, rows[start:start + BATCH_SIZE])
+
+
+class Player:
+    __slots__ = ('discord_id', 'name', 'strength', 'ratings', 'results', 'active')
+
+    def __init__(self, index, rng):
+        self.discord_id = str(100000000000000000 + index * 7919)
+        self.name = f'jogador_{index:06d}'
+        # Força "real" do jogador: decide quem tende a vencer
+        self.strength = rng.gauss(1500, 250)
+        self.ratings = {mode: 1200 for mode in MODES}
+        self.results = {mode: [0, 0, 0] for mode in MODES}  # vitórias, derrotas, empates
+        # Atividade segue uma cauda longa: poucos jogam muito
+        self.active = rng.paretovariate(1.2)
+
+    def row(self, rng):
+        stats = []
+        for mode in MODES:
+            stats.extend(self.results[mode])
+        totals = [sum(self.results[mode][i] for mode in MODES) for i in range(3)]
+        avatar_hash = f'{rng.getrandbits(128):032x}' if rng.random() < 0.7 else None
+        lichess = f'li_{self.name}' if rng.random() < 0.8 else None
+        return (
+            self.discord_id, self.name, lichess, self.ratings['blitz'],
+            self.ratings['bullet'], self.ratings['blitz'], self.ratings['rapid'], self.ratings['classic'],
+            *stats, *totals, avatar_hash,
+        )
+
+
+def elo_update(rating_a, rating_b, score_a, k=20):
+    expected = 1 / (1 + 10 ** ((rating_b - rating_a) / 400))
+    delta = round(k * (score_a - expected))
+    return rating_a + delta, rating_b - delta
+
+
+def build_games(players, games, days, rng, now):
+    """Partidas em ordem cronológica, com os ratings evoluindo por Elo"""
+    cum_weights = list(itertools.accumulate(p.active for p in players))
+    modes = list(MODES)
+    start = now - timedelta(days=days)
+    step = timedelta(days=days) / max(games, 1)
+    rows = []
+
+    for i in range(games):
+        a, b = rng.choices(players, cum_weights=cum_weights, k=2)
+        while b is a:
+            b = rng.choice(players)
+        mode = rng.choices(modes, weights=MODE_WEIGHTS)[0]
+
+        expected_a = 1 / (1 + 10 ** ((b.strength - a.strength) / 400))
+        roll = rng.random()
+        if roll < 0.08:
+            score_a, result, winner = 0.5, 'draw', None
+        elif roll < 0.08 + 0.92 * expected_a:
+            score_a, result, winner = 1.0, 'win', a.discord_id
+        else:
+            score_a, result, winner = 0.0, 'win', b.discord_id
+
+        before_a, before_b = a.ratings[mode], b.ratings[mode]
+        after_a, after_b = elo_update(before_a, before_b, score_a)
+        a.ratings[mode], b.ratings[mode] = after_a, after_b
+
+        if score_a == 0.5:
+            a.results[mode][2] += 1
+            b.results[mode][2] += 1
+        elif score_a == 1.0:
+            a.results[mode][0] += 1
+            b.results[mode][1] += 1
+        else:
+            a.results[mode][1] += 1
+            b.results[mode][0] += 1
+
+        played_at = start + step * i + timedelta(seconds=rng.randint(0, 59))
+        rows.append((
+            a.discord_id, b.discord_id, a.name, b.name, winner, result,
+            mode, MODES[mode], f'https://lichess.org/{rng.getrandbits(40):010x}',
+            before_a, before_b, after_a, after_b, sql_timestamp(played_at),
+        ))
+    return rows
+
+
+def build_achievements(players, count, days, rng, now):
+    rows = []
+    for _ in range(count):
+        player = rng.choice(players)
+        name, description, kind = rng.choice(ACHIEVEMENTS)
+        unlocked_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+        rows.append((player.discord_id, name, description, rng.randint(1, 100), sql_timestamp(unlocked_at), kind))
+    return rows
+
+
+def build_tournaments(players, count, per_tournament, days, rng, now):
+    tournaments, participants = [], []
+    per_tournament = min(per_tournament, len(players))
+    for t in range(count):
+        # Os mais recentes ainda estão abertos ou em andamento
+        status = 'finished' if t < count * 0.8 else rng.choice(('open', 'in_progress'))
+        created_at = now - timedelta(days=days * (count - t) / max(count, 1))
+        started_at = created_at + timedelta(hours=1)
+        entrants = rng.sample(players, per_tournament)
+        winner = max(entrants, key=lambda p: p.strength + rng.gauss(0, 150)) if status == 'finished' else None
+        nb_rounds = max(3, per_tournament.bit_length())
+        tournaments.append((
+            t + 1, f'Torneio Suíço #{t + 1}', 'Torneio gerado para testes', status,
+            rng.choice(TOURNAMENT_TIME_CONTROLS), nb_rounds, entrants[0].discord_id,
+            winner.discord_id if winner else None, per_tournament,
+            nb_rounds if status == 'finished' else (rng.randint(1, nb_rounds) if status == 'in_progress' else 0),
+            sql_timestamp(created_at),
+            sql_timestamp(started_at) if status != 'open' else None,
+            sql_timestamp(started_at + timedelta(hours=2)) if status == 'finished' else None,
+        ))
+        for player in entrants:
+            score = rng.randint(0, nb_rounds * 2) / 2 if status != 'open' else 0
+            participants.append((t + 1, player.discord_id, score, sql_timestamp(created_at)))
+    return tournaments, participants
+
+
+def generate(path, players=500, games=20000, achievements=1500, tournaments=20,
+             participants=16, days=365, seed=42, overwrite=False):
+    """
+    Gera o banco em `path` e retorna as contagens de cada tabela.
+    O arquivo é montado em um temporário e movido no final, então um banco
+    pela metade nunca fica no caminho final.
+    """
+    if players < 2:
+        raise ValueError('São necessários pelo menos 2 jogadores')
+    if os.path.exists(path) and not overwrite:
+        raise FileExistsError(f'{path} já existe (use overwrite=True / --force)')
+
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    people = [Player(i, rng) for i in range(players)]
+
+    game_rows = build_games(people, games, days, rng, now)
+    achievement_rows = build_achievements(people, achievements, days, rng, now)
+    tournament_rows, participant_rows = build_tournaments(people, tournaments, participants, days, rng, now)
+    player_rows = [p.row(rng) for p in people]
+
+    tmp_path = f'{path}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.executescript(SCHEMA)
+        with conn:
+            insert_many(conn, 'players', PLAYER_COLUMNS, player_rows)
+            insert_many(conn, 'game_history', GAME_COLUMNS, game_rows)
+            insert_many(conn, 'achievements', (
+                'player_id', 'achievement_name', 'description', 'value', 'unlocked_at', 'achievement_type',
+            ), achievement_rows)
+            insert_many(conn, 'swiss_tournaments', (
+                'id', 'name', 'description', 'status', 'time_control', 'nb_rounds', 'created_by',
+                'winner_id', 'max_players', 'current_round', 'created_at', 'started_at', 'finished_at',
+            ), tournament_rows)
+            insert_many(conn, 'swiss_participants', (
+                'tournament_id', 'player_id', 'score', 'joined_at',
+            ), participant_rows)
+        conn.execute('ANALYZE')
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+    return {
+        'players': len(player_rows),
+        'game_history': len(game_rows),
+        'achievements': len(achievement_rows),
+        'swiss_tournaments': len(tournament_rows),
+        'swiss_participants': len(participant_rows),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera um legion_chess.db sintético para testes de carga')
+    parser.add_argument('path', help='Arquivo do banco a ser criado')
+    parser.add_argument('--scale', choices=SCALES, default='small', help='Tamanho pré-definido (padrão: small)')
+    parser.add_argument('--players', type=int, help='Número de jogadores')
+    parser.add_argument('--games', type=int, help='Número de partidas')
+    parser.add_argument('--achievements', type=int, help='Número de conquistas')
+    parser.add_argument('--tournaments', type=int, help='Número de torneios suíços')
+    parser.add_argument('--participants', type=int, help='Participantes por torneio')
+    parser.add_argument('--days', type=int, default=365, help='Período coberto pelas partidas (dias até hoje)')
+    parser.add_argument('--seed', type=int, default=42, help='Semente (mesma semente = mesmo banco)')
+    parser.add_argument('--force', action='store_true', help='Sobrescreve o arquivo se existir')
+    args = parser.parse_args()
+
+    scale = dict(zip(('players', 'games', 'achievements', 'tournaments', 'participants'), SCALES[args.scale]))
+    for key in scale:
+        value = getattr(args, key)
+        if value is not None:
+            scale[key] = value
+
+    print(f'[INFO] Gerando {args.path}: ' + ', '.join(f'{k}={v}' for k, v in scale.items()))
+    started = time.perf_counter()
+    try:
+        counts = generate(args.path, days=args.days, seed=args.seed, overwrite=args.force, **scale)
+    except (FileExistsError, ValueError) as e:
+        print(f'[ERROR] {e}')
+        sys.exit(1)
+    print(f'[OK] Banco gerado em {time.perf_counter() - started:.1f}s')
+    for table, count in counts.items():
+        print(f'  {table}: {count}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Testes do controle de admissão (admission.py): rate limit e limite de concorrência
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import admission
+from admission import ConcurrencyLimiter, RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # Só o relógio do admission.py: o resto da API segue com o time real
+    monkeypatch.setattr(admission, 'time', SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_burst_then_average_rate(clock):
+    limiter = RateLimiter({'default': (3, 60)})
+    assert [limiter.check('1.1.1.1') for _ in range(3)] == [0, 0, 0]
+    assert limiter.check('1.1.1.1') == 20
+
+    clock.now += 20
+    assert limiter.check('1.1.1.1') == 0
+    assert limiter.check('1.1.1.1') > 0
+    assert limiter.stats()['limited'] == {'default': 2}
+
+
+def test_clients_and_route_classes_have_separate_budgets(clock):
+    limiter = RateLimiter({'default': (1, 60), 'historico': (2, 60)})
+    assert limiter.check('a') == 0
+    assert limiter.check('a') > 0
+    assert limiter.check('b') == 0
+    assert limiter.check('a', 'historico') == 0
+    assert limiter.check('a', 'historico') == 0
+    assert limiter.check('a', 'historico') > 0
+    # Classe sem orçamento próprio usa o padrão
+    assert limiter.check('a', 'avatar') > 0
+
+
+def test_least_recent_clients_are_forgotten(clock):
+    limiter = RateLimiter({'default': (1, 60)}, max_clients=2)
+    for client in ('a', 'b', 'c'):
+        limiter.check(client)
+    assert limiter.stats()['clients'] == 2
+    # 'a' saiu do LRU e recebe um balde cheio de novo
+    assert limiter.check('a') == 0
+
+
+def test_concurrency_limiter_rejects_when_full():
+    limiter = ConcurrencyLimiter('db', 1, queue_timeout=0.01)
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release()
+    assert limiter.try_acquire()
+    limiter.release()
+    assert limiter.stats() == {'limit': 1, 'active': 0, 'peak': 1, 'admitted': 2, 'rejected': 1}
+
+
+@pytest.fixture
+def rate_limited(api, monkeypatch, clock):
+    monkeypatch.setattr(api.config, 'RATE_LIMIT_ENABLED', True)
+    limiter = RateLimiter({'default': (2, 60), 'historico': (1, 60)})
+    monkeypatch.setattr(api, 'rate_limiter', limiter)
+    return limiter
+
+
+def get(client, url, ip='10.0.0.1', **kwargs):
+    return client.get(url, environ_base={'REMOTE_ADDR': ip}, **kwargs)
+
+
+def test_rate_limited_client_gets_429(client, player_ids, rate_limited):
+    url = f'/api/jogador/{player_ids[0]}'
+    assert get(client, url).status_code == 200
+    assert get(client, url).status_code == 200
+
+    response = get(client, url)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) == 30
+    assert response.get_json()['retry_after'] == 30
+
+    assert get(client, url, ip='10.0.0.2').status_code == 200
+    assert get(client, '/api/health').status_code == 200
+
+
+def test_expensive_routes_have_their_own_budget(client, player_ids, rate_limited):
+    assert get(client, f'/api/historico/{player_ids[0]}').status_code == 200
+    assert get(client, f'/api/historico/{player_ids[0]}').status_code == 429
+    assert get(client, f'/api/jogador/{player_ids[0]}').status_code == 200
+
+
+def test_forwarded_for_behind_trusted_proxy(api, client, player_ids, rate_limited, monkeypatch):
+    monkeypatch.setattr(api.config, 'TRUSTED_PROXIES', 1)
+    url = f'/api/jogador/{player_ids[0]}'
+    for _ in range(2):
+        assert get(client, url, headers={'X-Forwarded-For': '1.2.3.4'}).status_code == 200
+    assert get(client, url, headers={'X-Forwarded-For': '1.2.3.4'}).status_code == 429
+    assert get(client, url, headers={'X-Forwarded-For': '5.6.7.8'}).status_code == 200
+
+
+def test_full_db_limiter_answers_503_fast(api, client, player_ids, monkeypatch):
+    limiter = ConcurrencyLimiter('db', 1, queue_timeout=0.01)
+    monkeypatch.setitem(api.concurrency_limiters, 'db', limiter)
+    assert limiter.try_acquire()
+    try:
+        response = client.get(f'/api/jogador/{player_ids[0]}')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == str(api.config.OVERLOAD_RETRY_AFTER)
+        # Rotas isentas continuam respondendo
+        assert client.get('/api/health').status_code == 200
+    finally:
+        limiter.release()
+
+    assert client.get(f'/api/jogador/{player_ids[0]}').status_code == 200
+    assert limiter.stats()['active'] == 0
@@ -0,0 +1,157 @@
+"""
+Testes do cache de avatares em disco (avatar_cache.py e /api/avatar/<id>),
+com um CDN falso no lugar do Discord
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from avatar_cache import AvatarCache, AvatarUnavailable
+
+
+class StubCDN:
+    """Fetcher falso: responde 200 com o conteúdo do avatar ou 304 se o ETag bater"""
+
+    def __init__(self, size=100):
+        self.size = size
+        self.calls = []
+        self.status = None
+        self.delay = 0
+        self._lock = threading.Lock()
+
+    def content(self, url):
+        return url.encode().ljust(self.size, b'.')[:self.size]
+
+    def __call__(self, url, headers):
+        with self._lock:
+            self.calls.append((url, dict(headers)))
+        time.sleep(self.delay)
+        if self.status is not None:
+            return self.status, b'', {}
+        etag = f'"{len(url)}"'
+        if headers.get('If-None-Match') == etag:
+            return 304, b'', {}
+        return 200, self.content(url), {'ETag': etag, 'Content-Type': 'image/png'}
+
+
+@pytest.fixture
+def cdn():
+    return StubCDN()
+
+
+def new_cache(tmp_path, cdn, **kwargs):
+    return AvatarCache(str(tmp_path), cdn_base='https://cdn.test', fetcher=cdn, **kwargs)
+
+
+def test_miss_is_stored_and_then_served_from_disk(tmp_path, cdn):
+    cache = new_cache(tmp_path, cdn)
+    entry = cache.get('123', 'abc')
+    assert [url for url, _ in cdn.calls] == ['https://cdn.test/avatars/123/abc.png']
+    with open(entry.path, 'rb') as f:
+        assert f.read() == cdn.content('https://cdn.test/avatars/123/abc.png')
+
+    assert cache.get('123', 'abc') is entry
+    assert len(cdn.calls) == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_new_avatar_hash_is_a_new_entry(tmp_path, cdn):
+    cache = new_cache(tmp_path, cdn)
+    old = cache.get('123', 'abc')
+    new = cache.get('123', 'def')
+    assert new.path != old.path
+    assert len(cdn.calls) == 2
+
+
+def test_default_avatar_without_hash(tmp_path, cdn):
+    cache = new_cache(tmp_path, cdn)
+    cache.get('7')
+    assert cdn.calls[0][0] == 'https://cdn.test/embed/avatars/2.png'
+
+
+def test_stale_entry_is_revalidated_with_etag(tmp_path, cdn):
+    cache = new_cache(tmp_path, cdn, fresh_for=0)
+    entry = cache.get('123', 'abc')
+    assert cache.get('123', 'abc') is entry
+
+    url, headers = cdn.calls[-1]
+    assert headers['If-None-Match'] == f'"{len(url)}"'
+    assert cache.stats()['revalidated'] == 1
+
+
+def test_upstream_failure_serves_the_stale_copy(tmp_path, cdn):
+    cache = new_cache(tmp_path, cdn, fresh_for=0)
+    entry = cache.get('123', 'abc')
+    cdn.status = 503
+    assert cache.get('123', 'abc') is entry
+
+    with pytest.raises(AvatarUnavailable):
+        cache.get('456', 'abc')
+    assert cache.stats()['errors'] == 2
+
+
+def test_least_recently_used_avatars_are_evicted(tmp_path, cdn):
+    cache = new_cache(tmp_path, cdn, max_bytes=250)
+    first = cache.get('1', 'a')
+    second = cache.get('2', 'b')
+    second.last_used = first.last_used + 1
+    cache.get('3', 'c')
+
+    assert not os.path.exists(first.path)
+    assert os.path.exists(second.path)
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['bytes'] == 200
+
+
+def test_deleted_file_is_fetched_again(tmp_path, cdn):
+    cache = new_cache(tmp_path, cdn)
+    entry = cache.get('123', 'abc')
+    os.remove(entry.path)
+
+    again = cache.get('123', 'abc')
+    assert os.path.exists(again.path)
+    assert len(cdn.calls) == 2
+    assert cache.stats()['bytes'] == 100
+
+
+def test_index_is_loaded_from_disk(tmp_path, cdn):
+    new_cache(tmp_path, cdn).get('123', 'abc')
+    cache = new_cache(tmp_path, cdn)
+    cache.get('123', 'abc')
+    assert len(cdn.calls) == 1
+    assert cache.stats()['entries'] == 1
+
+
+def test_concurrent_misses_fetch_once(tmp_path, cdn):
+    cache = new_cache(tmp_path, cdn)
+    cdn.delay = 0.1
+    start = threading.Barrier(8)
+
+    def worker():
+        start.wait()
+        cache.get('123', 'abc')
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cdn.calls) == 1
+
+
+def test_avatar_endpoint_answers_304(api, client, player_ids, cdn, monkeypatch):
+    monkeypatch.setattr(api.avatar_cache, 'fetcher', cdn)
+    player = player_ids[0]
+
+    response = client.get(f'/api/avatar/{player}')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    etag = response.headers['ETag']
+    response.close()
+
+    cached = client.get(f'/api/avatar/{player}', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert len(cdn.calls) == 1
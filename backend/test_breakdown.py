@@ -0,0 +1,154 @@
+"""
+Testes de /api/jogador/<id>/breakdown (breakdown.py)
+"""
+
+import pytest
+
+from breakdown import compute_breakdown
+
+
+def player_rows(db, player, mode=None):
+    """Partidas do jogador vistas pelo lado dele, direto de game_history"""
+    rows = []
+    for row in db.execute('''
+        SELECT * FROM game_history
+        WHERE (player1_id = :player OR player2_id = :player) AND (:mode IS NULL OR mode = :mode)
+    ''', {'player': player, 'mode': mode}):
+        me, other = ('player1', 'player2') if row['player1_id'] == player else ('player2', 'player1')
+        before, after = row[f'{me}_rating_before'], row[f'{me}_rating_after']
+        if row['result'] == 'draw':
+            result = 'draw'
+        else:
+            result = 'win' if row['winner_id'] == player else 'loss'
+        rows.append({
+            'opponent_id': row[f'{other}_id'],
+            'time_control': row['time_control'],
+            'opponent_rating': row[f'{other}_rating_before'],
+            'result': result,
+            'delta': after - before if after and before else 0,
+        })
+    return rows
+
+
+def overall(rows):
+    return {
+        'partidas': len(rows),
+        'vitorias': sum(r['result'] == 'win' for r in rows),
+        'derrotas': sum(r['result'] == 'loss' for r in rows),
+        'empates': sum(r['result'] == 'draw' for r in rows),
+        'rating_delta': sum(r['delta'] for r in rows),
+    }
+
+
+def test_overall_without_player_games(client, db, player_ids, without_player_games):
+    player = player_ids[-2]
+    expected = overall(player_rows(db, player, 'rapid'))
+    assert expected['partidas'] > 0
+
+    response = client.get(f'/api/jogador/{player}/breakdown?modo=rapid')
+    assert response.status_code == 200
+    geral = response.get_json()['geral']
+    assert {key: geral[key] for key in expected} == expected
+
+
+def test_replaced_game_refreshes_the_breakdown(client, db, player_ids, replace_game):
+    player = player_ids[0]
+    url = f'/api/jogador/{player}/breakdown?modo=blitz'
+    assert client.get(url).get_json()['geral']['empates'] == overall(player_rows(db, player, 'blitz'))['empates']
+
+    game = db.execute('''
+        SELECT * FROM game_history
+        WHERE (player1_id = :player OR player2_id = :player) AND mode = 'blitz' AND result <> 'draw'
+        ORDER BY id LIMIT 1
+    ''', {'player': player}).fetchone()
+    replace_game(game['id'], result='draw', winner_id=None)
+    expected = overall(player_rows(db, player, 'blitz'))
+    geral = client.get(url).get_json()['geral']
+    assert {key: geral[key] for key in expected} == expected
+
+
+def summary(rows):
+    """Totais de um recorte calculados partida a partida"""
+    rated = [r for r in rows if r['opponent_rating'] and r['opponent_rating'] > 0]
+    score = sum(r['result'] == 'win' for r in rows) + sum(r['result'] == 'draw' for r in rows) / 2
+    expected = {**overall(rows), 'pontuacao': round(score / len(rows) * 100, 1),
+                'rating_medio_oponentes': None, 'performance': None}
+    if rated:
+        avg_opponent = sum(r['opponent_rating'] for r in rated) / len(rated)
+        rated_score = sum((r['result'] == 'win') + (r['result'] == 'draw') / 2 for r in rated)
+        expected['rating_medio_oponentes'] = round(avg_opponent)
+        expected['performance'] = round(avg_opponent + 400 * (2 * rated_score - len(rated)) / len(rated))
+    return expected
+
+
+def group_by(rows, key):
+    groups = {}
+    for row in rows:
+        groups.setdefault(key(row), []).append(row)
+    return groups
+
+
+def band(row, width=200):
+    rating = row['opponent_rating']
+    return f'{rating // width * width}-{rating // width * width + width - 1}' if rating and rating > 0 else 'sem rating'
+
+
+def strip(entry, *keys):
+    return {key: value for key, value in entry.items() if key not in keys}
+
+
+@pytest.mark.parametrize('modo', ['blitz', 'todos'])
+def test_breakdown_matches_a_game_by_game_count(client, db, player_ids, modo):
+    player = player_ids[1]
+    rows = player_rows(db, player, None if modo == 'todos' else modo)
+    data = client.get(f'/api/jogador/{player}/breakdown?modo={modo}').get_json()
+    assert data['modo'] == modo
+    assert data['geral'] == summary(rows)
+
+    bands = group_by(rows, band)
+    assert {entry['faixa']: strip(entry, 'faixa', 'rating_min', 'rating_max')
+            for entry in data['por_faixa_rating']} == {faixa: summary(group) for faixa, group in bands.items()}
+    rating_min = [entry['rating_min'] for entry in data['por_faixa_rating']]
+    assert rating_min == sorted(rating_min, key=lambda b: (b is None, b or 0))
+
+    time_controls = group_by(rows, lambda r: r['time_control'])
+    assert {entry['time_control']: strip(entry, 'time_control')
+            for entry in data['por_time_control']} == {tc: summary(group) for tc, group in time_controls.items()}
+    games = [entry['partidas'] for entry in data['por_time_control']]
+    assert games == sorted(games, reverse=True)
+
+    opponents = group_by(rows, lambda r: r['opponent_id'])
+    assert data['total_oponentes'] == len(opponents)
+    ranked = sorted(opponents.items(), key=lambda item: (-len(item[1]), item[0]))[:20]
+    assert [(entry['oponente_id'], strip(entry, 'oponente_id', 'oponente_nome'))
+            for entry in data['por_oponente']] == [(opponent, summary(group)) for opponent, group in ranked]
+
+
+def test_top_opponents_are_the_most_frequent(db, player_ids):
+    player = player_ids[0]
+    opponents = group_by(player_rows(db, player), lambda r: r['opponent_id'])
+    breakdown = compute_breakdown(db, player, top_opponents=3)
+    assert breakdown['total_oponentes'] == len(opponents)
+    expected = sorted(opponents, key=lambda opponent: (-len(opponents[opponent]), opponent))[:3]
+    assert [entry['oponente_id'] for entry in breakdown['por_oponente']] == expected
+
+
+def test_breakdown_errors(client, player_ids):
+    assert client.get(f'/api/jogador/{player_ids[0]}/breakdown?modo=xadrez').status_code == 400
+    assert client.get('/api/jogador/0/breakdown').status_code == 404
+
+
+def test_unrated_opponents_get_their_own_band(client, db, player_ids, replace_game):
+    player = player_ids[0]
+    game = db.execute('''
+        SELECT * FROM game_history WHERE player1_id = ? AND mode = 'rapid' ORDER BY id LIMIT 1
+    ''', (player,)).fetchone()
+    replace_game(game['id'], player2_rating_before=0)
+
+    data = client.get(f'/api/jogador/{player}/breakdown?modo=rapid').get_json()
+    unrated = data['por_faixa_rating'][-1]
+    assert unrated['faixa'] == 'sem rating'
+    assert unrated['rating_min'] is None
+    assert strip(unrated, 'faixa', 'rating_min', 'rating_max') == summary(
+        [r for r in player_rows(db, player, 'rapid') if not r['opponent_rating']])
+    assert data['geral'] == summary(player_rows(db, player, 'rapid'))
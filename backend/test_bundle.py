@@ -0,0 +1,65 @@
+"""
+Testes de /api/jogador/<id>/bundle e /api/jogadores?ids=...
+"""
+
+import pytest
+
+
+def test_bundle_matches_the_separate_endpoints(client, player_ids):
+    player = player_ids[0]
+    bundle = client.get(f'/api/jogador/{player}/bundle').get_json()
+    details = client.get(f'/api/jogador/{player}').get_json()
+
+    for key in ('id_discord', 'nome', 'lichess_username', 'avatar_url', 'estatisticas', 'ranks', 'achievements'):
+        assert bundle[key] == details[key], key
+    assert bundle['historico']['modo'] == 'todos'
+    assert bundle['historico']['partidas'] == client.get(f'/api/historico/{player}').get_json()['partidas']
+
+
+def test_bundle_include_selects_the_parts(client, player_ids):
+    player = player_ids[0]
+    bundle = client.get(f'/api/jogador/{player}/bundle?include=stats,achievements').get_json()
+    assert set(bundle) == {'id_discord', 'estatisticas', 'ranks', 'achievements', 'ultima_atualizacao'}
+
+    response = client.get(f'/api/jogador/{player}/bundle?include=stats,tudo')
+    assert response.status_code == 400
+    assert 'tudo' in response.get_json()['error']
+
+
+def test_bundle_history_filters(client, player_ids):
+    player = player_ids[0]
+    bundle = client.get(f'/api/jogador/{player}/bundle?include=history&modo=blitz&limit=5').get_json()
+    historico = bundle['historico']
+    assert historico['modo'] == 'blitz'
+    expected = client.get(f'/api/historico/{player}?modo=blitz').get_json()['partidas'][:5]
+    assert len(expected) == 5
+    assert historico['partidas'] == expected
+
+
+def test_bundle_unknown_player(client):
+    assert client.get('/api/jogador/0/bundle').status_code == 404
+
+
+def test_batch_keeps_the_requested_order(client, player_ids):
+    ids = [player_ids[3], player_ids[1], '0', player_ids[3], player_ids[2]]
+    data = client.get(f'/api/jogadores?ids={",".join(ids)}').get_json()
+
+    assert [j['id_discord'] for j in data['jogadores']] == [player_ids[3], player_ids[1], player_ids[2]]
+    assert data['nao_encontrados'] == ['0']
+
+    bundle = client.get(f'/api/jogador/{player_ids[1]}/bundle?include=profile,stats').get_json()
+    jogador = data['jogadores'][1]
+    assert jogador['nome'] == bundle['nome']
+    # Sem rank no batch: o resto das estatísticas é igual
+    for mode, stats in jogador['estatisticas'].items():
+        assert {k: v for k, v in bundle['estatisticas'][mode].items() if k in stats} == stats
+
+
+@pytest.mark.parametrize('ids', ['', ',,'])
+def test_batch_rejects_empty_ids(client, ids):
+    assert client.get(f'/api/jogadores?ids={ids}').status_code == 400
+
+
+def test_batch_rejects_too_many_ids(client, api):
+    ids = ','.join(str(i) for i in range(api.config.BATCH_MAX_IDS + 1))
+    assert client.get(f'/api/jogadores?ids={ids}').status_code == 400
@@ -0,0 +1,102 @@
+"""
+Testes do cache de respostas (cache.py) e da invalidação pela versão do banco
+"""
+
+import threading
+import time
+
+import pytest
+
+from cache import ResponseCache, SingleFlight
+
+
+def test_entries_are_dropped_when_the_version_changes():
+    cache = ResponseCache(max_entries=4, ttl=300)
+    calls = []
+
+    def builder():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_compute('ranking', 1, builder) == 1
+    assert cache.get_or_compute('ranking', 1, builder) == 1
+    assert cache.get_or_compute('ranking', 2, builder) == 2
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_ttl_is_a_backstop():
+    cache = ResponseCache(ttl=0)
+    cache.set('stats', 1, 'velho')
+    assert cache.get_or_compute('stats', 1, lambda: 'novo') == 'novo'
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.set('a', 1, 'a')
+    cache.set('b', 1, 'b')
+    cache.get_or_compute('a', 1, lambda: pytest.fail('a deveria estar em cache'))
+    cache.set('c', 1, 'c')
+
+    assert cache.get_or_compute('a', 1, lambda: 'recalculado') == 'a'
+    assert cache.get_or_compute('b', 1, lambda: 'recalculado') == 'recalculado'
+    assert cache.stats()['evictions'] == 2
+
+
+def test_concurrent_misses_run_the_builder_once():
+    cache = ResponseCache()
+    calls = []
+    start = threading.Barrier(8)
+
+    def builder():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'payload'
+
+    results = []
+
+    def worker():
+        start.wait()
+        results.append(cache.get_or_compute('ranking', 1, builder))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['payload'] * 8
+    assert len(calls) == 1
+
+
+def test_single_flight_forgets_a_failed_call():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError('database is locked')
+
+    with pytest.raises(RuntimeError):
+        flight.do('key', fail)
+    assert flight.do('key', lambda: 'ok') == 'ok'
+
+
+def test_bot_writes_show_up_immediately(client, db):
+    stats = client.get('/api/stats-gerais').get_json()
+    ranking = client.get('/api/ranking/blitz?limit=5').get_json()
+
+    discord_id = '999999999999999999'
+    db.execute('''
+        INSERT INTO players (discord_id, discord_username, rating_blitz, wins_blitz)
+        VALUES (?, 'novato', 3000, 1)
+    ''', (discord_id,))
+    db.commit()
+    try:
+        assert client.get('/api/stats-gerais').get_json()['total_jogadores'] == stats['total_jogadores'] + 1
+        top = client.get('/api/ranking/blitz?limit=5').get_json()
+        assert top['jogadores'][0]['id_discord'] == discord_id
+        assert top['total_jogadores'] == ranking['total_jogadores'] + 1
+    finally:
+        db.execute('DELETE FROM players WHERE discord_id = ?', (discord_id,))
+        db.commit()
+
+    assert client.get('/api/ranking/blitz?limit=5').get_json()['jogadores'] == ranking['jogadores']
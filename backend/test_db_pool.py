@@ -0,0 +1,65 @@
+"""
+Testes do pool de conexões somente-leitura
+"""
+
+import threading
+
+from db_pool import ConnectionPool, PoolTimeout
+
+import pytest
+
+
+def test_release_is_idempotent_per_checkout(db_path):
+    pool = ConnectionPool(db_path, size=1, timeout=0.1)
+    first = pool.acquire()
+    checkout = first._checkout
+    first.close()
+
+    # Mesma conexão emprestada de novo (pool de tamanho 1)
+    second = pool.acquire()
+    assert second is first
+
+    # close() atrasado do primeiro empréstimo (ex: teardown da requisição)
+    pool.release(first, checkout)
+    assert pool.stats()['in_use'] == 1
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+    second.close()
+    assert pool.stats()['in_use'] == 0
+    pool.close_all()
+
+
+def test_snapshot_connections_start_in_a_transaction(db_path):
+    pool = ConnectionPool(db_path, size=2, snapshot=True)
+    conn = pool.acquire()
+    assert conn.in_transaction
+    conn.close()
+    assert not conn.in_transaction
+    pool.close_all()
+
+
+def test_concurrent_requests_never_share_a_connection(api, player_ids):
+    errors = []
+    statuses = []
+
+    def worker(offset):
+        client = api.app.test_client()
+        for i in range(100):
+            player = player_ids[(offset + i) % len(player_ids)]
+            response = client.get(f'/api/jogador/{player}/bundle')
+            statuses.append(response.status_code)
+            # 503 é o controle de admissão recusando o excesso (esperado)
+            if response.status_code not in (200, 503):
+                errors.append(response.get_json())
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors, errors[:3]
+    assert len(statuses) == 16 * 100
+    assert statuses.count(200) > len(statuses) // 2
+    assert api.get_db_pool().stats()['in_use'] == 0
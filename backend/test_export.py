@@ -0,0 +1,137 @@
+"""
+Testes das exportações em streaming (/api/export/*)
+"""
+
+import csv
+import io
+import json
+import sqlite3
+
+import pytest
+
+import export
+from admission import ConcurrencyLimiter
+from migrations import ranking_filter
+
+
+def export_ids(client, query):
+    return [row['id'] for row in export_rows(client, f'/api/export/games?{query}')]
+
+
+def export_rows(client, url):
+    # close() libera a vaga do limitador de exportação, como o servidor faz
+    with client.get(url) as response:
+        assert response.status_code == 200
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def player_game_ids(db, player, mode=None):
+    sql = 'SELECT id FROM game_history WHERE (player1_id = ? OR player2_id = ?)'
+    params = [player, player]
+    if mode:
+        sql += ' AND mode = ?'
+        params.append(mode)
+    return [row[0] for row in db.execute(sql + ' ORDER BY id', params)]
+
+
+def test_player_filter_matches_game_history(client, db, player_ids):
+    player = player_ids[0]
+    expected = player_game_ids(db, player)
+    assert expected
+    assert export_ids(client, f'jogador={player}') == expected
+
+
+def test_player_filter_without_player_games(client, db, player_ids, without_player_games):
+    player = player_ids[0]
+    expected = player_game_ids(db, player, 'blitz')
+    assert expected
+    assert export_ids(client, f'jogador={player}&modo=blitz') == expected
+
+
+
+
+def test_games_export_matches_game_history(client, db):
+    rows = export_rows(client, '/api/export/games')
+    expected = [dict(zip(export.GAME_COLUMNS, row)) for row in db.execute(
+        f'SELECT {", ".join(export.GAME_COLUMNS)} FROM game_history ORDER BY id'
+    )]
+    assert rows == expected
+
+
+def test_resuming_with_after_rebuilds_the_full_export(client):
+    full = export_ids(client, '')
+    resumed, after = [], 0
+    while True:
+        chunk = export_ids(client, f'after={after}&limit=400')
+        if not chunk:
+            break
+        resumed += chunk
+        after = chunk[-1]
+    assert resumed == full
+
+
+def test_mode_and_date_filters(client, db):
+    day = db.execute('SELECT substr(played_at, 1, 10) FROM game_history ORDER BY id LIMIT 1 OFFSET 700').fetchone()[0]
+    expected = [row[0] for row in db.execute('''
+        SELECT id FROM game_history
+        WHERE mode = 'rapid' AND substr(played_at, 1, 10) BETWEEN :day AND :day ORDER BY id
+    ''', {'day': day})]
+    assert export_ids(client, f'modo=rapid&from={day}&to={day}') == expected
+
+
+def test_csv_export(client, db):
+    with client.get('/api/export/players?format=csv') as response:
+        assert response.mimetype == 'text/csv'
+        assert response.headers['Content-Disposition'] == 'attachment; filename="legion-chess-players.csv"'
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert tuple(rows[0]) == export.PLAYER_COLUMNS
+    assert [row[0] for row in rows[1:]] == [row[0] for row in db.execute('SELECT discord_id FROM players ORDER BY discord_id')]
+
+
+def test_players_export_filters(client, db):
+    ranked = [row[0] for row in db.execute(
+        f'SELECT discord_id FROM players WHERE {ranking_filter("classic")} ORDER BY discord_id'
+    )]
+    assert [row['discord_id'] for row in export_rows(client, '/api/export/players?modo=classic')] == ranked
+
+    after = ranked[len(ranked) // 2]
+    page = export_rows(client, f'/api/export/players?modo=classic&after={after}&limit=3')
+    assert [row['discord_id'] for row in page] == [i for i in ranked if i > after][:3]
+
+
+@pytest.mark.parametrize('query', ['format=xml', 'modo=xadrez', 'limit=0', 'after=abc'])
+def test_invalid_parameters(client, query):
+    response = client.get(f'/api/export/games?{query}')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_rows_are_read_in_batches():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE t (id INTEGER, name TEXT)')
+    conn.executemany('INSERT INTO t VALUES (?, ?)', [(i, f'n{i}') for i in range(10)])
+
+    chunks = list(export.stream_rows(conn, 'SELECT id, name FROM t ORDER BY id', {}, ('id', 'name'), 'ndjson', 4))
+    assert len(chunks) == 3
+    assert json.loads(chunks[-1].splitlines()[-1]) == {'id': 9, 'name': 'n9'}
+
+    chunks = list(export.stream_rows(conn, 'SELECT id, name FROM t ORDER BY id', {}, ('id', 'name'), 'csv', 4))
+    assert chunks[0] == 'id,name\n'
+    assert len(chunks) == 4
+    # A conexão continua aberta: quem fecha é a resposta
+    conn.execute('SELECT 1')
+
+
+def test_export_slot_is_held_until_the_response_closes(api, client, monkeypatch):
+    limiter = ConcurrencyLimiter('export', 1, queue_timeout=0.01)
+    monkeypatch.setitem(api.concurrency_limiters, 'export', limiter)
+
+    response = client.get('/api/export/games', buffered=False)
+    assert limiter.stats()['active'] == 1
+    busy = client.get('/api/export/players')
+    assert busy.status_code == 503
+    assert busy.headers['Retry-After']
+
+    response.close()
+    assert limiter.stats()['active'] == 0
+    assert export_rows(client, '/api/export/players?limit=1')
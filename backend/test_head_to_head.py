@@ -0,0 +1,123 @@
+"""
+Testes de /api/h2h/<id_a>/<id_b> (head_to_head.py)
+"""
+
+import pytest
+
+
+def pairs(db):
+    """Pares que mais se enfrentaram"""
+    return [tuple(row) for row in db.execute('''
+        SELECT player1_id, player2_id FROM game_history
+        GROUP BY player1_id, player2_id ORDER BY COUNT(*) DESC, player1_id, player2_id
+        LIMIT 5
+    ''')]
+
+
+def brute_force_score(db, player, opponent, mode=None):
+    """Placar de `player` contra `opponent` calculado direto de game_history"""
+    score = {'partidas': 0, 'vitorias': 0, 'derrotas': 0, 'empates': 0, 'rating_delta': 0}
+    for row in db.execute('''
+        SELECT * FROM game_history
+        WHERE ((player1_id = :a AND player2_id = :b) OR (player1_id = :b AND player2_id = :a))
+          AND (:mode IS NULL OR mode = :mode)
+    ''', {'a': player, 'b': opponent, 'mode': mode}):
+        side = 'player1' if row['player1_id'] == player else 'player2'
+        before, after = row[f'{side}_rating_before'], row[f'{side}_rating_after']
+        score['partidas'] += 1
+        if row['result'] == 'draw':
+            score['empates'] += 1
+        elif row['winner_id'] == player:
+            score['vitorias'] += 1
+        else:
+            score['derrotas'] += 1
+        score['rating_delta'] += after - before if after and before else 0
+    return score
+
+
+def h2h_score(client, player, opponent, query=''):
+    response = client.get(f'/api/h2h/{player}/{opponent}{query}')
+    assert response.status_code == 200
+    data = response.get_json()
+    return {key: data[key] for key in ('partidas', 'vitorias', 'derrotas', 'empates', 'rating_delta')}
+
+
+def test_score_without_player_games(client, db, without_player_games):
+    player, opponent = pairs(db)[-1]
+    expected = brute_force_score(db, player, opponent)
+    assert expected['partidas'] > 0
+    assert h2h_score(client, player, opponent) == expected
+
+
+def flipped_result(game):
+    """Mudanças que trocam o resultado de uma partida sem mexer no resto"""
+    if game['result'] == 'draw':
+        return {'result': 'win', 'winner_id': game['player1_id']}
+    return {'result': 'draw', 'winner_id': None}
+
+
+def test_replaced_game_refreshes_the_score(client, db, replace_game):
+    player, opponent = pairs(db)[0]
+    assert h2h_score(client, player, opponent) == brute_force_score(db, player, opponent)
+
+    game = db.execute('SELECT * FROM game_history WHERE player1_id = ? AND player2_id = ? ORDER BY id LIMIT 1',
+                      (player, opponent)).fetchone()
+    replace_game(game['id'], **flipped_result(game))
+    assert h2h_score(client, player, opponent) == brute_force_score(db, player, opponent)
+
+
+@pytest.mark.parametrize('mode', [None, 'blitz', 'rapid'])
+def test_score_matches_brute_force_and_is_symmetric(client, db, mode):
+    query = f'?modo={mode}' if mode else ''
+    for player, opponent in pairs(db):
+        score = h2h_score(client, player, opponent, query)
+        assert score == brute_force_score(db, player, opponent, mode)
+
+        mirror = h2h_score(client, opponent, player, query)
+        assert (mirror['vitorias'], mirror['derrotas'], mirror['empates']) == (
+            score['derrotas'], score['vitorias'], score['empates'])
+
+
+def test_per_mode_scores_and_recent_games(client, db):
+    player, opponent = pairs(db)[0]
+    data = client.get(f'/api/h2h/{player}/{opponent}?n=5').get_json()
+
+    assert data['por_modo'] == {
+        mode: brute_force_score(db, player, opponent, mode)
+        for mode in data['por_modo']
+    }
+    assert sum(score['partidas'] for score in data['por_modo'].values()) == data['partidas']
+
+    played = [row[0] for row in db.execute('''
+        SELECT id FROM game_history
+        WHERE (player1_id = :a AND player2_id = :b) OR (player1_id = :b AND player2_id = :a)
+        ORDER BY played_at DESC, id DESC
+    ''', {'a': player, 'b': opponent})]
+    assert [game['id'] for game in data['ultimas_partidas']] == played[:5]
+
+
+def test_unrelated_games_only_revalidate_the_pair(api, client, db, replace_game):
+    player, opponent = pairs(db)[1]
+    url = f'/api/h2h/{player}/{opponent}'
+    client.get(url)
+    before = api.head_to_head.stats()
+
+    other = db.execute('''
+        SELECT * FROM game_history
+        WHERE player1_id NOT IN (:a, :b) AND player2_id NOT IN (:a, :b) LIMIT 1
+    ''', {'a': player, 'b': opponent}).fetchone()
+    replace_game(other['id'], game_url='https://lichess.org/outra')
+    client.get(url)
+
+    after = api.head_to_head.stats()
+    assert after['revalidated'] == before['revalidated'] + 1
+    assert after['rebuilds'] == before['rebuilds']
+
+
+def test_head_to_head_errors(client, player_ids):
+    a, b = player_ids[:2]
+    assert client.get(f'/api/h2h/{a}/{a}').status_code == 400
+    assert client.get(f'/api/h2h/{a}/{b}?modo=xadrez').status_code == 400
+    response = client.get(f'/api/h2h/{a}/0')
+    assert response.status_code == 404
+    assert '0' in response.get_json()['error']
@@ -0,0 +1,93 @@
+"""
+Testes de ETag / Last-Modified / 304 (http_cache.py) nas rotas JSON
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from http_cache import TableValidators
+
+
+@pytest.fixture
+def urls(player_ids):
+    player = player_ids[0]
+    return [
+        '/api/ranking/blitz',
+        '/api/ranking/blitz?limit=10',
+        '/api/stats-gerais',
+        f'/api/jogador/{player}',
+        f'/api/jogador/{player}/bundle',
+        f'/api/achievements/{player}',
+        f'/api/historico/{player}',
+        '/api/search?query=jogador',
+    ]
+
+
+def test_validators_and_304(client, urls):
+    for url in urls:
+        response = client.get(url)
+        assert response.status_code == 200, url
+        etag = response.headers['ETag']
+        assert etag.startswith('W/"'), url
+        assert response.headers['Last-Modified']
+        assert 'max-age' in response.headers['Cache-Control']
+
+        cached = client.get(url, headers={'If-None-Match': etag})
+        assert cached.status_code == 304, url
+        assert cached.data == b''
+        assert cached.headers['ETag'] == etag
+
+        since = client.get(url, headers={'If-Modified-Since': response.headers['Last-Modified']})
+        assert since.status_code == 304, url
+
+
+def test_etag_depends_on_the_query_string(client):
+    first = client.get('/api/ranking/blitz?limit=10').headers['ETag']
+    second = client.get('/api/ranking/blitz?limit=20').headers['ETag']
+    assert first != second
+
+
+def test_timestamps_are_the_real_change_time(client):
+    first = client.get('/api/stats-gerais')
+    second = client.get('/api/stats-gerais')
+    assert first.data == second.data
+
+    stamp = datetime.strptime(first.get_json()['ultima_atualizacao'], '%Y-%m-%dT%H:%M:%S.%fZ')
+    assert stamp.replace(tzinfo=timezone.utc, microsecond=0) == first.last_modified
+
+
+def test_only_writes_to_the_route_tables_change_the_etag(client, db, player_ids):
+    player = player_ids[0]
+    ranking = client.get('/api/ranking/blitz').headers['ETag']
+    achievements = client.get(f'/api/achievements/{player}').headers['ETag']
+
+    cursor = db.execute("INSERT INTO achievements (player_id, achievement_name) VALUES (?, 'teste')", (player,))
+    db.commit()
+    try:
+        assert client.get('/api/ranking/blitz', headers={'If-None-Match': ranking}).status_code == 304
+        changed = client.get(f'/api/achievements/{player}', headers={'If-None-Match': achievements})
+        assert changed.status_code == 200
+        assert changed.headers['ETag'] != achievements
+    finally:
+        db.execute('DELETE FROM achievements WHERE id = ?', (cursor.lastrowid,))
+        db.commit()
+
+
+def test_errors_are_not_cached(client):
+    response = client.get('/api/jogador/0')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+
+
+def test_fallback_state_without_table_versions():
+    changed = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    validators = TableValidators(lambda: None, lambda: ((1, 2), changed))
+    assert validators.state(('players',)) == ((1, 2), changed)
+    assert validators.changed_at(('players',)) == '2025-01-01T00:00:00.000Z'
+
+    versions = {'players': (3, '2025-02-01T10:00:00.500Z'), 'game_history': (7, '2025-03-01T10:00:00.000Z')}
+    validators = TableValidators(lambda: versions, lambda: pytest.fail('fallback não deveria ser usado'))
+    token, changed_at = validators.state(('players', 'game_history'))
+    assert token == (3, 7)
+    assert changed_at == datetime(2025, 3, 1, 10, tzinfo=timezone.utc)
@@ -0,0 +1,130 @@
+"""
+Testes das triggers criadas pelas migrações, com um banco em memória
+no esquema do bot
+
+Uso:
+    python -m pytest test_migrations.py
+    python test_migrations.py
+"""
+
+import sqlite3
+
+from migrations import MODES, run_migrations, player_games_fallback_cte, ranking_filter
+from synthetic_db import SCHEMA
+
+
+def new_db():
+    conn = sqlite3.connect(':memory:')
+    conn.executescript(SCHEMA)
+    run_migrations(conn)
+    return conn
+
+
+def add_player(conn, discord_id, verb='INSERT'):
+    conn.execute(f"{verb} INTO players (discord_id, discord_username) VALUES (?, ?)",
+                 (discord_id, f'jogador_{discord_id}'))
+
+
+def add_game(conn, game_id, player1, player2, played_at, verb='INSERT', mode='blitz'):
+    conn.execute(f'''
+        {verb} INTO game_history (id, player1_id, player2_id, player1_name, player2_name,
+                                  winner_id, result, mode, time_control,
+                                  player1_rating_before, player2_rating_before,
+                                  player1_rating_after, player2_rating_after, played_at)
+        VALUES (?, ?, ?, ?, ?, ?, 'win', ?, '5+3', 1200, 1200, 1210, 1190, ?)
+    ''', (game_id, player1, player2, player1, player2, player1, mode, played_at))
+
+
+def player_games_rows(conn, game_id):
+    return sorted(conn.execute(
+        'SELECT player_id, opponent_id, played_at FROM player_games WHERE game_id = ?', (game_id,)
+    ).fetchall())
+
+
+def test_replace_game_keeps_player_games_in_sync():
+    conn = new_db()
+    add_game(conn, 1, 'a', 'b', '2025-01-01 10:00:00')
+    add_game(conn, 1, 'a', 'c', '2025-01-01 10:05:00', verb='INSERT OR REPLACE')
+
+    assert player_games_rows(conn, 1) == [
+        ('a', 'c', '2025-01-01 10:05:00'),
+        ('c', 'a', '2025-01-01 10:05:00'),
+    ]
+
+
+def community_stats(conn):
+    return dict(conn.execute('SELECT key, value FROM community_stats WHERE value <> 0').fetchall())
+
+
+def test_replace_player_keeps_player_count():
+    conn = new_db()
+    add_player(conn, 'a')
+    add_player(conn, 'b')
+    add_player(conn, 'a', verb='INSERT OR REPLACE')
+    assert community_stats(conn)['players'] == 2
+
+    conn.execute("DELETE FROM players WHERE discord_id = 'b'")
+    assert community_stats(conn)['players'] == 1
+
+
+def test_replace_game_keeps_game_counts():
+    conn = new_db()
+    add_game(conn, 1, 'a', 'b', '2025-01-01 10:00:00')
+    add_game(conn, None, 'a', 'b', '2025-01-01 11:00:00')
+    add_game(conn, 1, 'a', 'b', '2025-01-01 10:00:00', verb='INSERT OR REPLACE', mode='rapid')
+
+    assert community_stats(conn) == {'games': 2, 'games_blitz': 1, 'games_rapid': 1}
+
+
+def test_ignored_or_failed_game_insert_keeps_game_counts():
+    conn = new_db()
+    add_game(conn, 1, 'a', 'b', '2025-01-01 10:00:00')
+    add_game(conn, 1, 'a', 'b', '2025-01-01 10:00:00', verb='INSERT OR IGNORE', mode='rapid')
+    assert community_stats(conn) == {'games': 1, 'games_blitz': 1}
+
+    try:
+        add_game(conn, 1, 'a', 'b', '2025-01-01 10:00:00', mode='rapid')
+    except sqlite3.IntegrityError:
+        pass
+    assert community_stats(conn) == {'games': 1, 'games_blitz': 1}
+
+    # REPLACE depois de um IGNORE ainda desconta a linha antiga uma única vez
+    add_game(conn, 1, 'a', 'b', '2025-01-01 10:00:00', verb='INSERT OR REPLACE', mode='rapid')
+    add_game(conn, None, 'a', 'b', '2025-01-01 11:00:00')
+    assert community_stats(conn) == {'games': 2, 'games_blitz': 1, 'games_rapid': 1}
+    assert community_stats(conn)['games'] == conn.execute('SELECT COUNT(*) FROM game_history').fetchone()[0]
+
+
+def test_fallback_cte_matches_player_games():
+    conn = new_db()
+    add_game(conn, 1, 'a', 'b', '2025-01-01 10:00:00')
+    add_game(conn, 2, 'b', 'a', '2025-01-02 10:00:00', mode='rapid')
+    add_game(conn, 3, 'a', None, '2025-01-03 10:00:00')
+
+    query = 'SELECT * FROM player_games WHERE player_id = ? ORDER BY played_at DESC'
+    for player in ('a', 'b'):
+        expected = conn.execute(query, (player,)).fetchall()
+        assert expected
+        assert conn.execute(f'{player_games_fallback_cte()} {query}', (player,)).fetchall() == expected
+
+
+
+def test_ranking_reads_use_the_partial_indexes():
+    conn = new_db()
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    for mode in MODES:
+        assert f'idx_players_rating_{mode}' not in indexes
+        plan = ' '.join(row[3] for row in conn.execute(f'''
+            EXPLAIN QUERY PLAN
+            SELECT discord_id FROM players WHERE ({ranking_filter(mode)})
+              AND (rating_{mode} < ? OR (rating_{mode} = ? AND discord_id > ?))
+            ORDER BY rating_{mode} DESC, discord_id ASC LIMIT 50
+        ''', (1500, 1500, '')))
+        assert f'idx_players_ranked_{mode}' in plan
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f'[OK] {name}')
@@ -0,0 +1,109 @@
+"""
+Testes de /api/ranking/<mode> e /api/ranking/<mode>/position/<id>
+"""
+
+import pytest
+
+MODES = ['bullet', 'blitz', 'rapid', 'classic']
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_position_matches_full_ranking(client, mode):
+    ranking = client.get(f'/api/ranking/{mode}').get_json()['jogadores']
+    assert [row['rank'] for row in ranking] == list(range(1, len(ranking) + 1))
+
+    for index in (0, 1, len(ranking) // 2, len(ranking) - 1):
+        player = ranking[index]
+        position = client.get(f'/api/ranking/{mode}/position/{player["id_discord"]}?window=3').get_json()
+        assert position['rank'] == player['rank']
+        assert position['ranks'][mode] == player['rank']
+        assert position['acima'] == ranking[max(0, index - 3):index]
+        assert position['abaixo'] == ranking[index + 1:index + 4]
+
+
+def read_pages(client, mode, limit):
+    pages = []
+    url = f'/api/ranking/{mode}?limit={limit}'
+    while True:
+        page = client.get(url).get_json()
+        pages.append(page)
+        if not page['next_cursor']:
+            return pages
+        url = f'/api/ranking/{mode}?limit={limit}&cursor={page["next_cursor"]}'
+
+
+@pytest.mark.parametrize('limit', [1, 7, 60])
+def test_pages_concatenate_to_the_full_ranking(client, limit):
+    ranking = client.get('/api/ranking/blitz').get_json()
+    pages = read_pages(client, 'blitz', limit)
+
+    assert [row for page in pages for row in page['jogadores']] == ranking['jogadores']
+    assert all(len(page['jogadores']) == limit for page in pages[:-1])
+    assert all(page['total_jogadores'] == len(ranking['jogadores']) for page in pages)
+
+
+def test_page_boundary_inside_a_rating_tie(client):
+    ranking = client.get('/api/ranking/rapid').get_json()['jogadores']
+    ties = [i for i in range(len(ranking) - 1) if ranking[i]['rating'] == ranking[i + 1]['rating']]
+    assert ties, 'o banco sintético deveria ter empates de rating'
+
+    index = ties[0]
+    first = client.get(f'/api/ranking/rapid?limit={index + 1}').get_json()
+    assert first['next_cursor'] == f'{ranking[index]["rating"]}:{ranking[index]["id_discord"]}'
+    second = client.get(f'/api/ranking/rapid?limit=3&cursor={first["next_cursor"]}').get_json()
+    assert second['jogadores'] == ranking[index + 1:index + 4]
+
+
+def test_last_page_has_no_cursor(client):
+    ranking = client.get('/api/ranking/classic').get_json()['jogadores']
+    last = ranking[-2]
+    page = client.get(f'/api/ranking/classic?limit=5&cursor={last["rating"]}:{last["id_discord"]}').get_json()
+    assert page['jogadores'] == ranking[-1:]
+    assert page['next_cursor'] is None
+
+
+def test_limit_is_clamped(client, api):
+    assert len(client.get('/api/ranking/blitz?limit=0').get_json()['jogadores']) == 1
+    page = client.get(f'/api/ranking/blitz?limit={api.config.RANKING_MAX_LIMIT + 1}').get_json()
+    assert page['limit'] == api.config.RANKING_MAX_LIMIT
+
+
+@pytest.mark.parametrize('cursor', ['abc', '1200', '1200:', 'x:123', ':123'])
+def test_invalid_cursor_is_rejected(client, cursor):
+    response = client.get(f'/api/ranking/blitz?limit=10&cursor={cursor}')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_profile_ranks_match_the_rankings(client, player_ids):
+    rankings = {
+        mode: {row['id_discord']: row['rank'] for row in client.get(f'/api/ranking/{mode}').get_json()['jogadores']}
+        for mode in MODES
+    }
+    for player in player_ids[::10]:
+        ranks = client.get(f'/api/jogador/{player}').get_json()['ranks']
+        assert ranks == {mode: rankings[mode].get(player) for mode in MODES}
+
+
+def test_unranked_player_has_no_position(client, db):
+    discord_id = '999999999999999996'
+    ratings = ', '.join(f'rating_{mode}' for mode in MODES)
+    db.execute(f"INSERT INTO players (discord_id, discord_username, {ratings}) VALUES (?, 'sem_partidas', 0, 0, 0, 0)",
+               (discord_id,))
+    db.commit()
+    try:
+        position = client.get(f'/api/ranking/blitz/position/{discord_id}').get_json()
+        assert position['rank'] is None
+        assert position['percentil'] is None
+        assert position['acima'] == position['abaixo'] == []
+        assert set(position['ranks'].values()) == {None}
+    finally:
+        db.execute('DELETE FROM players WHERE discord_id = ?', (discord_id,))
+        db.commit()
+
+
+def test_position_errors_and_empty_window(client, player_ids):
+    position = client.get(f'/api/ranking/blitz/position/{player_ids[0]}?window=0').get_json()
+    assert position['acima'] == position['abaixo'] == []
+    assert client.get(f'/api/ranking/xadrez/position/{player_ids[0]}').status_code == 400
+    assert client.get('/api/ranking/blitz/position/0').status_code == 404
@@ -0,0 +1,129 @@
+"""
+Testes de /api/jogador/<id>/rating-history (rating_history.py)
+"""
+
+import pytest
+
+from rating_history import RatingHistoryCache, RatingSeries, lttb
+
+
+def rating_points(db, player, mode):
+    """Curva completa calculada direto de game_history"""
+    rows = db.execute('''
+        SELECT played_at, id, rating FROM (
+            SELECT played_at, id, player1_rating_after AS rating FROM game_history
+            WHERE player1_id = :player AND mode = :mode
+            UNION ALL
+            SELECT played_at, id, player2_rating_after FROM game_history
+            WHERE player2_id = :player AND mode = :mode
+        )
+        WHERE rating IS NOT NULL
+        ORDER BY played_at, id
+    ''', {'player': player, 'mode': mode})
+    return [{'data': row[0], 'game_id': row[1], 'rating': row[2]} for row in rows]
+
+
+def test_full_curve_without_player_games(client, db, player_ids, without_player_games):
+    player = player_ids[-1]
+    response = client.get(f'/api/jogador/{player}/rating-history?modo=blitz&points=1000')
+    assert response.status_code == 200
+    curve = response.get_json()['curvas']['blitz']
+    assert curve['total_partidas'] > 0
+    assert curve['pontos'] == rating_points(db, player, 'blitz')
+    assert not curve['reduzido']
+
+
+def test_lttb_keeps_ends_and_peaks():
+    points = [(x, 1500) for x in range(1000)]
+    points[437] = (437, 2400)
+    points[800] = (800, 900)
+    sampled = lttb(points, 50)
+
+    assert len(sampled) == 50
+    assert sampled[0] == points[0] and sampled[-1] == points[-1]
+    assert [p[0] for p in sampled] == sorted({p[0] for p in sampled})
+    assert (437, 2400) in sampled and (800, 900) in sampled
+
+
+@pytest.mark.parametrize('threshold', [2, 10, 11])
+def test_lttb_returns_short_series_unchanged(threshold):
+    points = [(x, x * 2) for x in range(10)]
+    assert lttb(points, threshold) == points
+
+
+def test_window_includes_the_whole_last_day():
+    series = RatingSeries([
+        ('2025-01-30 23:00:00', 1, 1500, None),
+        ('2025-01-31 10:00:00', 2, 1510, None),
+        ('2025-01-31 23:59:59', 3, 1520, None),
+        ('2025-02-01 00:00:00', 4, 1530, None),
+    ])
+    assert [p[1] for p in series.window('2025-01-31', '2025-01-31')] == [2, 3]
+    assert [p[1] for p in series.window(None, '2025-01-30')] == [1]
+    assert [p[1] for p in series.window('2025-02-01', None)] == [4]
+
+
+def test_downsampled_curve(client, db, player_ids):
+    player = player_ids[0]
+    full = rating_points(db, player, 'blitz')
+    curve = client.get(f'/api/jogador/{player}/rating-history?modo=blitz&points=10').get_json()['curvas']['blitz']
+
+    assert curve['reduzido']
+    assert curve['total_partidas'] == len(full)
+    assert len(curve['pontos']) == 10
+    assert curve['pontos'][0] == full[0] and curve['pontos'][-1] == full[-1]
+    assert curve['rating_atual'] == full[-1]['rating']
+    assert curve['rating_min'] == min(p['rating'] for p in full)
+    assert curve['rating_max'] == max(p['rating'] for p in full)
+
+
+def test_date_range(client, db, player_ids):
+    player = player_ids[0]
+    full = rating_points(db, player, 'rapid')
+    date_from, date_to = full[len(full) // 4]['data'][:10], full[len(full) // 2]['data'][:10]
+    curve = client.get(
+        f'/api/jogador/{player}/rating-history?modo=rapid&from={date_from}&to={date_to}&points=1000'
+    ).get_json()['curvas']['rapid']
+    assert curve['pontos'] == [p for p in full if date_from <= p['data'][:10] <= date_to]
+
+
+def test_rating_history_errors(client, player_ids):
+    assert client.get(f'/api/jogador/{player_ids[0]}/rating-history?modo=xadrez').status_code == 400
+    assert client.get('/api/jogador/0/rating-history').status_code == 404
+
+
+def add_game(db, player, opponent, played_at, rating_after):
+    cursor = db.execute('''
+        INSERT INTO game_history (player1_id, player2_id, player1_name, player2_name, winner_id, result,
+                                  mode, time_control, player1_rating_before, player2_rating_before,
+                                  player1_rating_after, player2_rating_after, played_at)
+        VALUES (?, ?, 'a', 'b', ?, 'win', 'blitz', '3+2', 1500, 1500, ?, 1490, ?)
+    ''', (player, opponent, player, rating_after, played_at))
+    db.commit()
+    return cursor.lastrowid
+
+
+def test_new_games_are_appended_and_removed_games_rebuild(api, db, player_ids):
+    player, opponent = player_ids[1], player_ids[2]
+    cache = RatingHistoryCache()
+    conn = api.get_db_pool().acquire()
+    try:
+        series = cache.get(conn, player, 'blitz', 1)
+        before = len(series.points)
+        game_id = add_game(db, player, opponent, '2999-01-01 00:00:00', 1777)
+        try:
+            conn.rollback()
+            series = cache.get(conn, player, 'blitz', 2)
+            assert cache.stats()['appends'] == 1
+            assert series.points[-1][1:3] == (game_id, 1777)
+            assert len(series.points) == before + 1
+        finally:
+            db.execute('DELETE FROM game_history WHERE id = ?', (game_id,))
+            db.commit()
+
+        conn.rollback()
+        series = cache.get(conn, player, 'blitz', 3)
+        assert cache.stats()['rebuilds'] == 2
+        assert len(series.points) == before
+    finally:
+        conn.close()
@@ -0,0 +1,130 @@
+"""
+Testes do isolamento de leitura: réplica por backup online (replica.py) e
+leitores em snapshot enquanto o bot grava
+"""
+
+import os
+import sqlite3
+import time
+
+import pytest
+
+from db_pool import ConnectionPool, DataVersion, enable_wal
+from replica import ReadReplica
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Banco do 'bot' em WAL com uma tabela de partidas"""
+    path = str(tmp_path / 'bot.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE games (id INTEGER PRIMARY KEY, result TEXT)')
+    conn.execute("INSERT INTO games (result) VALUES ('win')")
+    conn.commit()
+    conn.close()
+    enable_wal(path)
+    # Como o bot, mantém uma conexão aberta: o -wal não some a cada leitura
+    bot = sqlite3.connect(path)
+    count_games(bot)
+    yield path
+    bot.close()
+
+
+def write(path, count=1):
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO games (result) VALUES ('draw')", [()] * count)
+    conn.commit()
+    conn.close()
+
+
+def count_games(conn):
+    return conn.execute('SELECT COUNT(*) FROM games').fetchone()[0]
+
+
+@pytest.fixture
+def replica(source, tmp_path):
+    replica = ReadReplica(source, str(tmp_path / 'replica.db'), interval=0.05)
+    replica.ensure()
+    return replica
+
+
+def test_refresh_copies_only_when_the_source_changes(source, replica):
+    assert replica.stats()['refreshes'] == 1
+    assert not replica.refresh()
+    assert replica.lag() == 0.0
+
+    write(source)
+    assert replica.lag() > 0
+    assert replica.refresh()
+    assert replica.lag() == 0.0
+
+    conn = sqlite3.connect(f'file:{replica.replica_path}?mode=ro', uri=True)
+    assert count_games(conn) == 2
+    conn.close()
+    leftovers = [name for name in os.listdir(os.path.dirname(replica.replica_path)) if name.endswith('.tmp')]
+    assert leftovers == []
+
+
+def test_lag_grows_until_the_next_copy(source, replica, monkeypatch):
+    write(source)
+    copied_at = replica.meta()['copied_at']
+    monkeypatch.setattr('replica.time.time', lambda: copied_at + 42)
+    assert replica.lag() == pytest.approx(42)
+    assert replica.stats()['lag_seconds'] == pytest.approx(42)
+
+
+def test_open_readers_keep_the_old_copy_until_the_swap_is_noticed(source, replica):
+    pool = ConnectionPool(replica.replica_path, size=1, watch_file=True)
+    version = DataVersion(replica.replica_path)
+    try:
+        conn = pool.acquire()
+        before = version.current()
+        assert count_games(conn) == 1
+
+        write(source, 3)
+        replica.refresh()
+        # A conexão aberta ainda lê o arquivo antigo
+        assert count_games(conn) == 1
+        conn.close()
+
+        conn = pool.acquire()
+        assert count_games(conn) == 4
+        conn.close()
+        assert version.current() != before
+    finally:
+        pool.close_all()
+
+
+def test_background_refresh(source, replica):
+    replica.start()
+    try:
+        write(source)
+        deadline = time.monotonic() + 3
+        while replica.stats()['refreshes'] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert replica.stats()['refreshes'] == 2
+    finally:
+        replica.stop()
+
+
+def test_open_bot_transaction_does_not_block_readers(client, db, player_ids):
+    db.execute('BEGIN IMMEDIATE')
+    db.execute("UPDATE players SET rating_blitz = rating_blitz + 1 WHERE discord_id = ?", (player_ids[0],))
+    try:
+        started = time.monotonic()
+        response = client.get(f'/api/jogador/{player_ids[0]}')
+        assert response.status_code == 200
+        assert time.monotonic() - started < 1
+    finally:
+        db.rollback()
+
+
+def test_health_and_metrics_report_the_lag(api, client, replica, monkeypatch):
+    assert client.get('/api/health').get_json()['read_isolation']['lag_seconds'] == 0.0
+
+    monkeypatch.setattr(api, 'read_replica', replica)
+    stats = client.get('/api/health').get_json()['read_isolation']
+    assert set(stats) >= {'mode', 'path', 'lag_seconds', 'copied_at', 'size_bytes', 'refreshes', 'errors'}
+    assert stats['mode'] == 'replica'
+    assert stats['lag_seconds'] == 0.0
+    assert 'legion_read_lag_seconds 0.0' in client.get('/api/metrics').get_data(as_text=True)
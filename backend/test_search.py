@@ -0,0 +1,91 @@
+"""
+Testes de /api/search (índice FTS5 trigram e busca sem o índice)
+"""
+
+import pytest
+
+
+def match_keys(db, query, mode='blitz'):
+    """{discord_id: (qualidade do casamento, -rating)} de quem contém `query` no nome"""
+    query = query.lower()
+    keys = {}
+    for row in db.execute(f'SELECT discord_id, discord_username, lichess_username, rating_{mode} FROM players'):
+        names = [(name or '').lower() for name in (row[1], row[2])]
+        if not any(query in name for name in names):
+            continue
+        if query in names:
+            quality = 0
+        elif any(name.startswith(query) for name in names):
+            quality = 1
+        else:
+            quality = 2
+        keys[row[0]] = (quality, -(row[3] or 0))
+    return keys
+
+
+def search(client, query, **params):
+    response = client.get('/api/search', query_string={'query': query, **params})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def check_against_brute_force(client, db, query):
+    keys = match_keys(db, query)
+    results = search(client, query)
+    # Empates de rating podem vir em qualquer ordem: compara as chaves de ordenação
+    assert [keys[r['id_discord']] for r in results] == sorted(keys.values())[:10]
+
+
+@pytest.fixture
+def without_fts(api, monkeypatch):
+    monkeypatch.setattr(api, 'players_fts_ready', lambda conn: False)
+
+
+@pytest.mark.parametrize('query', ['jogador_00001', 'li_jogador_000042', '0004', 'JOGADOR_000007', 'ogad'])
+def test_results_match_brute_force(client, db, query):
+    check_against_brute_force(client, db, query)
+
+
+@pytest.mark.parametrize('query', ['jogador_00001', '0004', 'ogad', '05'])
+def test_results_without_fts_match_brute_force(client, db, query, without_fts):
+    check_against_brute_force(client, db, query)
+
+
+def test_exact_name_comes_first(client, db):
+    name = db.execute('SELECT discord_username FROM players ORDER BY discord_id LIMIT 1').fetchone()[0]
+    assert search(client, name)[0]['nome'] == name
+
+
+def test_mode_selects_the_rating_columns(client, db):
+    row = db.execute('SELECT discord_id, discord_username, rating_rapid, wins_rapid FROM players LIMIT 1').fetchone()
+    result = next(r for r in search(client, row[1], mode='rapid') if r['id_discord'] == row[0])
+    assert result['modo'] == 'rapid'
+    assert result['rating'] == (row[2] or 1200)
+    assert result['vitorias'] == (row[3] or 0)
+
+    assert client.get('/api/search?query=jogador&mode=xadrez').status_code == 400
+
+
+@pytest.mark.parametrize('query', ['', 'j', '"', 'a"b', '*', 'NEAR(a b)'])
+def test_short_or_odd_queries_do_not_fail(client, query):
+    results = search(client, query)
+    assert isinstance(results, list)
+
+
+def test_index_follows_bot_writes(client, db):
+    discord_id = '999999999999999998'
+    db.execute("INSERT INTO players (discord_id, discord_username, lichess_username) VALUES (?, 'Xadrezista', 'peao_passado')",
+               (discord_id,))
+    db.commit()
+    try:
+        assert [r['id_discord'] for r in search(client, 'drezis')] == [discord_id]
+        assert [r['id_discord'] for r in search(client, 'peao_pa')] == [discord_id]
+
+        db.execute("UPDATE players SET discord_username = 'Torre' WHERE discord_id = ?", (discord_id,))
+        db.commit()
+        assert search(client, 'drezis') == []
+        assert [r['id_discord'] for r in search(client, 'torre')] == [discord_id]
+    finally:
+        db.execute('DELETE FROM players WHERE discord_id = ?', (discord_id,))
+        db.commit()
+    assert search(client, 'peao_pa') == []
@@ -0,0 +1,66 @@
+"""
+Testes dos snapshots pré-serializados e das variantes comprimidas (snapshots.py)
+"""
+
+import gzip
+import json
+
+import pytest
+
+import snapshots
+from snapshots import Snapshot, dumps
+
+SNAPSHOT_URLS = ['/api/ranking/blitz', '/api/stats-gerais', '/api/tournaments/swiss']
+
+
+def get(client, url, encoding):
+    return client.get(url, headers={'Accept-Encoding': encoding})
+
+
+@pytest.mark.parametrize('url', SNAPSHOT_URLS)
+def test_gzip_variant_decodes_to_the_identity_body(client, url):
+    plain = get(client, url, 'identity')
+    assert plain.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+
+    compressed = get(client, url, 'gzip')
+    if len(plain.data) < snapshots.MIN_COMPRESS_SIZE:
+        assert 'Content-Encoding' not in compressed.headers
+        return
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert len(compressed.data) < len(plain.data)
+    assert gzip.decompress(compressed.data) == plain.data
+
+
+def test_brotli_variant(client):
+    brotli = pytest.importorskip('brotli')
+    plain = get(client, '/api/ranking/blitz', 'identity')
+    compressed = get(client, '/api/ranking/blitz', 'gzip, deflate, br')
+    assert compressed.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(compressed.data) == plain.data
+
+
+def test_refused_encoding_is_not_sent(client):
+    response = get(client, '/api/ranking/blitz', 'gzip;q=0, identity')
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()['modo'] == 'blitz'
+
+
+def test_snapshot_is_serialized_once_per_data_version(client):
+    first = get(client, '/api/ranking/blitz', 'gzip')
+    second = get(client, '/api/ranking/blitz', 'gzip')
+    assert first.data == second.data
+
+
+def test_small_payloads_are_not_compressed():
+    snapshot = Snapshot({'ok': True})
+    assert set(snapshot.variants) == {'identity'}
+
+
+def test_dumps_matches_the_stdlib_encoder(monkeypatch):
+    payload = {'nome': 'João', 'rating': 1500, 'lista': [1, 2.5, None], 'a': {'z': 1, 'b': 2}}
+    fast = dumps(payload)
+    monkeypatch.setattr(snapshots, 'orjson', None)
+    assert dumps(payload) == fast
+    assert json.loads(fast) == payload
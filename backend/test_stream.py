@@ -0,0 +1,142 @@
+"""
+Testes do canal Server-Sent Events (stream.py e /api/stream)
+"""
+
+import json
+import time
+
+import pytest
+
+from stream import EventBroadcaster, TooManySubscribers
+
+
+def wait_until(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_start_survives_a_failing_first_refresh():
+    calls = []
+
+    def data_version():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError('database is locked')
+        return 1
+
+    broadcaster = EventBroadcaster(data_version, {'stats': lambda: {'ok': True}}, poll_interval=0.01)
+    try:
+        broadcaster.start()
+        assert broadcaster.stats()['running']
+        assert wait_until(lambda: broadcaster.stats()['published'] == 1)
+    finally:
+        broadcaster.stop()
+
+
+def test_subscribers_above_the_cap_are_rejected_and_counted():
+    broadcaster = EventBroadcaster(lambda: 1, {'stats': lambda: {}}, max_subscribers=2)
+    subs = [broadcaster.subscribe(), broadcaster.subscribe()]
+    with pytest.raises(TooManySubscribers):
+        broadcaster.subscribe()
+    assert broadcaster.stats()['rejected'] == 1
+
+    broadcaster.unsubscribe(subs[0])
+    broadcaster.subscribe()
+    assert broadcaster.stats()['subscribers'] == 2
+
+
+def test_unchanged_payload_is_not_published_again():
+    version = [1]
+    broadcaster = EventBroadcaster(lambda: version[0], {'stats': lambda: {'total': 10}})
+    broadcaster.refresh()
+    version[0] = 2
+    broadcaster.refresh()
+    assert broadcaster.stats()['recomputes'] == 2
+    assert broadcaster.stats()['published'] == 1
+
+
+def test_reconnect_replays_only_missed_events():
+    payload = {'stats': 0, 'tournaments': 0}
+    broadcaster = EventBroadcaster(
+        lambda: tuple(payload.values()),
+        {topic: (lambda topic=topic: {'n': payload[topic]}) for topic in payload},
+    )
+    broadcaster.start()
+    try:
+        sub = broadcaster.subscribe(['stats'])
+        first = broadcaster._initial_events(sub, None)
+        assert [event[1] for event in first] == ['stats']
+
+        payload['stats'] = 1
+        payload['tournaments'] = 1
+        broadcaster.refresh()
+        # Last-Event-ID é a linha 'id:' do último evento recebido
+        last_event_id = broadcaster.format_event(first[0]).decode().splitlines()[0][len('id: '):]
+        missed = broadcaster._initial_events(sub, broadcaster.parse_event_id(last_event_id))
+        assert [(event[1], event[2]) for event in missed] == [('stats', b'{"n":1}')]
+
+        # Id de outro processo: recebe o snapshot atual
+        assert broadcaster.parse_event_id('outro-1') is None
+    finally:
+        broadcaster.stop()
+
+
+def test_slow_subscriber_is_dropped():
+    counter = [0]
+
+    def version():
+        counter[0] += 1
+        return counter[0]
+
+    broadcaster = EventBroadcaster(version, {'stats': lambda: {'n': counter[0]}}, max_queue=2)
+    sub = broadcaster.subscribe()
+    for _ in range(3):
+        broadcaster.refresh()
+    assert sub.dropped
+    assert broadcaster.stats()['dropped'] == 1
+
+
+def read_event(chunks):
+    """Próximo evento do corpo text/event-stream como (evento, dados)"""
+    for chunk in chunks:
+        fields = dict(line.split(': ', 1) for line in chunk.decode().splitlines() if ': ' in line)
+        if 'event' in fields:
+            return fields['event'], json.loads(fields['data'])
+
+
+def test_stream_endpoint_sends_snapshot_and_changes(api, client, db):
+    response = client.get('/api/stream?topics=stats', buffered=False)
+    try:
+        assert response.mimetype == 'text/event-stream'
+        assert response.headers['Cache-Control'] == 'no-cache'
+        chunks = iter(response.response)
+        assert next(chunks).startswith(b'retry: ')
+
+        topic, stats = read_event(chunks)
+        assert topic == 'stats'
+        assert stats == client.get('/api/stats-gerais').get_json()
+
+        db.execute("INSERT INTO players (discord_id, discord_username) VALUES ('999999999999999997', 'stream')")
+        db.commit()
+        try:
+            api.event_broadcaster.refresh()
+            topic, changed = read_event(chunks)
+            assert topic == 'stats'
+            assert changed['total_jogadores'] == stats['total_jogadores'] + 1
+        finally:
+            db.execute("DELETE FROM players WHERE discord_id = '999999999999999997'")
+            db.commit()
+    finally:
+        response.close()
+    assert wait_until(lambda: api.event_broadcaster.stats()['subscribers'] == 0)
+
+
+def test_stream_endpoint_full_answers_503(api, client, monkeypatch):
+    monkeypatch.setattr(api.event_broadcaster, 'max_subscribers', 0)
+    response = client.get('/api/stream')
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
@@ -0,0 +1,52 @@
+"""
+Classificação de controles de tempo ('5+3', '15+10', ...) em modos de rating
+"""
+
+import re
+from functools import lru_cache
+
+MODE_LABELS = {
+    'bullet': 'Bullet',
+    'blitz': 'Blitz',
+    'rapid': 'Rápida',
+    'classic': 'Clássico',
+}
+
+# Duração estimada de uma partida = base + 40 * incremento (em segundos).
+# Até 180s é bullet (3+0, 2+1), até 600s blitz (5+3, 10+0),
+# até 1800s rápida (15+10, 30+0); acima disso clássico.
+MODE_LIMITS = [
+    (180, 'bullet'),
+    (600, 'blitz'),
+    (1800, 'rapid'),
+]
+
+_TIME_CONTROL_RE = re.compile(r'(\d+(?:[.,]\d+)?)\s*\+\s*(\d+)')
+
+
+def parse_time_control(time_control):
+    """
+    Converte '5+3' (minutos + segundos de incremento) em (300, 3).
+    Retorna None se o texto não tiver um controle de tempo reconhecível.
+    """
+    if not time_control:
+        return None
+    match = _TIME_CONTROL_RE.search(str(time_control))
+    if not match:
+        return None
+    base_minutes = float(match.group(1).replace(',', '.'))
+    return int(base_minutes * 60), int(match.group(2))
+
+
+@lru_cache(maxsize=256)
+def classify_time_control(time_control):
+    """Retorna o modo ('bullet', 'blitz', 'rapid', 'classic') de um controle de tempo"""
+    parsed = parse_time_control(time_control)
+    if parsed is None:
+        return 'classic'
+    base, increment = parsed
+    estimated = base + 40 * increment
+    for limit, mode in MODE_LIMITS:
+        if estimated <= limit:
+            return mode
+    return 'classic'
@@ -58,20 +58,14 @@ export default function PlayerModal({ player, activeMode, onClose, apiUrl }: Pla
   useEffect(() => {
     const fetchGlobalData = async () => {
       try {
-        const [achRes, detailsRes] = await Promise.all([
-          fetch(`${apiUrl}/achievements/${player.id_discord}`),
-          fetch(`${apiUrl}/jogador/${player.id_discord}`)
-        ]);
+        // Stats e conquistas em uma única requisição
+        const bundleRes = await fetch(`${apiUrl}/jogador/${player.id_discord}/bundle?include=stats,achievements`);
         
-        if (achRes.ok) {
-            const achData = await achRes.json();
-            setAchievements(achData.achievements || achData || []);
-        }
-        
-        if (detailsRes.ok) {
-            const detailsData = await detailsRes.json();
-            if (detailsData.estatisticas) {
-                setFullStats(detailsData.estatisticas);
+        if (bundleRes.ok) {
+            const bundleData = await bundleRes.json();
+            setAchievements(bundleData.achievements || []);
+            if (bundleData.estatisticas) {
+                setFullStats(bundleData.estatisticas);
             }
         }
       } catch (e) {